@@ -0,0 +1,255 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Tuple
+
+import storage
+from history_loader import load_history_panel
+from indicators import (
+    MACD_FAST, MACD_SIGNAL, MACD_SLOW, RSI_OVERBOUGHT, RSI_WINDOW,
+    close_matrix, ewm, rsi,
+)
+
+# --- Strategy Backtest ---
+# Replays the live BUY/SELL/HOLD rules (indicators.classify) on every bar of
+# multi-year history for the whole universe. Each parameter combination is a
+# handful of whole-panel (dates x tickers) array operations; indicators are
+# computed once per distinct window/span and shared across the sweep.
+#
+# Trading model: long-only. A BUY at a bar's close opens (or keeps) the
+# position from the next bar, a SELL closes it, a HOLD keeps whatever is
+# held. Each position change pays `cost_bps` of the traded value.
+
+def parse_values(spec: str, cast: Callable = int) -> List:
+    """"14", "7,14,21" or an inclusive range "60:80:5" -> list of values."""
+    values = []
+    for part in str(spec).split(","):
+        if ":" in part:
+            start, stop, step = (cast(x) for x in part.split(":"))
+            values.extend(cast(v) for v in np.arange(start, stop + step / 2, step))
+        elif part.strip():
+            values.append(cast(part))
+    return list(dict.fromkeys(values))
+
+def param_grid(rsi_windows: List[int], thresholds: List[float], fasts: List[int],
+               slows: List[int], signals: List[int]) -> List[Dict[str, Any]]:
+    """Every combination, skipping MACDs whose fast span is not below the slow one."""
+    return [
+        {"rsi_window": w, "rsi_threshold": t, "macd_fast": f, "macd_slow": s, "macd_signal": g}
+        for f, s, g, w, t in itertools.product(fasts, slows, signals, rsi_windows, thresholds)
+        if f < s
+    ]
+
+def load_universe() -> pd.DataFrame:
+    """(ticker -> sector) for every ticker in pattas_list."""
+    conn = storage.connect()
+    universe = pd.read_sql_query("SELECT ticker_symbol AS ticker, sector FROM pattas_list", conn)
+    conn.close()
+    return universe.set_index("ticker")
+
+def positions(bullish: np.ndarray, bearish: np.ndarray, rsi_values: np.ndarray,
+              threshold: float) -> np.ndarray:
+    """
+    Position (1 long / 0 flat) held after each bar's close, with the rules of
+    indicators.classify. HOLD bars carry the last BUY/SELL forward.
+    """
+    buy = bullish & (rsi_values < threshold)
+    sell = bearish | (rsi_values > threshold)
+    # Long when the latest BUY is more recent than the latest SELL
+    rows = np.arange(len(buy), dtype=np.int32)[:, None]
+    last_buy = np.maximum.accumulate(np.where(buy, rows, -1), axis=0)
+    last_sell = np.maximum.accumulate(np.where(sell, rows, -1), axis=0)
+    return (last_buy > last_sell).view(np.int8)
+
+def evaluate(log_returns: np.ndarray, log_prices: np.ndarray, pos: np.ndarray,
+             cost: float = 0.0) -> Dict[str, np.ndarray]:
+    """
+    Per-ticker results of holding `pos`. `log_returns[t]` is the log return
+    from bar t-1 to t (0 where undefined) and `log_prices` its running sum; a
+    position held after bar t-1 earns bar t's return.
+    """
+    n_bars, n_tickers = pos.shape
+    change = np.diff(pos, axis=0, prepend=np.int8(0))
+    strat = np.where(pos[:-1], log_returns[1:], np.float32(0))
+    if cost:
+        strat -= np.float32(cost) * np.abs(change[:-1])
+
+    equity = np.cumsum(strat, axis=0)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=0), 0)
+    drawdown = np.expm1((equity - peak).min(axis=0, initial=0).astype(float))
+
+    # Pair every entry with its exit (the k-th of each, per ticker); a position
+    # still open on the last bar is marked to market there
+    exits = change == -1
+    exits[-1] |= pos[-1] == 1
+    entry_col, entry_bar = np.nonzero((change == 1).T)
+    exit_col, exit_bar = np.nonzero(exits.T)
+    closed = exit_bar < n_bars - 1
+    gross = log_prices[exit_bar, exit_col] - log_prices[entry_bar, entry_col]
+    counted = entry_bar < n_bars - 1  # an entry on the last bar has no return yet
+    won = counted & (gross - cost * (1 + closed) > 0)
+    trades = np.bincount(entry_col[counted], minlength=n_tickers)
+    wins = np.bincount(entry_col[won], minlength=n_tickers)
+
+    held = pos[:-1].sum(axis=0)
+    bars = np.maximum(n_bars - 1 - np.isnan(log_prices[:-1]).sum(axis=0), 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "total_return": np.expm1(strat.sum(axis=0, dtype=float)),
+            "buy_hold_return": np.expm1(log_returns.sum(axis=0, dtype=float)),
+            "trades": trades,
+            "hit_rate": np.where(trades > 0, wins / trades, np.nan),
+            "wins": wins,
+            "max_drawdown": drawdown,
+            "exposure": held / bars,
+        }
+
+def summarize(metrics: Dict[str, np.ndarray]) -> Dict[str, float]:
+    """Universe-level figures for one parameter combination."""
+    trades = metrics["trades"].sum()
+    return {
+        "mean_return": float(np.nanmean(metrics["total_return"])),
+        "median_return": float(np.nanmedian(metrics["total_return"])),
+        "hit_rate": float(metrics["wins"].sum() / trades) if trades else np.nan,
+        "mean_max_drawdown": float(np.nanmean(metrics["max_drawdown"])),
+        "trades": int(trades),
+        "exposure": float(np.nanmean(metrics["exposure"])),
+    }
+
+def _sweep_part(close: np.ndarray, grid: List[Dict[str, Any]], cost: float, rank: str):
+    """Evaluates one slice of the grid; returns (rows, best_row, best_metrics)."""
+    # float32 halves the memory traffic of the per-combination passes
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_returns = np.nan_to_num(np.diff(np.log(close), axis=0, prepend=np.nan)).astype(np.float32)
+    log_prices = np.where(np.isnan(close), np.nan, np.cumsum(log_returns, axis=0))
+
+    emas, rsis = {}, {}
+    rows, best, best_metrics = [], None, None
+    for (fast, slow, sig), combos in itertools.groupby(
+            grid, key=lambda p: (p["macd_fast"], p["macd_slow"], p["macd_signal"])):
+        for span in (fast, slow):
+            if span not in emas:
+                emas[span] = ewm(close, span)
+        line = emas[fast] - emas[slow]
+        signal_line = ewm(line, sig)
+        bullish, bearish = line > signal_line, line < signal_line
+
+        for params in combos:
+            window = params["rsi_window"]
+            if window not in rsis:
+                rsis[window] = rsi(close, window)
+            pos = positions(bullish, bearish, rsis[window], params["rsi_threshold"])
+            metrics = evaluate(log_returns, log_prices, pos, cost)
+            row = {**params, **summarize(metrics)}
+            rows.append(row)
+            if best is None or row[rank] > best[rank]:
+                best, best_metrics = row, metrics
+    return rows, best, best_metrics
+
+def run_sweep(close: np.ndarray, grid: List[Dict[str, Any]], cost: float = 0.0,
+              rank: str = "mean_return", workers: int = 1) -> Tuple[pd.DataFrame, Dict[str, Any], Dict[str, np.ndarray]]:
+    """
+    Evaluates every combination in `grid` over the (dates x tickers) `close`
+    array. Returns (sweep, best_params, best_metrics): one summary row per
+    combination sorted by `rank`, and the per-ticker metrics of the best one.
+    Large sweeps are split into contiguous slices (so MACD groups mostly stay
+    together) across `workers` processes.
+    """
+    workers = max(1, min(workers, len(grid) // 8))
+    if workers == 1:
+        parts = [_sweep_part(close, grid, cost, rank)]
+    else:
+        slices = [list(chunk) for chunk in np.array_split(np.array(grid, dtype=object), workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_sweep_part, [close] * workers, slices, [cost] * workers, [rank] * workers))
+
+    rows = [row for part_rows, _, _ in parts for row in part_rows]
+    _, best, best_metrics = max(parts, key=lambda part: part[1][rank])
+    sweep = pd.DataFrame(rows).sort_values(rank, ascending=False, ignore_index=True)
+    params = {k: best[k] for k in ("rsi_window", "rsi_threshold", "macd_fast", "macd_slow", "macd_signal")}
+    return sweep, params, best_metrics
+
+def sector_summary(per_ticker: pd.DataFrame) -> pd.DataFrame:
+    """Per-sector results: mean/median return, pooled hit rate, drawdown."""
+    grouped = per_ticker.groupby("sector")
+    summary = pd.DataFrame({
+        "tickers": grouped.size(),
+        "mean_return": grouped["total_return"].mean(),
+        "median_return": grouped["total_return"].median(),
+        "buy_hold_return": grouped["buy_hold_return"].mean(),
+        "hit_rate": grouped["wins"].sum() / grouped["trades"].sum().replace(0, np.nan),
+        "mean_max_drawdown": grouped["max_drawdown"].mean(),
+        "worst_drawdown": grouped["max_drawdown"].min(),
+        "trades": grouped["trades"].sum(),
+    })
+    return summary.sort_values("mean_return", ascending=False)
+
+def run_backtest(grid: List[Dict[str, Any]], period: str = "5y", cost_bps: float = 0.0,
+                 rank: str = "mean_return", csv_dir: str = None, workers: int = 1) -> Dict[str, pd.DataFrame]:
+    """Loads the universe's history and runs the sweep; prints and returns the result tables."""
+    print("--- Backtest ---")
+    universe = load_universe()
+    tickers = list(universe.index)
+    print(f"Loading {period} of history for {len(tickers)} tickers...", flush=True)
+    panel, errors = load_history_panel(tickers, period=period)
+    for error in errors:
+        print(f"  Skipping {error}", flush=True)
+    tickers = [t for t in tickers if not panel.empty and t in panel.columns.get_level_values(0)]
+    if not tickers:
+        print("No history to backtest.")
+        return {}
+
+    close = close_matrix(panel, tickers)
+    start = time.perf_counter()
+    sweep, best, metrics = run_sweep(close, grid, cost=cost_bps / 10000, rank=rank, workers=workers)
+    elapsed = time.perf_counter() - start
+    print(f"Evaluated {len(grid)} parameter sets x {len(tickers)} tickers x {close.shape[0]} bars "
+          f"in {elapsed:.2f}s.", flush=True)
+
+    per_ticker = pd.DataFrame(metrics, index=pd.Index(tickers, name="ticker"))
+    per_ticker.insert(0, "sector", universe.loc[tickers, "sector"].fillna("Unknown"))
+    per_sector = sector_summary(per_ticker)
+    results = {"sweep": sweep, "per_ticker": per_ticker.sort_values("total_return", ascending=False),
+               "per_sector": per_sector}
+
+    with pd.option_context("display.width", 160, "display.max_columns", 20, "display.float_format", "{:.4f}".format):
+        if len(sweep) > 1:
+            print(f"\nTop parameter sets by {rank}:")
+            print(sweep.head(10).to_string(index=False))
+        print(f"\nParameters: {best}  (cost {cost_bps} bps per trade)")
+        print("\nPer sector:")
+        print(per_sector.to_string())
+        print("\nPer ticker:")
+        print(results["per_ticker"].drop(columns="wins").to_string())
+
+    if csv_dir:
+        os.makedirs(csv_dir, exist_ok=True)
+        for name, frame in results.items():
+            frame.to_csv(os.path.join(csv_dir, f"backtest_{name}.csv"), index=name != "sweep")
+        print(f"\nWrote backtest_sweep.csv, backtest_per_ticker.csv and backtest_per_sector.csv to {csv_dir}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the MACD/RSI strategy over the pattas_list universe")
+    parser.add_argument("--period", default="5y", help="history window, e.g. 2y, 5y (default %(default)s)")
+    parser.add_argument("--rsi-window", default=str(RSI_WINDOW), help="RSI windows: 14, 7,14,21 or 7:21:7")
+    parser.add_argument("--rsi-threshold", default=str(RSI_OVERBOUGHT), help="overbought levels, e.g. 60:80:5")
+    parser.add_argument("--macd-fast", default=str(MACD_FAST), help="MACD fast spans")
+    parser.add_argument("--macd-slow", default=str(MACD_SLOW), help="MACD slow spans")
+    parser.add_argument("--macd-signal", default=str(MACD_SIGNAL), help="MACD signal spans")
+    parser.add_argument("--cost-bps", type=float, default=0.0, help="cost per position change, in basis points")
+    parser.add_argument("--rank", default="mean_return",
+                        choices=("mean_return", "median_return", "hit_rate", "mean_max_drawdown"),
+                        help="metric that picks the best parameter set")
+    parser.add_argument("--csv-dir", help="also write the sweep, per-ticker and per-sector tables as CSV")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for large sweeps (default: CPU count)")
+    args = parser.parse_args()
+
+    grid = param_grid(parse_values(args.rsi_window), parse_values(args.rsi_threshold, float),
+                      parse_values(args.macd_fast), parse_values(args.macd_slow), parse_values(args.macd_signal))
+    run_backtest(grid, period=args.period, cost_bps=args.cost_bps, rank=args.rank, csv_dir=args.csv_dir,
+                 workers=args.workers)
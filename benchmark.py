@@ -0,0 +1,185 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+
+# --- Pipeline Benchmark ---
+# Runs the market-update pipeline against an offline data source (see
+# offline_providers.py) at several universe sizes. Every size runs in its own
+# process on a fresh database, so caches start cold and peak RSS is its own:
+#   cold  app.invoke() end to end: full history, every fundamental fetched,
+#         every article scored
+#   warm  the four nodes called one at a time on the same database, like the
+#         second scan of the day (incremental history, cached fundamentals,
+#         already-scored articles)
+# Each benchmark appends one JSON line to --output, so runs can be compared
+# over time (same sizes, source and settings).
+
+DEFAULT_SIZES = (50, 500, 5000)
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results.jsonl")
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _events_since(path: str, offset: int, event: str) -> List[Dict[str, Any]]:
+    with open(path) as f:
+        f.seek(offset)
+        return [e for e in map(json.loads, f) if e["event"] == event]
+
+def _phase(name: str, size: int, events_path: str, run: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Runs one pass with its progress output silenced and returns its measurements."""
+    import instrumentation
+
+    instrumentation.run_started(f"bench-{size}-{name}")
+    offset = os.path.getsize(events_path)
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        state = run()
+    wall = time.perf_counter() - start
+    stats = instrumentation.summary()
+
+    batches = _events_since(events_path, offset, "sentiment_batch")
+    scored = sum(b["scored"] for b in batches)
+    scoring_s = sum(b["elapsed_s"] for b in batches)
+    writes = {table: s["total"] for table, s in stats.get("sqlite", {}).items()}
+    return {
+        "wall_s": round(wall, 3),
+        "tickers_per_sec": round(size / wall, 1),
+        "nodes": {
+            node: {"seconds": s["total"], "tickers_per_sec": round(size / s["total"], 1) if s["total"] else None}
+            for node, s in stats.get("node", {}).items()
+        },
+        "sqlite_write_s": round(sum(writes.values()), 4),
+        "sqlite_writes": writes,
+        "sentiment": {
+            "articles_scored": scored,
+            "seconds": round(scoring_s, 4),
+            "articles_per_sec": round(scored / scoring_s, 1) if scoring_s else None,
+        },
+        "upstream": stats.get("upstream", {}),
+        "errors": len(state.get("errors") or []),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+def run_worker(size: int, result_path: str):
+    """One universe size, inside the child process set up by run_benchmark()."""
+    import config
+    import instrumentation
+    import offline_providers
+
+    tickers = (offline_providers.recorded_tickers() if config.DATA_SOURCE == "replay"
+               else offline_providers.synthetic_tickers(size))[:size]
+    offline_providers.seed_universe(config.DB_PATH, tickers)
+    events_path = os.path.join(os.path.dirname(config.DB_PATH), "events.jsonl")
+    instrumentation.configure(events_path)
+
+    import market_update_graph as graph
+
+    def cold():
+        return graph.app.invoke({"tickers": [], "processed_data": [], "errors": []})
+
+    def warm():
+        state = {"tickers": [], "processed_data": [], "errors": []}
+        for name, func in (("fetch_universe", graph.fetch_universe),
+                           ("fetch_market", graph.fetch_market_data_and_technicals),
+                           ("fetch_sentiment", graph.fetch_sentiment_today),
+                           ("update_db", graph.update_database)):
+            state.update(instrumentation.node(name, func)(state))
+        return state
+
+    result = {"tickers": len(tickers)}
+    result["cold"] = _phase("cold", len(tickers), events_path, cold)
+    result["warm"] = _phase("warm", len(tickers), events_path, warm)
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def _print_result(result: Dict[str, Any]):
+    for phase in ("cold", "warm"):
+        r = result[phase]
+        nodes = "  ".join(f"{node}={n['tickers_per_sec']}/s" for node, n in r["nodes"].items())
+        print(f"  {phase}: wall={r['wall_s']}s ({r['tickers_per_sec']} tickers/s)  {nodes}", flush=True)
+        print(f"        sqlite writes={r['sqlite_write_s']}s  sentiment={r['sentiment']['articles_scored']} articles "
+              f"@ {r['sentiment']['articles_per_sec']}/s  errors={r['errors']}  peak RSS={r['peak_rss_mb']} MB", flush=True)
+
+def run_benchmark(sizes: List[int], source: str = "synthetic", output: str = DEFAULT_OUTPUT, rate: float = 1000.0) -> Dict[str, Any]:
+    """Benchmarks each universe size in a fresh process and appends the results to `output`."""
+    import config
+
+    overrides = {"PATTAS_DATA_SOURCE": source, "PATTAS_EVENTS": ""}
+    if rate:
+        for host in ("YAHOO", "NSE"):
+            overrides[f"PATTAS_{host}_RATE"] = str(rate)
+            overrides[f"PATTAS_{host}_BURST"] = str(max(1, int(rate)))
+
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix=f"pattas-bench-{size}-") as workdir:
+            env = dict(os.environ, **overrides,
+                       PATTAS_DB_PATH=os.path.join(workdir, "pattas_list.db"),
+                       PATTAS_CHECKPOINT_DB_PATH=os.path.join(workdir, "pattas_checkpoints.db"))
+            result_path = os.path.join(workdir, "result.json")
+            print(f"Benchmarking {size} tickers ({source})...", flush=True)
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", str(size),
+                                   "--result", result_path], env=env, cwd=workdir)
+            if proc.returncode != 0:
+                print(f"  Benchmark for {size} tickers failed with code {proc.returncode}", flush=True)
+                results.append({"tickers": size, "error": f"exit code {proc.returncode}"})
+                continue
+            with open(result_path) as f:
+                result = json.load(f)
+        _print_result(result)
+        results.append(result)
+
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "source": source,
+        "settings": {
+            "upstream_rate": rate or None,
+            "max_workers": config.MAX_WORKERS,
+            "history_chunk_size": config.HISTORY_CHUNK_SIZE,
+            "sentiment_backend": config.SENTIMENT_BACKEND,
+            "sentiment_workers": config.SENTIMENT_WORKERS,
+            "offline_latency_ms": config.OFFLINE_LATENCY_MS,
+            "offline_error_rate": config.OFFLINE_ERROR_RATE,
+            "offline_throttle_rate": config.OFFLINE_THROTTLE_RATE,
+        },
+        "results": results,
+    }
+    with open(output, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"Results appended to {output}", flush=True)
+    return record
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the market-update pipeline on offline data")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated universe sizes (default %(default)s)")
+    parser.add_argument("--source", choices=("synthetic", "replay"), default="synthetic",
+                        help="offline data source; replay uses the tickers recorded in PATTAS_FIXTURES_DIR")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="upstream requests/second for the governor (default %(default)s; 0 keeps the configured limits)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON-lines file the results are appended to")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.result)
+    else:
+        run_benchmark([int(s) for s in args.sizes.split(",") if s.strip()], args.source, args.output, args.rate)
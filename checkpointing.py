@@ -0,0 +1,163 @@
+import json
+import threading
+import time
+import uuid
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.config import get_config
+
+import config
+import storage
+
+# --- Run Checkpointing ---
+# Graph runs are compiled with a SqliteSaver, so LangGraph persists the state
+# after every node under the run's thread_id. Finer grained, nodes record a
+# progress marker (with its result) per ticker as it completes, so a resumed
+# node only processes the tickers the crashed attempt had not finished.
+# Everything lives in config.CHECKPOINT_DB_PATH, away from the dashboard's DB.
+# Each checkpoint holds the full state (processed_data, errors), so a run's
+# checkpoints and markers are dropped once it completes or is abandoned.
+
+def _connect():
+    # LangGraph calls the saver from its own worker threads
+    conn = storage.connect(config.CHECKPOINT_DB_PATH, check_same_thread=False)
+    ensure_run_tables(conn)
+    return conn
+
+def ensure_run_tables(conn):
+    """Creates the run registry and the per-ticker progress markers."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS graph_runs (
+            thread_id TEXT PRIMARY KEY,
+            graph TEXT NOT NULL,
+            run_date DATE NOT NULL,
+            status TEXT NOT NULL CHECK(status IN ('running', 'completed', 'abandoned')),
+            started_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS run_progress (
+            thread_id TEXT NOT NULL,
+            node TEXT NOT NULL,
+            ticker_symbol TEXT NOT NULL,
+            result TEXT NOT NULL,       -- JSON payload the node needs to skip this ticker
+            recorded_at REAL NOT NULL,
+            PRIMARY KEY (thread_id, node, ticker_symbol)
+        )
+    """)
+    conn.commit()
+
+def open_checkpointer() -> SqliteSaver:
+    """The persistent LangGraph checkpointer for compiled graphs."""
+    return SqliteSaver(_connect())
+
+def start_run(graph: str, force_new: bool = False, thread_id: str = None) -> Tuple[str, bool]:
+    """
+    Picks the thread to run: the given `thread_id`, else today's unfinished
+    run of `graph` (resumed), else a new one. Unfinished runs from earlier
+    days are marked abandoned, because their data would be stored under today's date.
+    Returns (thread_id, resumed).
+    """
+    conn = _connect()
+    today = date.today().isoformat()
+    now = time.time()
+    with conn:
+        conn.execute("""
+            UPDATE graph_runs SET status = 'abandoned', updated_at = ?
+            WHERE graph = ? AND status = 'running' AND run_date < ?
+        """, (now, graph, today))
+        if thread_id is None and not force_new:
+            row = conn.execute("""
+                SELECT thread_id FROM graph_runs
+                WHERE graph = ? AND status = 'running' AND run_date = ?
+                ORDER BY started_at DESC LIMIT 1
+            """, (graph, today)).fetchone()
+            thread_id = row[0] if row else None
+        resumed = thread_id is not None and conn.execute(
+            "SELECT 1 FROM graph_runs WHERE thread_id = ?", (thread_id,)).fetchone() is not None
+        if not resumed:
+            thread_id = thread_id or f"{graph}-{today}-{uuid.uuid4().hex[:8]}"
+            conn.execute("""
+                INSERT INTO graph_runs (thread_id, graph, run_date, status, started_at, updated_at)
+                VALUES (?, ?, ?, 'running', ?, ?)
+            """, (thread_id, graph, today, now, now))
+    prune_finished_runs(conn)
+    conn.close()
+    return thread_id, resumed
+
+def finish_run(thread_id: str):
+    """Marks a run completed; its checkpoints and progress markers are no longer needed."""
+    conn = _connect()
+    with conn:
+        conn.execute("UPDATE graph_runs SET status = 'completed', updated_at = ? WHERE thread_id = ?",
+                     (time.time(), thread_id))
+    prune_finished_runs(conn)
+    conn.close()
+
+def prune_finished_runs(conn) -> int:
+    """
+    Drops the LangGraph checkpoints and progress markers of every run that
+    can no longer be resumed (completed or abandoned). Returns the run count.
+    """
+    saver = SqliteSaver(conn)
+    saver.setup()
+    finished = [row[0] for row in conn.execute("""
+        SELECT DISTINCT c.thread_id FROM checkpoints c JOIN graph_runs r ON r.thread_id = c.thread_id
+        WHERE r.status != 'running'
+    """)]
+    for thread_id in finished:
+        saver.delete_thread(thread_id)
+    with conn:
+        conn.execute("""
+            DELETE FROM run_progress
+            WHERE thread_id IN (SELECT thread_id FROM graph_runs WHERE status != 'running')
+        """)
+    return len(finished)
+
+class ProgressMarkers:
+    """Per-ticker completion markers for one node of one run (thread-safe)."""
+
+    def __init__(self, thread_id: str, node: str):
+        self.thread_id = thread_id
+        self.node = node
+        self.conn = _connect()
+        self.lock = threading.Lock()
+
+    def done(self) -> Dict[str, Any]:
+        """{ticker: result} for every ticker this node already finished in this run."""
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT ticker_symbol, result FROM run_progress WHERE thread_id = ? AND node = ?
+            """, (self.thread_id, self.node)).fetchall()
+        return {ticker: json.loads(result) for ticker, result in rows}
+
+    def record(self, ticker: str, result: Any):
+        """Marks `ticker` finished; committed at once so a crash right after keeps it."""
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO run_progress (thread_id, node, ticker_symbol, result, recorded_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (self.thread_id, self.node, ticker, json.dumps(result, default=str), time.time()))
+
+    def record_many(self, results: Dict[str, Any]):
+        """record() for several tickers in one commit."""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO run_progress (thread_id, node, ticker_symbol, result, recorded_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(self.thread_id, self.node, t, json.dumps(r, default=str), now) for t, r in results.items()])
+
+    def close(self):
+        self.conn.close()
+
+def node_progress(node: str) -> Optional[ProgressMarkers]:
+    """Markers for `node` in the current graph run, or None outside a checkpointed run."""
+    try:
+        thread_id = get_config().get("configurable", {}).get("thread_id")
+    except RuntimeError:
+        return None
+    return ProgressMarkers(thread_id, node) if thread_id else None
@@ -0,0 +1,100 @@
+import os
+
+# --- Runtime Settings ---
+# Every value can be overridden through the environment so the dashboard and
+# cron jobs can tune a run without code changes.
+
+# SQLite database shared by the scripts and the dashboard. Defaults to the
+# file next to these modules, so scripts work from any working directory.
+DB_PATH = os.environ.get("PATTAS_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "pattas_list.db"))
+
+# LangGraph checkpoints and per-ticker run progress, kept out of the dashboard DB.
+CHECKPOINT_DB_PATH = os.environ.get("PATTAS_CHECKPOINT_DB_PATH", os.path.join(os.path.dirname(DB_PATH), "pattas_checkpoints.db"))
+
+# Upper bound on concurrent per-ticker workers. The work is network bound,
+# so threads scale well until the upstream rate limit is reached.
+MAX_WORKERS = max(1, int(os.environ.get("PATTAS_MAX_WORKERS", "8")))
+
+# Symbols per multi-ticker history download. Larger chunks mean fewer
+# round trips; smaller chunks limit the blast radius of a failed request.
+HISTORY_CHUNK_SIZE = max(1, int(os.environ.get("PATTAS_HISTORY_CHUNK_SIZE", "50")))
+
+# Upstream used for price history and for quote/fundamentals: "yfinance" or
+# "nse". The other one is only used when the configured provider fails.
+HISTORY_PROVIDER = os.environ.get("PATTAS_HISTORY_PROVIDER", "yfinance")
+QUOTE_PROVIDER = os.environ.get("PATTAS_QUOTE_PROVIDER", "yfinance")
+
+# Per-ticker sentiment aggregates stored article scores published within this
+# many days (0 = no window, every stored article). A ticker with nothing in
+# the window falls back to its latest FALLBACK_ARTICLES articles (0 = None),
+# like the feed-only scoring did. A positive half-life weights newer articles
+# more; 0 = plain mean.
+SENTIMENT_WINDOW_DAYS = float(os.environ.get("PATTAS_SENTIMENT_WINDOW_DAYS", "7"))
+SENTIMENT_FALLBACK_ARTICLES = max(0, int(os.environ.get("PATTAS_SENTIMENT_FALLBACK_ARTICLES", "10")))
+SENTIMENT_HALF_LIFE_DAYS = float(os.environ.get("PATTAS_SENTIMENT_HALF_LIFE_DAYS", "0"))
+
+# Stored news articles (see news_store.py) older than this many days are
+# pruned after each scan; 0 keeps them all.
+NEWS_RETENTION_DAYS = float(os.environ.get("PATTAS_NEWS_RETENTION_DAYS", "90"))
+
+# Article scoring backend: "textblob", or "lexicon" for the precompiled port
+# of TextBlob's pattern lexicon (same polarity scale, much faster). Batches
+# are scored across this many processes.
+SENTIMENT_BACKEND = os.environ.get("PATTAS_SENTIMENT_BACKEND", "textblob")
+SENTIMENT_WORKERS = max(1, int(os.environ.get("PATTAS_SENTIMENT_WORKERS", str(os.cpu_count() or 1))))
+
+# Request governor (see request_governor.py): (requests per second, burst)
+# per upstream host. The rate adapts down on throttling and back up to this.
+UPSTREAM_LIMITS = {
+    "yahoo": (float(os.environ.get("PATTAS_YAHOO_RATE", "4")), int(os.environ.get("PATTAS_YAHOO_BURST", "8"))),
+    "nse": (float(os.environ.get("PATTAS_NSE_RATE", "2")), int(os.environ.get("PATTAS_NSE_BURST", "4"))),
+    "default": (2.0, 4),
+}
+GOVERNOR_MIN_RATE_FACTOR = 0.1  # adaptive rate never drops below 10% of the configured rate
+GOVERNOR_MAX_RETRIES = int(os.environ.get("PATTAS_MAX_RETRIES", "3"))
+GOVERNOR_BACKOFF_BASE = 0.5     # seconds; doubled per retry, with jitter
+GOVERNOR_BACKOFF_CAP = 30.0
+GOVERNOR_BREAKER_THRESHOLD = int(os.environ.get("PATTAS_BREAKER_THRESHOLD", "5"))
+GOVERNOR_BREAKER_RESET_SECONDS = float(os.environ.get("PATTAS_BREAKER_RESET_SECONDS", "60"))
+
+# Streaming mode (market_update_graph.py --stream): bounded queue size between
+# stages, and rows per micro-batch commit (or after this many seconds).
+STREAM_QUEUE_SIZE = max(1, int(os.environ.get("PATTAS_STREAM_QUEUE_SIZE", "64")))
+STREAM_BATCH_SIZE = max(1, int(os.environ.get("PATTAS_STREAM_BATCH_SIZE", "20")))
+STREAM_FLUSH_SECONDS = float(os.environ.get("PATTAS_STREAM_FLUSH_SECONDS", "2"))
+
+# Sharded runs (market_update_graph.py --shard i/N, see sharding.py): split
+# the universe by a stable hash of the ticker ("hash") or by whole sectors
+# ("sector"). Shard results wait in SHARD_DIR for the merge; on several
+# machines, point it at a directory they all share.
+SHARD_BY = os.environ.get("PATTAS_SHARD_BY", "hash")
+SHARD_DIR = os.environ.get("PATTAS_SHARD_DIR", os.path.join(os.path.dirname(DB_PATH), "shards"))
+
+# Trading calendar and scheduler (trading_calendar.py, scheduler.py): the
+# holiday/hours file, minutes after the close before a day's bar is treated as
+# final, the daemon's cron schedule (in exchange time) and the random delay
+# added to each scheduled run so several hosts don't hit upstream at once.
+CALENDAR_PATH = os.environ.get("PATTAS_CALENDAR_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "nse_calendar.json"))
+SESSION_SETTLE_MINUTES = float(os.environ.get("PATTAS_SESSION_SETTLE_MINUTES", "30"))
+SCHEDULE = os.environ.get("PATTAS_SCHEDULE", "15 16 * * 1-5")
+SCHEDULE_JITTER_SECONDS = float(os.environ.get("PATTAS_SCHEDULE_JITTER_SECONDS", "300"))
+
+# Warm scan server (scan_server.py) and its client (scan_client.py).
+SCAN_SERVER_HOST = os.environ.get("PATTAS_SCAN_SERVER_HOST", "127.0.0.1")
+SCAN_SERVER_PORT = int(os.environ.get("PATTAS_SCAN_SERVER_PORT", "8765"))
+SCAN_SERVER_URL = os.environ.get("PATTAS_SCAN_SERVER_URL", f"http://{SCAN_SERVER_HOST}:{SCAN_SERVER_PORT}")
+
+# Structured JSON-lines progress events and the end-of-run timing summary
+# (see instrumentation.py): a file path, "-" for stderr, or empty to disable.
+EVENTS_PATH = os.environ.get("PATTAS_EVENTS", "")
+
+# Where market data comes from: "live" (yfinance / NSE), "record" (live, and
+# every response is saved under FIXTURES_DIR), "replay" (served from
+# FIXTURES_DIR, no network) or "synthetic" (generated, no network). Offline
+# responses get this injected latency and these error/throttle rates.
+DATA_SOURCE = os.environ.get("PATTAS_DATA_SOURCE", "live")
+FIXTURES_DIR = os.environ.get("PATTAS_FIXTURES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures"))
+OFFLINE_LATENCY_MS = float(os.environ.get("PATTAS_OFFLINE_LATENCY_MS", "0"))
+OFFLINE_ERROR_RATE = float(os.environ.get("PATTAS_OFFLINE_ERROR_RATE", "0"))
+OFFLINE_THROTTLE_RATE = float(os.environ.get("PATTAS_OFFLINE_THROTTLE_RATE", "0"))
+OFFLINE_SEED = int(os.environ.get("PATTAS_OFFLINE_SEED", "0"))
@@ -1,7 +1,41 @@
 import { spawn } from 'child_process';
 import { NextResponse } from 'next/server';
 
+// When set (e.g. http://127.0.0.1:8765), scans are requested from the warm
+// scan server (scan_server.py) instead of spawning a fresh Python process.
+// Overlapping clicks then join the running scan instead of racing it.
+const SCAN_SERVER_URL = process.env.PATTAS_SCAN_SERVER_URL;
+
+const STREAM_HEADERS = {
+    'Content-Type': 'text/plain; charset=utf-8',
+    'Transfer-Encoding': 'chunked',
+    'X-Content-Type-Options': 'nosniff',
+};
+
+async function requestWarmScan() {
+    try {
+        const upstream = await fetch(`${SCAN_SERVER_URL}/scan`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({}),
+        });
+        if (!upstream.ok || !upstream.body) {
+            console.error(`Scan server answered ${upstream.status}, falling back to spawn`);
+            return null;
+        }
+        return new Response(upstream.body, { headers: STREAM_HEADERS });
+    } catch (err) {
+        console.error('Scan server unreachable, falling back to spawn:', err.message);
+        return null;
+    }
+}
+
 export async function POST() {
+    if (SCAN_SERVER_URL) {
+        const warm = await requestWarmScan();
+        if (warm) return warm;
+    }
+
     const encoder = new TextEncoder();
 
     const stream = new ReadableStream({
@@ -40,11 +74,5 @@ export async function POST() {
         }
     });
 
-    return new Response(stream, {
-        headers: {
-            'Content-Type': 'text/plain; charset=utf-8',
-            'Transfer-Encoding': 'chunked',
-            'X-Content-Type-Options': 'nosniff',
-        },
-    });
+    return new Response(stream, { headers: STREAM_HEADERS });
 }
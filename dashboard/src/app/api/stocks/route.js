@@ -1,42 +1,94 @@
 import Database from 'better-sqlite3';
 import { NextResponse } from 'next/server';
 import path from 'path';
-import fs from 'fs';
 
 // Absolute path to the database
 const BASE_PATH = '/Volumes/vibecoding/pattas_list';
 const DB_PATH = path.join(BASE_PATH, 'pattas_list.db');
-const NEWS_JSON_PATH = path.join(BASE_PATH, 'news_links.json');
 
 export const dynamic = 'force-dynamic';
 export const revalidate = 0;
 
-export async function GET() {
-    try {
-        const db = new Database(DB_PATH, { verbose: console.log });
+// Opened once and reused; WAL lets it read while a scan writes
+let db = null;
+function getDb() {
+    if (!db) {
+        db = new Database(DB_PATH, { fileMustExist: true });
+    }
+    return db;
+}
 
-        // Get latest date from daily_signals
-        const dateRow = db.prepare('SELECT MAX(date) as max_date FROM daily_signals').get();
-        const latestDate = dateRow ? dateRow.max_date : null;
+// Generated per request, never stored: a news search for tickers without articles
+function fallbackNews(ticker) {
+    const safeTicker = ticker.replace('.BO', '').replace('.NS', '');
+    const query = encodeURIComponent(`${safeTicker} share news`);
+    return [{
+        title: `Search Intel: ${safeTicker}`,
+        link: `https://www.google.com/search?q=${query}&tbm=nws`,
+        publisher: "Google News Search",
+        time: Math.floor(Date.now() / 1000),
+        summary: `No direct news feed detected for ${safeTicker}. This fallback link will execute a secure search for the latest market intelligence on Google News.`
+    }];
+}
 
-        if (!latestDate) {
-            return NextResponse.json({ error: 'No data found' }, { status: 404 });
+function groupBySector(rows) {
+    return rows.reduce((acc, row) => {
+        const sector = row.sector || 'Uncategorized';
+        if (!acc[sector]) {
+            acc[sector] = [];
+        }
+        if (!row.news_list || row.news_list.length === 0) {
+            row.news_list = fallbackNews(row.ticker_symbol);
         }
+        acc[sector].push(row);
+        return acc;
+    }, {});
+}
+
+// Snapshot kept by the Python writers (signal_snapshot.py): one row per
+// ticker, read as a single index range scan with no aggregate or join
+function snapshotRows(db, date) {
+    const rows = db.prepare(`
+      SELECT
+        ticker_symbol, company_name, sector, market_cap, p_e_ratio,
+        fii_pct, dii_pct, owner_pct,
+        price, rsi, macd_signal, sentiment_score, status,
+        held_pct_insiders, trailing_pe, news_json
+      FROM latest_signals
+      WHERE date = ?
+      ORDER BY sector ASC, company_name ASC
+    `).all(date);
+
+    for (const row of rows) {
+        row.news_list = row.news_json ? JSON.parse(row.news_json) : [];
+        delete row.news_json;
+    }
+    return rows;
+}
+
+// Databases no scan has written since the snapshot was introduced (no news yet)
+function legacyRows(db) {
+    // Get latest date from daily_signals
+    const dateRow = db.prepare('SELECT MAX(date) as max_date FROM daily_signals').get();
+    const latestDate = dateRow ? dateRow.max_date : null;
+    if (!latestDate) {
+        return { rows: [], date: null };
+    }
 
-        const query = `
-      SELECT 
-        p.ticker_symbol, 
-        p.company_name, 
-        p.sector, 
-        p.market_cap, 
-        p.p_e_ratio, 
-        p.fii_pct, 
-        p.dii_pct, 
+    const query = `
+      SELECT
+        p.ticker_symbol,
+        p.company_name,
+        p.sector,
+        p.market_cap,
+        p.p_e_ratio,
+        p.fii_pct,
+        p.dii_pct,
         p.owner_pct,
-        d.price, 
-        d.rsi, 
-        d.macd_signal, 
-        d.sentiment_score, 
+        d.price,
+        d.rsi,
+        d.macd_signal,
+        d.sentiment_score,
         d.status,
         d.held_pct_insiders,
         d.trailing_pe
@@ -45,52 +97,46 @@ export async function GET() {
       WHERE d.date = ?
       ORDER BY p.sector ASC, p.company_name ASC
     `;
+    const rows = db.prepare(query).all(latestDate);
+    return { rows, date: latestDate };
+}
 
-        const rows = db.prepare(query).all(latestDate);
-
-        // Read News Links JSON
-        let newsMap = {};
-        if (fs.existsSync(NEWS_JSON_PATH)) {
-            try {
-                const raw = fs.readFileSync(NEWS_JSON_PATH, 'utf-8');
-                newsMap = JSON.parse(raw);
-            } catch (e) {
-                console.error("Failed to read news_links.json", e);
-            }
-        }
-
-        // Merge News Links & Group by Sector
-        const grouped = rows.reduce((acc, row) => {
-            const sector = row.sector || 'Uncategorized';
-            if (!acc[sector]) {
-                acc[sector] = [];
-            }
+function snapshotMeta(db) {
+    try {
+        return db.prepare('SELECT version, date FROM snapshot_meta WHERE id = 1').get() || null;
+    } catch (e) {
+        return null; // no snapshot table yet
+    }
+}
 
-            // Inject News List (Handle both Array and Legacy String formats)
-            const newsData = newsMap[row.ticker_symbol];
+export async function GET(request) {
+    try {
+        const db = getDb();
+        const meta = snapshotMeta(db);
 
-            if (Array.isArray(newsData)) {
-                row.news_list = newsData;
-            } else if (typeof newsData === 'string') {
-                // Legacy support for when we just stored a URL string
-                row.news_list = [{
-                    title: "Latest News",
-                    link: newsData,
-                    publisher: "External",
-                    time: Date.now() / 1000
-                }];
-            } else {
-                row.news_list = [];
+        let rows, latestDate, etag = null;
+        if (meta) {
+            // Nothing written since the client's copy: skip the rows entirely
+            // (browsers revalidate with If-None-Match because of no-cache)
+            etag = `"${meta.version}"`;
+            if (request.headers.get('if-none-match') === etag) {
+                return new NextResponse(null, { status: 304, headers: { ETag: etag, 'Cache-Control': 'no-cache' } });
             }
+            latestDate = meta.date;
+            rows = latestDate ? snapshotRows(db, latestDate) : [];
+        } else {
+            ({ rows, date: latestDate } = legacyRows(db));
+        }
 
-            acc[sector].push(row);
-            return acc;
-        }, {});
+        if (!latestDate) {
+            return NextResponse.json({ error: 'No data found' }, { status: 404 });
+        }
 
         return NextResponse.json({
-            data: grouped,
-            date: latestDate
-        });
+            data: groupBySector(rows),
+            date: latestDate,
+            version: meta ? meta.version : null
+        }, { headers: etag ? { ETag: etag, 'Cache-Control': 'no-cache' } : {} });
 
     } catch (error) {
         console.error('Database Error:', error);
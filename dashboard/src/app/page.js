@@ -19,8 +19,8 @@ export default function Home() {
     try {
       // Clear current data to show reloading state
       setData(null);
-      // Cache-buster to ensure fresh data from API
-      const res = await fetch(`/api/stocks?t=${Date.now()}`, { cache: 'no-store' });
+      // Always revalidated: an unchanged snapshot comes back as a cheap 304
+      const res = await fetch('/api/stocks', { cache: 'no-cache' });
       if (!res.ok) throw new Error('Failed to fetch data');
       const json = await res.json();
       setData(json.data);
@@ -0,0 +1,172 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import config
+import instrumentation
+import storage
+from providers import fetch_fundamentals
+
+# --- Field TTLs (seconds) ---
+# Fundamentals change at most daily; shareholding patterns only quarterly.
+HOUR = 3600
+DAY = 24 * HOUR
+FIELD_TTLS = {
+    "trailingPE": DAY,
+    "marketCap": DAY,
+    "heldPercentInsiders": 7 * DAY,
+    "heldPercentInstitutions": 7 * DAY,
+    "currentPrice": 15 * 60,
+}
+DEFAULT_TTL = DAY
+
+# Past its TTL, an entry is still served for this multiple of the TTL while a
+# background refresh runs (stale-while-revalidate). Beyond it, callers wait.
+STALE_FACTOR = 3
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fundamentals-refresh")
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+def _connect() -> sqlite3.Connection:
+    conn = storage.connect()
+    ensure_fundamentals_table(conn)
+    return conn
+
+def ensure_fundamentals_table(conn: sqlite3.Connection):
+    """Creates the per-field fundamentals cache table if needed."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fundamentals_cache (
+            ticker_symbol TEXT NOT NULL,
+            field TEXT NOT NULL,
+            value TEXT,             -- JSON encoded, null when upstream had no value
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (ticker_symbol, field)
+        )
+    """)
+
+def _ttl(field: str) -> float:
+    return FIELD_TTLS.get(field, DEFAULT_TTL)
+
+def _read(conn: sqlite3.Connection, ticker: str, fields: List[str]) -> Dict[str, tuple]:
+    placeholders = ",".join("?" * len(fields))
+    rows = conn.execute(f"""
+        SELECT field, value, fetched_at FROM fundamentals_cache
+        WHERE ticker_symbol = ? AND field IN ({placeholders})
+    """, (ticker, *fields)).fetchall()
+    return {field: (json.loads(value) if value is not None else None, fetched_at)
+            for field, value, fetched_at in rows}
+
+def _fetch_and_store(ticker: str, fields: List[str]) -> Dict[str, Any]:
+    """Makes the single upstream fundamentals request and caches every known field."""
+    info = fetch_fundamentals(ticker, fields)
+    now = time.time()
+    stored = {f: info.get(f) for f in set(FIELD_TTLS) | set(fields)}
+    conn = _connect()
+    with storage.timed_write("fundamentals_cache"):
+        conn.executemany("""
+            INSERT OR REPLACE INTO fundamentals_cache (ticker_symbol, field, value, fetched_at)
+            VALUES (?, ?, ?, ?)
+        """, [(ticker, f, json.dumps(v), now) for f, v in stored.items()])
+        conn.commit()
+    conn.close()
+    return stored
+
+def _revalidate(ticker: str, fields: List[str]):
+    """Background refresh; at most one in flight per ticker."""
+    with _in_flight_lock:
+        if ticker in _in_flight:
+            return
+        _in_flight.add(ticker)
+
+    def run():
+        try:
+            _fetch_and_store(ticker, fields)
+        except Exception as e:
+            print(f"  Background fundamentals refresh failed for {ticker}: {e}", flush=True)
+        finally:
+            with _in_flight_lock:
+                _in_flight.discard(ticker)
+
+    _refresh_pool.submit(run)
+
+def get_fundamentals(ticker: str, fields: List[str]) -> Dict[str, Any]:
+    """
+    Returns {field: value} for the requested `.info` fields, omitting fields
+    upstream has no value for (so `.get(field, default)` behaves like on `.info`).
+
+    - all fields fresh: served from cache, no request;
+    - some stale but within STALE_FACTOR x TTL: served from cache and
+      refreshed in the background;
+    - anything missing or older: one synchronous request to the configured
+      quote provider (see providers.fetch_fundamentals). If that
+      fails, whatever is cached is served; with nothing cached, it raises.
+    """
+    conn = _connect()
+    cached = _read(conn, ticker, fields)
+    conn.close()
+
+    now = time.time()
+    ages = {f: now - cached[f][1] for f in fields if f in cached}
+    values = {f: cached[f][0] for f in fields if f in cached}
+
+    if len(ages) == len(fields) and all(ages[f] <= _ttl(f) for f in fields):
+        instrumentation.note("fundamentals_cache", "hit")
+    elif len(ages) == len(fields) and all(ages[f] <= _ttl(f) * STALE_FACTOR for f in fields):
+        instrumentation.note("fundamentals_cache", "stale")
+        _revalidate(ticker, fields)
+    else:
+        instrumentation.note("fundamentals_cache", "miss")
+        try:
+            fetched = _fetch_and_store(ticker, fields)
+            values = {f: fetched.get(f) for f in fields}
+        except Exception:
+            if not cached:
+                raise
+            print(f"  Fundamentals fetch failed for {ticker}, serving cached values.", flush=True)
+
+    return {f: v for f, v in values.items() if v is not None}
+
+def warm_cache(tickers: List[str], fields: List[str] = None, force: bool = False, max_workers: int = None):
+    """Bulk-refreshes fundamentals for `tickers` concurrently; fresh entries are skipped unless `force`."""
+    fields = fields or list(FIELD_TTLS)
+
+    def warm(ticker):
+        if not force:
+            conn = _connect()
+            cached = _read(conn, ticker, fields)
+            conn.close()
+            now = time.time()
+            if len(cached) == len(fields) and all(now - cached[f][1] <= _ttl(f) for f in fields):
+                return "fresh"
+        _fetch_and_store(ticker, fields)
+        return "fetched"
+
+    def guarded(ticker):
+        try:
+            return ticker, warm(ticker)
+        except Exception as e:
+            return ticker, f"error: {e}"
+
+    with ThreadPoolExecutor(max_workers=max_workers or config.MAX_WORKERS) as pool:
+        for ticker, outcome in pool.map(guarded, tickers):
+            print(f"  {ticker}: {outcome}", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fundamentals cache maintenance")
+    parser.add_argument("--warm", action="store_true", help="refresh stale entries for every ticker in pattas_list")
+    parser.add_argument("--force", action="store_true", help="with --warm, refresh fresh entries too")
+    args = parser.parse_args()
+
+    if args.warm:
+        conn = _connect()
+        tickers = [row[0] for row in conn.execute("SELECT ticker_symbol FROM pattas_list")]
+        conn.close()
+        print(f"Warming fundamentals cache for {len(tickers)} tickers...")
+        warm_cache(tickers, force=args.force)
+    else:
+        parser.print_help()
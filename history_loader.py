@@ -0,0 +1,241 @@
+import sqlite3
+import time
+import pandas as pd
+from typing import Dict, List, Tuple
+
+import config
+import storage
+from providers import HISTORY_FIELDS, fetch_history, period_start
+
+# Minimum bars needed for MACD/RSI to be meaningful
+MIN_BARS = 30
+
+# Relative close-price change on an already cached bar that we treat as a
+# split/dividend re-adjustment rather than float noise.
+ADJUSTMENT_TOLERANCE = 1e-5
+
+# --- Local Price Cache ---
+
+def ensure_price_history_table(conn: sqlite3.Connection):
+    """Creates the local OHLCV cache tables if they do not exist yet."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_history (
+            ticker_symbol TEXT NOT NULL,
+            date DATE NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume REAL,
+            PRIMARY KEY (ticker_symbol, date)
+        )
+    """)
+    # covered_from: start of the last full-window fetch, so a longer period
+    # request (or a cache that fell out of the window) triggers a full re-fetch.
+    # fetched_at: when upstream was last asked, so the scheduler can tell a
+    # settled last bar from one stored while its session was still open.
+    # basis: providers.HISTORY_BASIS of the bars; gaps are filled on the same basis.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS price_history_meta (
+            ticker_symbol TEXT PRIMARY KEY,
+            covered_from DATE NOT NULL,
+            last_date DATE NOT NULL,
+            fetched_at REAL,
+            basis TEXT
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(price_history_meta)")}
+    for column, kind in (("fetched_at", "REAL"), ("basis", "TEXT")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE price_history_meta ADD COLUMN {column} {kind}")
+
+def cached_anchors(conn: sqlite3.Connection, tickers: List[str]) -> Dict[str, Tuple[str, str, float, str]]:
+    """
+    Returns {ticker: (covered_from, anchor_date, anchor_close, basis)} for cached tickers.
+    The anchor is the second-newest cached bar (the newest one may still have
+    been an open session when it was stored), or the only bar if just one exists.
+    """
+    wanted = set(tickers)
+    rows = conn.execute("""
+        SELECT a.ticker_symbol, a.covered_from, p.date, p.close, a.basis
+        FROM (
+            SELECT m.ticker_symbol, m.covered_from, m.basis,
+                   COALESCE((SELECT MAX(date) FROM price_history h
+                             WHERE h.ticker_symbol = m.ticker_symbol AND h.date < m.last_date),
+                            m.last_date) AS anchor
+            FROM price_history_meta m
+        ) a
+        JOIN price_history p ON p.ticker_symbol = a.ticker_symbol AND p.date = a.anchor
+    """).fetchall()
+    return {ticker: (covered_from, day, close, basis)
+            for ticker, covered_from, day, close, basis in rows if ticker in wanted}
+
+def _update_meta(conn: sqlite3.Connection, ticker: str, basis: str, covered_from: str = None):
+    """Records the cached date range (and price basis) for a ticker after a write."""
+    if covered_from is None:
+        # A cache from before bases were recorded takes the basis of its first gap fill
+        conn.execute("""
+            UPDATE price_history_meta
+            SET last_date = (SELECT MAX(date) FROM price_history WHERE ticker_symbol = ?), fetched_at = ?,
+                basis = COALESCE(basis, ?)
+            WHERE ticker_symbol = ?
+        """, (ticker, time.time(), basis, ticker))
+    else:
+        conn.execute("""
+            INSERT OR REPLACE INTO price_history_meta (ticker_symbol, covered_from, last_date, fetched_at, basis)
+            VALUES (?, ?, (SELECT MAX(date) FROM price_history WHERE ticker_symbol = ?), ?, ?)
+        """, (ticker, covered_from, ticker, time.time(), basis))
+
+def _store_frame(conn: sqlite3.Connection, ticker: str, df: pd.DataFrame, replace_all: bool = False):
+    """Writes one ticker's downloaded bars into the cache."""
+    rows = [
+        (ticker, pd.Timestamp(day).strftime("%Y-%m-%d"),
+         *[None if pd.isna(bar[f]) else float(bar[f]) for f in HISTORY_FIELDS])
+        for day, bar in df.iterrows()
+    ]
+    with storage.timed_write("price_history"):
+        if replace_all:
+            conn.execute("DELETE FROM price_history WHERE ticker_symbol = ?", (ticker,))
+        conn.executemany("""
+            INSERT OR REPLACE INTO price_history
+            (ticker_symbol, date, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+def _read_panel(conn: sqlite3.Connection, tickers: List[str], start: str) -> pd.DataFrame:
+    """Builds the wide (date x ticker/field) panel from cached bars since `start`."""
+    if not tickers:
+        return pd.DataFrame()
+    placeholders = ",".join("?" * len(tickers))
+    df = pd.read_sql_query(f"""
+        SELECT ticker_symbol, date, open, high, low, close, volume
+        FROM price_history
+        WHERE date >= ? AND ticker_symbol IN ({placeholders})
+    """, conn, params=[start, *tickers])
+    if df.empty:
+        return pd.DataFrame()
+
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.rename(columns={f.lower(): f for f in HISTORY_FIELDS})
+    panel = df.pivot(index="date", columns="ticker_symbol", values=HISTORY_FIELDS)
+    panel = panel.swaplevel(0, 1, axis=1)
+    panel.index.name = "Date"
+    panel.columns.names = ["Ticker", "Price"]
+    ordered = [t for t in tickers if t in panel.columns.get_level_values(0)]
+    return panel[ordered].sort_index()
+
+# --- Upstream Download ---
+
+def _download_chunked(tickers: List[str], chunk_size: int, period: str = None, start: str = None,
+                      basis: str = None):
+    """Yields (ticker, frame, error, basis) for every ticker, downloading in chunks (only on `basis`, if given)."""
+    for i in range(0, len(tickers), chunk_size):
+        chunk = tickers[i:i + chunk_size]
+        label = f"since {start}" if start else period
+        print(f"  Downloading history ({label}) for {len(chunk)} tickers ({i + 1}-{i + len(chunk)} of {len(tickers)})...", flush=True)
+        df, failed, sources = fetch_history(chunk, period=period, start=start, basis=basis)
+        for ticker in chunk:
+            frame = ticker_frame(df, ticker)
+            if ticker in failed or frame.empty:
+                yield ticker, None, failed.get(ticker, "No Data"), None
+            else:
+                yield ticker, frame, None, sources.get(ticker)
+
+def ticker_frame(panel: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """Returns one ticker's OHLCV frame from the panel, without padding rows."""
+    if panel.empty or ticker not in panel.columns.get_level_values(0):
+        return pd.DataFrame(columns=HISTORY_FIELDS)
+    df = panel[ticker]
+    return df.dropna(subset=["Close"])
+
+# --- Public API ---
+
+def load_history_panel(tickers: List[str], period: str = "6mo",
+                       chunk_size: int = None, min_bars: int = MIN_BARS,
+                       conn: sqlite3.Connection = None) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Loads daily OHLCV for the whole universe, serving it from the local
+    `price_history` cache and downloading only what is missing:
+    - tickers with no cached bars in the window get the full `period`;
+    - cached tickers get only the gap since their second-newest bar, which
+      overlaps one settled bar so re-adjusted history can be detected, and
+      only from a provider with the cached bars' price basis;
+    - a ticker whose overlapping close changed (split/dividend) gets its
+      whole window re-fetched and replaced;
+    - a ticker whose gap fetch fails is reported in `errors`, not served
+      from its (possibly days old) cached bars.
+
+    Returns (panel, errors):
+    - panel: one wide frame indexed by date with (ticker, field) columns,
+      holding only tickers that have at least `min_bars` bars.
+    - errors: "TICKER: reason" entries for symbols that failed, in universe order.
+    """
+    chunk_size = chunk_size or config.HISTORY_CHUNK_SIZE
+    own_conn = conn is None
+    if own_conn:
+        conn = storage.connect()
+    ensure_price_history_table(conn)
+
+    window_start = period_start(period)
+    anchors = cached_anchors(conn, tickers)
+    failures = {}
+
+    # Tickers whose cache does not cover the requested window start from scratch
+    cold = [t for t in tickers
+            if t not in anchors or anchors[t][0] > window_start or anchors[t][1] < window_start]
+    warm = {}
+    for t in tickers:
+        if t not in cold:
+            _, anchor_day, anchor_close, basis = anchors[t]
+            warm.setdefault((anchor_day, basis), []).append((t, anchor_close))
+
+    # 1. Gap fetch for warm tickers, grouped by their anchor date and price
+    # basis: mixing adjusted and raw bars would look like a re-adjustment
+    # and cost a full re-fetch each time the provider changes
+    for (anchor_day, basis), entries in sorted(warm.items(), key=lambda item: (item[0][0], item[0][1] or "")):
+        anchor_closes = dict(entries)
+        for ticker, frame, error, source in _download_chunked(list(anchor_closes), chunk_size,
+                                                              start=anchor_day, basis=basis):
+            if error is not None:
+                # Cached bars alone would pass an old price and signal off as today's
+                print(f"  Gap fetch failed for {ticker}, skipping it: {error}", flush=True)
+                failures[ticker] = f"gap fetch failed: {error}"
+                continue
+
+            overlap = frame[frame.index.strftime("%Y-%m-%d") == anchor_day]
+            cached_close = anchor_closes[ticker]
+            if overlap.empty or abs(overlap["Close"].iloc[0] - cached_close) > ADJUSTMENT_TOLERANCE * abs(cached_close):
+                print(f"  Adjusted history detected for {ticker}, re-fetching window...", flush=True)
+                cold.append(ticker)
+                continue
+            _store_frame(conn, ticker, frame)
+            _update_meta(conn, ticker, source)
+
+    # 2. Full window for cold or re-adjusted tickers, from any provider: the
+    # window is replaced, so it takes the basis of whichever one serves it
+    for ticker, frame, error, source in _download_chunked(cold, chunk_size, period=period):
+        if error is not None:
+            failures[ticker] = error
+            continue
+        _store_frame(conn, ticker, frame, replace_all=True)
+        _update_meta(conn, ticker, source, covered_from=window_start)
+
+    conn.commit()
+    panel = _read_panel(conn, tickers, window_start)
+    if own_conn:
+        conn.close()
+
+    # 3. Keep only tickers with enough history for the indicators
+    keep = []
+    for ticker in tickers:
+        if ticker in failures:
+            continue
+        bars = len(ticker_frame(panel, ticker))
+        if bars >= min_bars:
+            keep.append(ticker)
+        else:
+            failures[ticker] = "Insufficient Data" if bars else "No Data"
+
+    panel = panel[keep] if keep else pd.DataFrame()
+    errors = [f"{t}: {failures[t]}" for t in tickers if t in failures]
+    return panel, errors
@@ -0,0 +1,339 @@
+import argparse
+import sqlite3
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import storage
+from indicators import MACD_FAST, MACD_SIGNAL, MACD_SLOW, RSI_WINDOW, rolling_mean
+
+# --- Indicator Registry ---
+# Each indicator declares the OHLCV fields it reads, its parameters and its
+# output columns, and builds its outputs as expressions over the ops below.
+# Expressions are plain tuples, so two indicators asking for the same
+# intermediate (the close delta, the 12-bar EMA, the 20-bar mean) build the
+# same node and it is computed once. The engine evaluates every indicator
+# together over the (dates x tickers) arrays: array ops (deltas, rolling
+# windows, elementwise maths) run once each in numpy, and all recursive
+# filters (EMAs, Wilder averages) of the same depth advance in one shared loop
+# over the dates. A new indicator adds array work, not another pass.
+# The latest values per ticker go to the wide indicator_values table, keyed
+# like daily_signals; columns are added as indicators are registered.
+
+REGISTRY: Dict[str, dict] = {}
+
+def register(name: str, inputs: Sequence[str], params: Dict[str, float], outputs: Sequence[str]):
+    """
+    Registers `build(**params)`, which returns one expression per output.
+    Outputs are column-name templates formatted with the parameters, e.g. "rsi_{window}".
+    """
+    def decorator(build: Callable):
+        REGISTRY[name] = {"inputs": tuple(inputs), "params": dict(params), "outputs": tuple(outputs), "build": build}
+        return build
+    return decorator
+
+def columns(names: Sequence[str] = None) -> List[str]:
+    """The indicator_values columns of `names` (all registered indicators by default)."""
+    return [output.format(**REGISTRY[name]["params"])
+            for name in names or REGISTRY for output in REGISTRY[name]["outputs"]]
+
+# --- Expression Ops ---
+
+def field(name: str) -> tuple:
+    return ("field", name)
+
+def apply(func: Callable, *args) -> tuple:
+    """Elementwise `func` over expressions (and constants); use module-level functions so equal nodes match."""
+    return ("map", func, *args)
+
+def prev(x: tuple) -> tuple:
+    """The previous bar's value."""
+    return ("prev", x)
+
+def sma(x: tuple, window: int) -> tuple:
+    return ("sma", x, window)
+
+def rolling(x: tuple, window: int, how: str) -> tuple:
+    """Trailing window "max", "min" or "std" (population)."""
+    return ("rolling", x, window, how)
+
+def ema(x: tuple, span: int) -> tuple:
+    """pandas ewm(span, adjust=False), like indicators.ewm()."""
+    return ("ewm", x, 2.0 / (span + 1.0))
+
+def wilder(x: tuple, window: int) -> tuple:
+    """Wilder's smoothing (ATR): an EMA with alpha = 1 / window."""
+    return ("ewm", x, 1.0 / window)
+
+def _sub(a, b):
+    return a - b
+
+def delta(x: tuple) -> tuple:
+    return apply(_sub, x, prev(x))
+
+# --- Evaluation ---
+
+def _prev(x: np.ndarray) -> np.ndarray:
+    out = np.empty_like(x)
+    out[0] = np.nan
+    out[1:] = x[:-1]
+    return out
+
+def _rolling(x: np.ndarray, window: int, how: str) -> np.ndarray:
+    out = np.full_like(x, np.nan)
+    if len(x) >= window:
+        out[window - 1:] = getattr(np, how)(sliding_window_view(x, window, axis=0), axis=-1)
+    return out
+
+def _fused_ewm(inputs: List[np.ndarray], alphas: List[float]) -> np.ndarray:
+    """Every EMA in one loop over the dates; each seeds on its first valid value."""
+    stacked = np.stack(inputs)
+    alpha = np.array(alphas)[:, None]
+    out = np.empty_like(stacked)
+    state = np.full((stacked.shape[0], stacked.shape[2]), np.nan)
+    for i in range(stacked.shape[1]):
+        row = stacked[:, i]
+        state = np.where(np.isnan(state), row, alpha * row + (1 - alpha) * state)
+        out[:, i] = state
+    return out
+
+def _children(node: tuple) -> List[tuple]:
+    return [arg for arg in node[1:] if isinstance(arg, tuple)]
+
+def evaluate(outputs: Dict[str, tuple], arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Computes the `outputs` expressions over the field `arrays`, each shared node once."""
+    # Recursion depth: an EMA of an EMA (the MACD signal line) waits for the first loop
+    depth = {}
+
+    def visit(node):
+        if node not in depth:
+            depth[node] = max((visit(child) for child in _children(node)), default=0) + (node[0] == "ewm")
+        return depth[node]
+
+    for node in outputs.values():
+        visit(node)
+
+    values = {}
+
+    def value(node):
+        if node not in values:
+            op, args = node[0], node[1:]
+            inputs = [value(arg) if isinstance(arg, tuple) else arg for arg in args]
+            if op == "field":
+                values[node] = arrays[args[0]]
+            elif op == "map":
+                values[node] = inputs[0](*inputs[1:])
+            elif op == "prev":
+                values[node] = _prev(inputs[0])
+            elif op == "sma":
+                values[node] = rolling_mean(inputs[0], inputs[1])
+            elif op == "rolling":
+                values[node] = _rolling(*inputs)
+            else:
+                raise ValueError(f"unscheduled op {op!r}")
+        return values[node]
+
+    # NaN-led columns and flat windows give NaN or inf, never an error
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for level in range(1, max(depth.values(), default=0) + 1):
+            group = [node for node, d in depth.items() if node[0] == "ewm" and d == level]
+            for node, result in zip(group, _fused_ewm([value(node[1]) for node in group], [node[2] for node in group])):
+                values[node] = result
+        return {name: value(node) for name, node in outputs.items()}
+
+def field_arrays(panel: pd.DataFrame, tickers: List[str], fields: Sequence[str]):
+    """
+    The (dates x tickers) arrays of `fields`, right-aligned on each ticker's
+    Close bars like indicators.close_matrix(), and each ticker's last bar date.
+    """
+    def matrix(f):
+        # One cross-section per field rather than a lookup per (ticker, field) column
+        return panel.xs(f, axis=1, level=1).reindex(columns=tickers).to_numpy(dtype=float)
+
+    raw = {f: matrix(f) for f in fields}
+    close = raw["Close"] if "Close" in raw else matrix("Close")
+    # One order for every field, so a ticker's OHLCV stay on the same bar
+    order = np.argsort(~np.isnan(close), axis=0, kind="stable")
+    arrays = {f: np.take_along_axis(values, order, axis=0) for f, values in raw.items()}
+    last_dates = panel.index[order[-1]].strftime("%Y-%m-%d")
+    return arrays, list(last_dates)
+
+def compute(panel: pd.DataFrame, tickers: List[str], names: Sequence[str] = None) -> pd.DataFrame:
+    """The latest value of every output of `names` (default: all) per ticker, plus its bar `date`."""
+    names = list(names or REGISTRY)
+    if not tickers:
+        return pd.DataFrame(columns=["date", *columns(names)])
+    outputs = {}
+    for name in names:
+        spec = REGISTRY[name]
+        nodes = spec["build"](**spec["params"])
+        outputs.update(zip(columns([name]), nodes))
+    fields = sorted({f for name in names for f in REGISTRY[name]["inputs"]})
+    arrays, last_dates = field_arrays(panel, tickers, fields)
+    latest = {column: values[-1] for column, values in evaluate(outputs, arrays).items()}
+    frame = pd.DataFrame(latest, index=pd.Index(tickers, name="ticker"))
+    frame.insert(0, "date", last_dates)
+    return frame
+
+# --- Indicators ---
+
+def _gain(close, d):
+    # A NaN delta (first bar) counts as zero movement, like indicators.rsi()
+    return np.where(np.isnan(close), np.nan, np.where(d > 0, d, 0.0))
+
+def _loss(close, d):
+    return np.where(np.isnan(close), np.nan, np.where(d < 0, -d, 0.0))
+
+def _index(up, down):
+    return 100 - (100 / (1 + up / down))
+
+@register("rsi", inputs=("Close",), params={"window": RSI_WINDOW}, outputs=("rsi_{window}",))
+def rsi(window):
+    close = field("Close")
+    d = delta(close)
+    return [apply(_index, sma(apply(_gain, close, d), window), sma(apply(_loss, close, d), window))]
+
+@register("macd", inputs=("Close",), params={"fast": MACD_FAST, "slow": MACD_SLOW, "signal": MACD_SIGNAL},
+          outputs=("macd_{fast}_{slow}_{signal}", "macd_signal_{fast}_{slow}_{signal}", "macd_hist_{fast}_{slow}_{signal}"))
+def macd(fast, slow, signal):
+    close = field("Close")
+    line = apply(_sub, ema(close, fast), ema(close, slow))
+    signal_line = ema(line, signal)
+    return [line, signal_line, apply(_sub, line, signal_line)]
+
+def _band(mid, sd, k):
+    return mid + k * sd
+
+def _pct_b(close, lower, upper):
+    return (close - lower) / (upper - lower)
+
+def _width(lower, upper, mid):
+    return (upper - lower) / mid
+
+@register("bollinger", inputs=("Close",), params={"window": 20, "k": 2},
+          outputs=("bb_mid_{window}", "bb_upper_{window}_{k:g}", "bb_lower_{window}_{k:g}",
+                   "bb_pct_b_{window}_{k:g}", "bb_width_{window}_{k:g}"))
+def bollinger(window, k):
+    close = field("Close")
+    mid, sd = sma(close, window), rolling(close, window, "std")
+    upper, lower = apply(_band, mid, sd, k), apply(_band, mid, sd, -k)
+    return [mid, upper, lower, apply(_pct_b, close, lower, upper), apply(_width, lower, upper, mid)]
+
+def _true_range(high, low, prev_close):
+    # fmax skips the NaN previous close on a ticker's first bar
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def _percent_of(x, base):
+    return 100 * x / base
+
+@register("atr", inputs=("High", "Low", "Close"), params={"window": 14}, outputs=("atr_{window}", "atr_pct_{window}"))
+def atr(window):
+    close = field("Close")
+    average = wilder(apply(_true_range, field("High"), field("Low"), prev(close)), window)
+    return [average, apply(_percent_of, average, close)]
+
+def _stochastic(close, lowest, highest):
+    return 100 * (close - lowest) / (highest - lowest)
+
+@register("stochastic", inputs=("High", "Low", "Close"), params={"k": 14, "d": 3},
+          outputs=("stoch_k_{k}_{d}", "stoch_d_{k}_{d}"))
+def stochastic(k, d):
+    percent_k = apply(_stochastic, field("Close"), rolling(field("Low"), k, "min"), rolling(field("High"), k, "max"))
+    return [percent_k, sma(percent_k, d)]
+
+def _typical(high, low, close):
+    return (high + low + close) / 3
+
+def _mul(a, b):
+    return a * b
+
+def _div(a, b):
+    return a / b
+
+def _flow_up(flow, d):
+    # An unchanged (or first) bar's flow counts on neither side
+    return np.where(np.isnan(flow), np.nan, np.where(d > 0, flow, 0.0))
+
+def _flow_down(flow, d):
+    return np.where(np.isnan(flow), np.nan, np.where(d < 0, flow, 0.0))
+
+@register("volume", inputs=("High", "Low", "Close", "Volume"), params={"window": 20, "mfi_window": 14},
+          outputs=("vwap_{window}", "volume_ratio_{window}", "mfi_{mfi_window}"))
+def volume(window, mfi_window):
+    typical, vol = apply(_typical, field("High"), field("Low"), field("Close")), field("Volume")
+    flow = apply(_mul, typical, vol)
+    vwap = apply(_div, sma(flow, window), sma(vol, window))  # ratio of means == ratio of sums
+    # Money flow index: the RSI formula over raw money flow (typical price x
+    # volume), counted as up or down by the direction of the typical price
+    d = delta(typical)
+    up = sma(apply(_flow_up, flow, d), mfi_window)
+    down = sma(apply(_flow_down, flow, d), mfi_window)
+    return [vwap, apply(_div, vol, sma(vol, window)), apply(_index, up, down)]
+
+def _cross(fast, slow):
+    # +1 while the fast average is above the slow one, -1 below
+    return np.where(np.isnan(fast) | np.isnan(slow), np.nan, np.sign(fast - slow))
+
+@register("ma_cross", inputs=("Close",), params={"fast": 20, "slow": 50},
+          outputs=("sma_{fast}", "sma_{slow}", "sma_cross_{fast}_{slow}"))
+def ma_cross(fast, slow):
+    fast_mean, slow_mean = sma(field("Close"), fast), sma(field("Close"), slow)
+    return [fast_mean, slow_mean, apply(_cross, fast_mean, slow_mean)]
+
+# --- Persistence ---
+
+def ensure_indicator_values_table(conn: sqlite3.Connection):
+    """Creates the wide indicator table next to daily_signals, adding columns for new indicators."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS indicator_values (
+            ticker_symbol TEXT NOT NULL,
+            date DATE NOT NULL,         -- the ticker's bar the values are computed at
+            PRIMARY KEY (ticker_symbol, date),
+            FOREIGN KEY (ticker_symbol) REFERENCES pattas_list(ticker_symbol)
+        )
+    """)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(indicator_values)")}
+    for column in columns():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE indicator_values ADD COLUMN {column} REAL")
+
+def update_indicator_values(panel: pd.DataFrame, tickers: List[str], conn: sqlite3.Connection = None) -> pd.DataFrame:
+    """compute() for every registered indicator, stored in indicator_values (one commit)."""
+    frame = compute(panel, tickers)
+    own_conn = conn is None
+    if own_conn:
+        conn = storage.connect()
+    ensure_indicator_values_table(conn)
+    names = columns()
+    rows = [(ticker, row["date"], *[None if np.isnan(row[c]) else float(row[c]) for c in names])
+            for ticker, row in frame.iterrows()]
+    storage.upsert_many(conn, "indicator_values", ["ticker_symbol", "date", *names], rows)
+    if own_conn:
+        conn.close()
+    return frame
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registered indicators and their latest stored values")
+    parser.add_argument("tickers", nargs="*", help="print the latest indicator_values row of these tickers")
+    args = parser.parse_args()
+
+    if not args.tickers:
+        for name, spec in REGISTRY.items():
+            params = ", ".join(f"{k}={v}" for k, v in spec["params"].items())
+            print(f"{name}({params}) on {'/'.join(spec['inputs'])}: {', '.join(columns([name]))}")
+    else:
+        conn = storage.connect()
+        ensure_indicator_values_table(conn)
+        for ticker in args.tickers:
+            row = conn.execute("SELECT * FROM indicator_values WHERE ticker_symbol = ? ORDER BY date DESC LIMIT 1",
+                               (ticker,)).fetchone()
+            if row is None:
+                print(f"{ticker}: no indicator values stored")
+                continue
+            names = [d[1] for d in conn.execute("PRAGMA table_info(indicator_values)")]
+            print(f"{ticker} @ {row[1]}")
+            for name, value in list(zip(names, row))[2:]:
+                print(f"  {name:<22} {'-' if value is None else round(value, 4)}")
+        conn.close()
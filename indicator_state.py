@@ -0,0 +1,150 @@
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+import storage
+from history_loader import ticker_frame
+from indicators import (
+    STATE_PARAMS, empty_state, fold_state, state_signals, step_state,
+)
+
+# Relative close mismatch at the state's as-of bar that means the cached
+# history was re-adjusted underneath the state (split/dividend).
+ADJUSTMENT_TOLERANCE = 1e-5
+
+def ensure_indicator_state_table(conn: sqlite3.Connection):
+    """Creates the per-ticker indicator state table next to daily_signals."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS indicator_state (
+            ticker_symbol TEXT PRIMARY KEY,
+            params TEXT NOT NULL,       -- indicator parameters the state was built with
+            as_of DATE NOT NULL,        -- last bar folded into the state
+            last_close REAL,
+            bars INTEGER NOT NULL,
+            ema_fast REAL,
+            ema_slow REAL,
+            ema_signal REAL,
+            avg_gain REAL,
+            avg_loss REAL,
+            gains TEXT NOT NULL,        -- JSON list, last RSI window of gains
+            losses TEXT NOT NULL,       -- JSON list, last RSI window of losses
+            FOREIGN KEY (ticker_symbol) REFERENCES pattas_list(ticker_symbol)
+        )
+    """)
+
+def _num(value) -> float:
+    return np.nan if value is None else float(value)
+
+def load_states(conn: sqlite3.Connection, tickers: List[str]) -> Dict[str, dict]:
+    """Returns the persisted state rows for `tickers` built with the current parameters."""
+    wanted = set(tickers)
+    rows = conn.execute("""
+        SELECT ticker_symbol, as_of, last_close, bars, ema_fast, ema_slow, ema_signal, gains, losses
+        FROM indicator_state WHERE params = ?
+    """, (STATE_PARAMS,)).fetchall()
+    states = {}
+    for ticker, as_of, last_close, bars, ema_fast, ema_slow, ema_signal, gains, losses in rows:
+        if ticker in wanted:
+            states[ticker] = {
+                "as_of": as_of,
+                "last_close": _num(last_close),
+                "bars": bars,
+                "ema_fast": _num(ema_fast),
+                "ema_slow": _num(ema_slow),
+                "ema_signal": _num(ema_signal),
+                "gains": [_num(v) for v in json.loads(gains)],
+                "losses": [_num(v) for v in json.loads(losses)],
+            }
+    return states
+
+def save_states(conn: sqlite3.Connection, tickers: List[str], as_of: List[str], state: Dict[str, np.ndarray]):
+    """Persists one state row per ticker (does not commit)."""
+    def sql(value):
+        return None if np.isnan(value) else float(value)
+
+    with np.errstate(invalid="ignore"):
+        avg_gain = state["gains"].mean(axis=1)
+        avg_loss = state["losses"].mean(axis=1)
+    rows = [
+        (t, STATE_PARAMS, as_of[i], sql(state["last_close"][i]), int(state["bars"][i]),
+         sql(state["ema_fast"][i]), sql(state["ema_slow"][i]), sql(state["ema_signal"][i]),
+         sql(avg_gain[i]), sql(avg_loss[i]),
+         json.dumps([sql(v) for v in state["gains"][i]]),
+         json.dumps([sql(v) for v in state["losses"][i]]))
+        for i, t in enumerate(tickers)
+    ]
+    with storage.timed_write("indicator_state"):
+        conn.executemany("""
+            INSERT OR REPLACE INTO indicator_state
+            (ticker_symbol, params, as_of, last_close, bars, ema_fast, ema_slow, ema_signal,
+             avg_gain, avg_loss, gains, losses)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+def _stack_states(tickers: List[str], states: Dict[str, dict]) -> Dict[str, np.ndarray]:
+    """Builds the vectorized state for `tickers`; unknown tickers start empty."""
+    stacked = empty_state(len(tickers))
+    for i, t in enumerate(tickers):
+        if t in states:
+            for key in stacked:
+                stacked[key][i] = states[t][key]
+    return stacked
+
+def incremental_signals(panel: pd.DataFrame, tickers: List[str], conn: sqlite3.Connection = None) -> pd.DataFrame:
+    """
+    Latest RSI/MACD/status per ticker, in the latest_signals() format, using
+    the persisted indicator state so a warm ticker only folds its new bars.
+
+    The persisted state is always settled at each ticker's second-newest bar:
+    the newest bar may still be an open session, so it is applied on top
+    without being saved and re-applied on the next run. A ticker is
+    recomputed from its full history on a cold start, a parameter change, or
+    when the close at the state's as-of bar no longer matches the history
+    (re-adjusted for a split or dividend).
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = storage.connect()
+    ensure_indicator_state_table(conn)
+    states = load_states(conn, tickers)
+
+    new_bars = []
+    settled_dates = []
+    warm = 0
+    for t in tickers:
+        closes = ticker_frame(panel, t)["Close"]
+        dates = list(closes.index.strftime("%Y-%m-%d"))
+        settled_dates.append(dates[-2] if len(dates) > 1 else None)
+
+        state = states.get(t)
+        if state and state["as_of"] in dates and state["as_of"] < dates[-1]:
+            anchor = closes.iloc[dates.index(state["as_of"])]
+            if abs(anchor - state["last_close"]) <= ADJUSTMENT_TOLERANCE * abs(state["last_close"]):
+                new_bars.append(closes.iloc[dates.index(state["as_of"]) + 1:].to_numpy(dtype=float))
+                warm += 1
+                continue
+        states.pop(t, None)  # cold start, or history changed underneath the state
+        new_bars.append(closes.to_numpy(dtype=float))
+
+    print(f"  Indicators: {warm} incremental, {len(tickers) - warm} full recompute.", flush=True)
+
+    # Right-align every ticker's new bars so the last row is its newest bar
+    depth = max((len(b) for b in new_bars), default=0)
+    matrix = np.full((depth, len(tickers)), np.nan)
+    for i, bars in enumerate(new_bars):
+        if len(bars):
+            matrix[depth - len(bars):, i] = bars
+
+    settled = fold_state(_stack_states(tickers, states), matrix[:-1])
+    signals = state_signals(step_state(settled, matrix[-1])) if depth else state_signals(settled)
+
+    persist = [i for i, d in enumerate(settled_dates) if d is not None]
+    save_states(conn, [tickers[i] for i in persist], [settled_dates[i] for i in persist],
+                {key: value[persist] for key, value in settled.items()})
+    conn.commit()
+    if own_conn:
+        conn.close()
+
+    return pd.DataFrame(signals, index=pd.Index(tickers, name="ticker"))
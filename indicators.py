@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+# --- Vectorized Indicator Engine ---
+# Every function works on a 2-D (dates x tickers) float array and treats each
+# column as an independent series. Series are right-aligned (see
+# close_matrix), so a ticker with short history simply has leading NaNs.
+
+RSI_WINDOW = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+RSI_OVERBOUGHT = 70
+
+def close_matrix(panel: pd.DataFrame, tickers: List[str], field: str = "Close") -> np.ndarray:
+    """
+    Extracts one field from the history panel as a (dates x tickers) array.
+    Each column is compacted to its own trading days and aligned to the last
+    row, so the result matches running the per-ticker frame on its own.
+    """
+    values = np.column_stack([panel[(t, field)].to_numpy(dtype=float) for t in tickers]) \
+        if tickers else np.empty((len(panel.index), 0))
+    # Stable sort moves every NaN to the top while keeping bar order intact
+    order = np.argsort(~np.isnan(values), axis=0, kind="stable")
+    return np.take_along_axis(values, order, axis=0)
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing simple mean; NaN until a column has `window` valid values."""
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    out = sums / window
+    out[counts < window] = np.nan
+    return out
+
+def ewm(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    Exponential moving average equal to pandas ewm(span, adjust=False):
+    seeded with each column's first valid value.
+    """
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty_like(values)
+    state = np.full(values.shape[1:], np.nan)
+    for i, row in enumerate(values):
+        state = np.where(np.isnan(state), row, alpha * row + (1 - alpha) * state)
+        out[i] = state
+    return out
+
+def rsi(close: np.ndarray, window: int = RSI_WINDOW) -> np.ndarray:
+    """Simple-average RSI, matching the rolling-mean formula used historically."""
+    delta = np.diff(close, axis=0, prepend=np.nan)
+    listed = ~np.isnan(close)
+    # A NaN delta (first bar) counts as zero movement, like Series.where(..., 0)
+    gain = np.where(listed, np.where(delta > 0, delta, 0.0), np.nan)
+    loss = np.where(listed, np.where(delta < 0, -delta, 0.0), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = rolling_mean(gain, window) / rolling_mean(loss, window)
+        return 100 - (100 / (1 + rs))
+
+def macd(close: np.ndarray, fast: int = MACD_FAST, slow: int = MACD_SLOW,
+         signal: int = MACD_SIGNAL):
+    """Returns (macd, signal_line) arrays."""
+    line = ewm(close, fast) - ewm(close, slow)
+    return line, ewm(line, signal)
+
+def classify(rsi_values: np.ndarray, macd_values: np.ndarray, signal_values: np.ndarray,
+             overbought: float = RSI_OVERBOUGHT):
+    """
+    Vectorized signal interpretation. Returns (macd_status, status) string arrays.
+    Strategy: BUY on a bullish crossover with RSI below the overbought level,
+    SELL on a bearish crossover or overbought RSI, otherwise HOLD.
+    """
+    bullish = macd_values > signal_values
+    bearish = macd_values < signal_values
+    macd_status = np.where(bullish, "Bullish Crossover",
+                           np.where(bearish, "Bearish Crossover", "Neutral"))
+    status = np.where(bullish & (rsi_values < overbought), "BUY",
+                      np.where(bearish | (rsi_values > overbought), "SELL", "HOLD"))
+    return macd_status, status
+
+def compute_signals(close: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Runs RSI, MACD, signal line and classification over the whole universe and
+    returns the latest value per ticker. `valid` is False for tickers whose
+    indicators are still NaN (too little history).
+    """
+    rsi_values = rsi(close)[-1]
+    macd_line, signal_line = macd(close)
+    macd_values, signal_values = macd_line[-1], signal_line[-1]
+    macd_status, status = classify(rsi_values, macd_values, signal_values)
+    return {
+        "close": close[-1],
+        "rsi": rsi_values,
+        "macd": macd_values,
+        "signal_line": signal_values,
+        "macd_status": macd_status,
+        "status": status,
+        "valid": ~(np.isnan(rsi_values) | np.isnan(macd_values)),
+    }
+
+def latest_signals(panel: pd.DataFrame, tickers: List[str]) -> pd.DataFrame:
+    """compute_signals() over the history panel, as a frame indexed by ticker."""
+    signals = compute_signals(close_matrix(panel, tickers))
+    return pd.DataFrame(signals, index=pd.Index(tickers, name="ticker"))
+
+# --- Incremental State ---
+# The same indicators expressed as a per-ticker state that advances one bar
+# at a time in O(1): three EMA states plus the last RSI_WINDOW gains/losses.
+# Folding step_state() over a full history from empty_state() reproduces
+# compute_signals() exactly, so a cold start and a warm update share one path.
+
+STATE_PARAMS = f"rsi{RSI_WINDOW}/macd{MACD_FAST}-{MACD_SLOW}-{MACD_SIGNAL}"
+
+def empty_state(n: int) -> Dict[str, np.ndarray]:
+    """State for `n` tickers that have not seen any bar yet."""
+    return {
+        "last_close": np.full(n, np.nan),
+        "bars": np.zeros(n, dtype=int),
+        "ema_fast": np.full(n, np.nan),
+        "ema_slow": np.full(n, np.nan),
+        "ema_signal": np.full(n, np.nan),
+        "gains": np.full((n, RSI_WINDOW), np.nan),
+        "losses": np.full((n, RSI_WINDOW), np.nan),
+    }
+
+def _ema_step(state: np.ndarray, value: np.ndarray, span: int) -> np.ndarray:
+    alpha = 2.0 / (span + 1.0)
+    return np.where(np.isnan(state), value, alpha * value + (1 - alpha) * state)
+
+def step_state(state: Dict[str, np.ndarray], close: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Advances every ticker by one bar. A NaN close leaves that ticker's state
+    untouched, so ragged bar counts can be folded in a single loop.
+    """
+    listed = ~np.isnan(close)
+    delta = close - state["last_close"]
+    # A NaN delta (first bar) counts as zero movement, like Series.where(..., 0)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+
+    ema_fast = _ema_step(state["ema_fast"], close, MACD_FAST)
+    ema_slow = _ema_step(state["ema_slow"], close, MACD_SLOW)
+    ema_signal = _ema_step(state["ema_signal"], ema_fast - ema_slow, MACD_SIGNAL)
+
+    def keep(new, old):
+        mask = listed if new.ndim == 1 else listed[:, None]
+        return np.where(mask, new, old)
+
+    return {
+        "last_close": keep(close, state["last_close"]),
+        "bars": state["bars"] + listed,
+        "ema_fast": keep(ema_fast, state["ema_fast"]),
+        "ema_slow": keep(ema_slow, state["ema_slow"]),
+        "ema_signal": keep(ema_signal, state["ema_signal"]),
+        "gains": keep(np.concatenate([state["gains"][:, 1:], gain[:, None]], axis=1), state["gains"]),
+        "losses": keep(np.concatenate([state["losses"][:, 1:], loss[:, None]], axis=1), state["losses"]),
+    }
+
+def fold_state(state: Dict[str, np.ndarray], closes: np.ndarray) -> Dict[str, np.ndarray]:
+    """Applies step_state() for every row of a (bars x tickers) close array."""
+    for row in closes:
+        state = step_state(state, row)
+    return state
+
+def state_signals(state: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Reads the latest indicators off a state, in the compute_signals() format."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = state["gains"].mean(axis=1) / state["losses"].mean(axis=1)
+        rsi_values = 100 - (100 / (1 + rs))
+    macd_values = state["ema_fast"] - state["ema_slow"]
+    signal_values = state["ema_signal"]
+    macd_status, status = classify(rsi_values, macd_values, signal_values)
+    return {
+        "close": state["last_close"],
+        "rsi": rsi_values,
+        "macd": macd_values,
+        "signal_line": signal_values,
+        "macd_status": macd_status,
+        "status": status,
+        "valid": ~(np.isnan(rsi_values) | np.isnan(macd_values)),
+    }
@@ -0,0 +1,164 @@
+import contextvars
+import functools
+import json
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+# --- Instrumentation ---
+# Structured progress events as JSON lines, next to the human-readable print()
+# output. Enabled by PATTAS_EVENTS (a file path, or "-" for stderr) or by
+# market_update_graph.py --events; disabled, every hook is a cheap no-op.
+#
+# Events: run_start / run_end, node_enter / node_exit, ticker (one per ticker
+# per node: elapsed, ok, error class, plus whatever the code underneath
+# noted: provider, cache outcome, retries...), history_chunk,
+# sentiment_batch, and run_summary with latency percentiles per node and per
+# upstream host.
+
+_lock = threading.Lock()
+_sink = None
+_run_id: Optional[str] = None
+_latencies: Dict[str, Dict[str, List[float]]] = {}
+_local = threading.local()
+
+def configure(target: Optional[str] = None):
+    """Opens the event sink: a file path (appended to), "-" for stderr, or None/"" to disable."""
+    global _sink
+    target = config.EVENTS_PATH if target is None else target
+    with _lock:
+        if _sink not in (None, sys.stderr):
+            _sink.close()
+        _sink = None if not target else sys.stderr if target == "-" else open(target, "a", buffering=1)
+
+def enabled() -> bool:
+    return _sink is not None
+
+def emit(event: str, **fields):
+    """Writes one JSON-lines event (no-op when disabled)."""
+    if _sink is None:
+        return
+    line = json.dumps({"ts": round(time.time(), 3), "run_id": _run_id, "event": event, **fields}, default=str)
+    with _lock:
+        _sink.write(line + "\n")
+
+def record_latency(category: str, name: str, seconds: float):
+    """Adds a latency sample for the run summary (category: "node", "upstream", "stage")."""
+    if _sink is None:
+        return
+    with _lock:
+        _latencies.setdefault(category, {}).setdefault(name, []).append(seconds)
+
+# --- Per-ticker scope ---
+# Code deep in the call stack (the governor, the caches, the providers) adds
+# details to the ticker event of whichever ticker its thread is working on.
+
+def note(key: str, value: Any):
+    """Sets a detail on the current ticker event (if any)."""
+    scope = getattr(_local, "scope", None)
+    if scope is not None:
+        scope[key] = value
+
+def count(key: str, n: int = 1):
+    """Increments a counter on the current ticker event (if any)."""
+    scope = getattr(_local, "scope", None)
+    if scope is not None:
+        scope[key] = scope.get(key, 0) + n
+
+@contextmanager
+def ticker_scope(node: str, ticker: str):
+    """Emits one "ticker" event for the work done inside the block."""
+    if _sink is None:
+        yield
+        return
+    previous, _local.scope = getattr(_local, "scope", None), {}
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        details, _local.scope = _local.scope, previous
+        emit("ticker", node=node, ticker=ticker, elapsed_s=round(time.perf_counter() - start, 4),
+             ok=error is None, error=type(error).__name__ if error else None, **details)
+
+def node(name: str, func):
+    """Wraps a graph node with node_enter / node_exit events and timing."""
+    @functools.wraps(func)
+    def wrapper(state):
+        emit("node_enter", node=name)
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = func(state)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            record_latency("node", name, elapsed)
+            emit("node_exit", node=name, elapsed_s=round(elapsed, 4), ok=ok)
+    return wrapper
+
+# --- Run lifecycle ---
+
+def run_started(run_id: str, **fields):
+    global _run_id
+    with _lock:
+        _run_id = run_id
+        _latencies.clear()
+    emit("run_start", **fields)
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p90/p99 plus count, max and total, in seconds."""
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {"count": len(ordered), "p50": round(rank(50), 4), "p90": round(rank(90), 4),
+            "p99": round(rank(99), 4), "max": round(ordered[-1], 4), "total": round(sum(ordered), 4)}
+
+def summary() -> Dict[str, Dict[str, Dict[str, float]]]:
+    with _lock:
+        return {category: {name: percentiles(samples) for name, samples in names.items() if samples}
+                for category, names in _latencies.items()}
+
+def run_finished(ok: bool = True, **fields):
+    """Emits run_end and run_summary, and prints the summary table."""
+    if _sink is None:
+        return
+    stats = summary()
+    emit("run_end", ok=ok, **fields)
+    emit("run_summary", latencies=stats)
+    print("--- Timing Summary (seconds) ---", flush=True)
+    for category, names in stats.items():
+        for name, s in sorted(names.items(), key=lambda item: -item[1]["total"]):
+            print(f"  {category:<8} {name:<22} n={s['count']:<5} p50={s['p50']:<8} p90={s['p90']:<8} "
+                  f"p99={s['p99']:<8} max={s['max']:<8} total={s['total']}", flush=True)
+
+configure()
+
+# --- Thread Context ---
+# New threads start with empty context variables. Worker pools and stage
+# threads of a run take the starting thread's, so per-run context set there
+# (the scan server's output capture) follows the run's work and nothing else.
+
+def inherit_context() -> Callable[[], None]:
+    """A ThreadPoolExecutor initializer copying the calling thread's context variables into each worker."""
+    parent = contextvars.copy_context()
+
+    def initializer():
+        for var, value in parent.items():
+            var.set(value)
+    return initializer
+
+def bind_context(func: Callable) -> Callable:
+    """`func` run in a copy of the calling thread's context, for threading.Thread targets."""
+    return functools.partial(contextvars.copy_context().run, func)
@@ -1,308 +1,312 @@
-import sqlite3
+import queue
+import threading
 import pandas as pd
-import numpy as np
-import yfinance as yf
-from nsepython import equity_history, nse_quote
-from datetime import date, timedelta
-from textblob import TextBlob
-from typing import List, Dict, Any, TypedDict, Annotated
+from datetime import date
+from typing import List, Dict, Any, Optional, TypedDict
 from langgraph.graph import StateGraph, END
+from concurrent.futures import ThreadPoolExecutor
 import time
 
+import argparse
+
+import config
+import indicator_registry
+import instrumentation
+import news_store
+import request_governor
+import scheduler
+import sharding
+import signal_snapshot
+import storage
+import trading_calendar
+from checkpointing import ProgressMarkers, finish_run, node_progress, open_checkpointer, start_run
+from fundamentals_cache import get_fundamentals
+from history_loader import load_history_panel, ticker_frame
+from indicator_state import incremental_signals
+from providers import fetch_news
+from sentiment_store import score_articles, ticker_sentiment
+
 # --- State Definition ---
 class AgentState(TypedDict):
     tickers: List[str]
     processed_data: List[Dict[str, Any]]
     errors: List[str]
+    shard: Optional[Dict[str, Any]]  # {"index", "count", "by", "run_date"} in shard mode, see sharding.py
+    session: Optional[str]  # scheduled runs: the session (ISO date) to bring tickers up to, see scheduler.py
+    late: List[str]  # scheduled runs: tickers whose session bar is not out yet (retried, not logged as attempts)
+
+# --- Concurrency ---
+
+def run_per_ticker(func, items, max_workers=None, scope=None):
+    """
+    Runs `func` over `items` on a bounded thread pool.
+    Returns (item, result, exception) tuples in the same order as `items`,
+    so merging back into the state is deterministic regardless of timing.
+    With `scope` (a node name), each item emits a per-ticker instrumentation event.
+    """
+    max_workers = max_workers or config.MAX_WORKERS
+
+    def guarded(item):
+        try:
+            if scope is None:
+                return item, func(item), None
+            with instrumentation.ticker_scope(scope, item):
+                return item, func(item), None
+        except Exception as e:
+            return item, None, e
+
+    if max_workers <= 1 or len(items) <= 1:
+        return [guarded(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items)), initializer=instrumentation.inherit_context()) as pool:
+        return list(pool.map(guarded, items))
 
 # --- Node Functions ---
 
 def fetch_universe(state: AgentState) -> AgentState:
-    """Reads tickers from the database and normalizes them for NSE."""
+    """
+    Reads tickers from the database (only this shard's, in shard mode; only
+    those still missing the session, in scheduled runs).
+    """
     print("--- Fetching Universe ---")
-    conn = sqlite3.connect('pattas_list.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT ticker_symbol FROM pattas_list")
-    rows = cursor.fetchall()
+    conn = storage.connect()
+    shard = state.get("shard")
+    if shard:
+        tickers = sharding.shard_tickers(conn, shard["index"], shard["count"], shard["by"])
+        print(f"Shard {shard['index']}/{shard['count']} ({shard['by']}): {len(tickers)} tickers.")
+    else:
+        cursor = conn.cursor()
+        cursor.execute("SELECT ticker_symbol FROM pattas_list")
+        rows = cursor.fetchall()
+        tickers = [row[0] for row in rows]
+        print(f"Found {len(tickers)} tickers.")
+
+    session = state.get("session")
+    if session:
+        tickers = scheduler.stale_tickers(conn, tickers, session)
+        print(f"{len(tickers)} of them need session {session}.")
     conn.close()
-    
-    tickers = [row[0] for row in rows]
-    print(f"Found {len(tickers)} tickers.")
     return {"tickers": tickers, "processed_data": [], "errors": []}
 
+def process_ticker_market(ticker: str, signal: pd.Series) -> Dict[str, Any]:
+    """
+    Builds a ticker's record from its precomputed technicals (see indicators.py)
+    and fetches its fundamentals. Raises on failure so the caller can record the error.
+    """
+    print(f"Processing {ticker}...", flush=True)
+
+    # 1. Technicals were computed for the whole universe in one pass
+    if not signal['valid']:
+        raise ValueError("Calculation error (RSI/MACD is NaN)")
+
+    # 2. Fetch Fundamentals (PE, Insider) from the configured provider, via the TTL cache
+    trailing_pe = 0.0
+    held_insiders = 0.0
+
+    try:
+        info = get_fundamentals(ticker, ['trailingPE', 'heldPercentInsiders'])
+        trailing_pe = info.get('trailingPE', 0)
+        held_insiders = info.get('heldPercentInsiders', 0) * 100
+    except Exception as e:
+        print(f"  Fundamentals unavailable for {ticker}: {e}", flush=True)
+
+    return {
+        "ticker": ticker,
+        "price": round(float(signal['close']), 2),
+        "rsi": round(float(signal['rsi']), 2),
+        "macd_signal": str(signal['macd_status']),
+        "status": str(signal['status']),
+        "trailing_pe": round(trailing_pe, 2),
+        "held_insiders": round(held_insiders, 2)
+    }
+
 def fetch_market_data_and_technicals(state: AgentState) -> AgentState:
     """
-    Fetches historical data using NSEPython (primary) or yfinance (fallback).
-    Calculates RSI and MACD.
+    Fetches historical data for the whole universe in batched yfinance requests.
+    Calculates RSI and MACD for all tickers at once, plus every registered
+    indicator (see indicator_registry.py) into indicator_values.
     Fetches fundamental data (PE, Insider Holdings).
+    Tickers are processed concurrently (see config.MAX_WORKERS).
+    In a resumed run, tickers finished by the interrupted attempt are reused.
+    In a scheduled run, everything is computed from the bars up to the session.
     """
     print("--- Fetching Market Data & Calculating Technicals ---")
     tickers = state['tickers']
-    processed = []
-    errors = []
+    progress = node_progress("fetch_market")
+    done = progress.done() if progress else {}
+    if done:
+        print(f"Resuming: {len(done)} tickers already processed.", flush=True)
+    pending = [t for t in tickers if t not in done]
+    records = dict(done)
+    errors, late = [], []
 
-    for ticker in tickers:
-        try:
-            print(f"Processing {ticker}...")
-            
-            # 1. Normalize Ticker for NSE
-            nse_symbol = ticker.split('.')[0] if '.' in ticker else ticker
-            is_bse = '.BO' in ticker
-
-            df = pd.DataFrame()
-            
-            # 2. Fetch History (Try NSE First)
-            try:
-                # nsepython equity_history returns a list of dictionaries usually
-                # Series Needs "EQ" usually
-                print(f"  Attempting NSE fetch for {nse_symbol}...")
-                end_date = date.today().strftime("%d-%m-%Y")
-                start_date = (date.today() - timedelta(days=200)).strftime("%d-%m-%Y")
-                
-                # Note: nsepython might be unstable, wrap in strong try/except
-                nse_data = equity_history(nse_symbol, "EQ", start_date, end_date)
-                
-                if nse_data and len(nse_data) > 30:
-                     df = pd.DataFrame(nse_data)
-                     # Clean NSE data columns if needed, usually: CH_TIMESTAMP, CH_CLOSING_PRICE via nsepython
-                     # Mapping might be needed depending on nsepython version output
-                     # Let's fallback to yfinance immediately if this is complex/unstable ensures robustness
-                     # Using yfinance for history is safer for calculation consistency
-                     print("  NSE data structure varries, using yfinance for consistent OHLCV...")
-                     raise Exception("Preferring yfinance for history stability")
-                else:
-                    raise Exception("NSE Data empty/insufficient")
+    if pending:
+        panel, errors = load_history_panel(pending)
+        ready = [t for t in pending if not ticker_frame(panel, t).empty]
+        if state.get("session"):
+            # Rows dated by the session hold its bars, not today's still-open one
+            loaded = ready
+            panel, ready, late_errors = scheduler.clip_to_session(panel, loaded, state["session"])
+            errors.extend(late_errors)
+            kept = set(ready)
+            late = [t for t in loaded if t not in kept]
 
-            except Exception as e:
-                print(f"  Fallback to yfinance for history: {e}")
-                stock = yf.Ticker(ticker)
-                df = stock.history(period="6mo")
-            
-            if df.empty or len(df) < 30:
-                errors.append(f"{ticker}: Insufficient Data")
-                continue
+        # RSI / MACD / status for every ticker in one vectorized pass; warm tickers
+        # only fold their new bars into the persisted indicator state
+        signals = incremental_signals(panel, ready)
+        # Every registered indicator in one fused pass, into indicator_values
+        indicator_registry.update_indicator_values(panel, ready)
 
-            # 3. Calculate Technicals (RSI, MACD)
-            # Ensure Close is float
-            if 'Close' not in df.columns and 'CH_CLOSING_PRICE' in df.columns:
-                 df['Close'] = df['CH_CLOSING_PRICE'].astype(float)
-            
-            delta = df['Close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            
-            # MACD
-            exp1 = df['Close'].ewm(span=12, adjust=False).mean()
-            exp2 = df['Close'].ewm(span=26, adjust=False).mean()
-            macd = exp1 - exp2
-            signal_line = macd.ewm(span=9, adjust=False).mean()
-            
-            latest = df.iloc[-1]
-            rsi_val = rsi.iloc[-1]
-            macd_val = macd.iloc[-1]
-            sig_val = signal_line.iloc[-1]
-            close_price = latest['Close']
-
-            # Interpret Signal
-            if macd_val > sig_val:
-                macd_status = "Bullish Crossover"
-            elif macd_val < sig_val:
-                macd_status = "Bearish Crossover"
-            else:
-                macd_status = "Neutral"
+        def process(ticker):
+            record = process_ticker_market(ticker, signals.loc[ticker])
+            if progress:
+                progress.record(ticker, record)
+            return record
 
-            if macd_status == "Bullish Crossover" and rsi_val < 70:
-                status = "BUY"
-            elif macd_status == "Bearish Crossover" or rsi_val > 70:
-                status = "SELL"
-            else:
-                status = "HOLD"
+        for ticker, record, error in run_per_ticker(process, ready, scope="fetch_market"):
+            if error is not None:
+                print(f"  Error processing {ticker}: {error}", flush=True)
+                errors.append(f"{ticker}: {str(error)}")
+                continue
+            records[ticker] = record
 
-            # 4. Fetch Fundamentals (PE, Insider)
-            # Try NSE Quote first for accurate PE
-            trailing_pe = 0.0
-            held_insiders = 0.0
-            
-            try:
-                # nse_quote returns a JSON
-                q = nse_quote(nse_symbol)
-                if q and 'priceInfo' in q:
-                     # Attempt to parse PE if available, mostly in metadata or different keys
-                     # nsepython structure changes often, fallback to yfinance for fundamentals is safer
-                     pass
-            except:
-                pass
-
-            # Fallback/Primary for Fundamentals: yfinance
-            try:
-                info = yf.Ticker(ticker).info
-                trailing_pe = info.get('trailingPE', 0)
-                held_insiders = info.get('heldPercentInsiders', 0) * 100
-            except:
-                pass
-            
-            processed.append({
-                "ticker": ticker,
-                "price": round(close_price, 2),
-                "rsi": round(rsi_val, 2),
-                "macd_signal": macd_status,
-                "status": status,
-                "trailing_pe": round(trailing_pe, 2),
-                "held_insiders": round(held_insiders, 2)
-            })
+    if progress:
+        progress.close()
+    processed = [records[t] for t in tickers if t in records]
+    return {"processed_data": processed, "errors": errors, "late": late}
 
-        except Exception as e:
-            print(f"  Error processing {ticker}: {e}")
-            errors.append(f"{ticker}: {str(e)}")
-            
-    return {"processed_data": processed, "errors": errors}
+def fetch_ticker_news(ticker: str) -> List[Dict[str, Any]]:
+    """Fetches today's raw yfinance news feed for a single ticker (may be empty)."""
+    print(f"Getting news for {ticker}...", flush=True)
+    # Pacing and retries are handled by the request governor
+    return fetch_news(ticker)
+
+def sentiment_score_for(conn, ticker: str) -> float:
+    """Ticker's aggregated article sentiment on the -100..100 scale."""
+    polarity = ticker_sentiment(conn, ticker)
+    if polarity is not None:
+        # Scale from -1.0/1.0 to -100%/100%
+        return round(polarity * 100, 2)
+    # If news exists but no titles found (fallback)
+    return 0.0
 
 def fetch_sentiment_today(state: AgentState) -> AgentState:
     """
     Fetches ONLY today's news using yfinance and calculates sentiment.
-    Also saves news lists to a JSON sidecar file.
+    Each ticker's articles are saved to the news store as its feed arrives.
+
+    1. feeds are fetched concurrently (see config.MAX_WORKERS);
+    2. articles never seen before are scored in one batch for the whole
+       universe (see sentiment_store.score_articles);
+    3. each ticker's sentiment is aggregated from the article store.
+    In a resumed run, feeds fetched by the interrupted attempt are reused.
     """
     print("--- Fetching Sentiment (Today's News) ---")
     data_list = state['processed_data']
     updated_data = []
-    news_map = {} # Ticker -> Link List
-    
-    import json
-    import os
-    import time
-
-    for item in data_list:
-        ticker = item['ticker']
-        print(f"Getting news for {ticker}...", flush=True)
-        
-        sentiment_score = None
-        polarities = []
 
-        try:
-            # 1. Fetch News
-            search_ticker = ticker
-            stock = yf.Ticker(search_ticker)
-            news = stock.news
-            
-            if not news and '.BO' in ticker:
-                search_ticker = ticker.replace('.BO', '.NS')
-                stock = yf.Ticker(search_ticker)
-                news = stock.news
-            
-            # 2. Process News List for Modal
-            if news:
-                news_items = []
-                for news_item in news[:5]: # Top 5
-                    # yfinance news can have info at top level or nested in 'content'
-                    c = news_item.get('content', news_item)
-                    link = None
-                    
-                    # Try to find link
-                    if 'link' in c:
-                        link = c['link']
-                    elif 'clickThroughUrl' in c and c['clickThroughUrl']:\
-                        link = c['clickThroughUrl'].get('url')
-                    elif 'canonicalUrl' in c and c['canonicalUrl']:
-                        link = c['canonicalUrl'].get('url')
-                    
-                    if not link and 'link' in news_item: # last resort top level
-                         link = news_item['link']
-                         
-                    if link:
-                        news_items.append({
-                            "title": c.get('title', 'No Title'),
-                            "link": link,
-                            "publisher": c.get('provider', {}).get('displayName', 'Unknown') or news_item.get('provider', {}).get('displayName', 'Unknown'),
-                            "time": c.get('pubDate') or c.get('providerPublishTime') or int(time.time()),
-                            "summary": c.get('summary') or c.get('description') or "No summary available for this intelligence report."
-                        })
-                
-                if news_items:
-                    news_map[ticker] = news_items
-
-                # 3. Process Sentiment
-                polarities = []
-                for ni in news:
-                    # Traversal: check top level, then check nested 'content'
-                    c = ni.get('content', ni)
-                    title = c.get('title') or ni.get('title')
-                    summary = c.get('summary') or c.get('description') or ni.get('summary')
-                    
-                    text_to_analyze = ""
-                    if title: text_to_analyze += title + ". "
-                    if summary: text_to_analyze += summary
-                    
-                    if text_to_analyze.strip():
-                        blob = TextBlob(text_to_analyze)
-                        polarities.append(blob.sentiment.polarity)
-            
-            if polarities:
-                # Scale from -1.0/1.0 to -100%/100%
-                sentiment_score = round((sum(polarities) / len(polarities)) * 100, 2)
-            else:
-                # If news exists but no titles found (fallback)
-                sentiment_score = 0.0
+    tickers = [item['ticker'] for item in data_list]
+    progress = node_progress("fetch_sentiment")
+    done = progress.done() if progress else {}
+    if done:
+        print(f"Resuming: news for {len(done)} tickers already fetched.", flush=True)
 
-        except Exception as e:
-             print(f"  Sentiment error for {ticker}: {e}", flush=True)
-
-        # 4. FINAL FALLBACK: If news_map doesn't have this ticker yet (fail or no links)
-        if ticker not in news_map:
-             import urllib.parse
-             safe_ticker = ticker.replace('.BO', '').replace('.NS', '')
-             quoted_ticker = urllib.parse.quote(f"{safe_ticker} share news")
-             fallback_link = f"https://www.google.com/search?q={quoted_ticker}&tbm=nws"
-             news_map[ticker] = [{
-                 "title": f"Search Intel: {safe_ticker}",
-                 "link": fallback_link,
-                 "publisher": "Google News Search",
-                 "time": int(time.time()),
-                 "summary": f"No direct news feed detected for {safe_ticker}. This fallback link will execute a secure search for the latest market intelligence on Google News."
-             }]
-        
-        item['sentiment_score'] = sentiment_score
-        updated_data.append(item)
-        time.sleep(0.3) # Throttle 
-    
-    # Save News Links to Sidecar JSON
+    # One connection shared by the workers, one short commit per ticker
+    news_conn = storage.connect(check_same_thread=False)
+    news_store.ensure_news_table(news_conn)
+    news_lock = threading.Lock()
+
+    def fetch(ticker):
+        if ticker in done:
+            return done[ticker]
+        news = fetch_ticker_news(ticker)
+        with news_lock:
+            instrumentation.note("articles_stored", news_store.store_news(news_conn, {ticker: news}))
+        if progress:
+            progress.record(ticker, news)
+        return news
+
+    results = run_per_ticker(fetch, tickers, scope="fetch_sentiment")
+    if progress:
+        progress.close()
+    pruned = news_store.prune_news(news_conn)
+    if pruned:
+        print(f"Pruned {pruned} articles past the {config.NEWS_RETENTION_DAYS:g}-day news retention.", flush=True)
+    news_conn.close()
+    news_by_ticker = {ticker: news for ticker, news, error in results if error is None}
+
+    conn = storage.connect()
     try:
-        with open('news_links.json', 'w') as f:
-            json.dump(news_map, f, indent=2)
-        print("Updated news_links.json", flush=True)
+        scored = score_articles(conn, news_by_ticker)
+        print(f"Scored {scored} new articles ({config.SENTIMENT_BACKEND}).", flush=True)
     except Exception as e:
-        print(f"Error saving news links: {e}", flush=True)
+        print(f"  Sentiment scoring error: {e}", flush=True)
+
+    for item, (ticker, news, error) in zip(data_list, results):
+        sentiment_score = None
+        if error is not None:
+            print(f"  Sentiment error for {ticker}: {error}", flush=True)
+        else:
+            try:
+                sentiment_score = sentiment_score_for(conn, ticker)
+            except Exception as e:
+                print(f"  Sentiment error for {ticker}: {e}", flush=True)
+
+        item['sentiment_score'] = sentiment_score
+        updated_data.append(item)
+    conn.close()
 
     return {"processed_data": updated_data}
 
+def daily_signal_row(item: Dict[str, Any], today: date) -> tuple:
+    """A processed record as a daily_signals row (storage.DAILY_SIGNAL_COLUMNS order)."""
+    return (
+        item['ticker'], 
+        today, 
+        item['price'], 
+        item['rsi'], 
+        item['macd_signal'], 
+        item['sentiment_score'],
+        item['status'], 
+        item['held_insiders'], 
+        item['trailing_pe']
+    )
+
+def attempted_tickers(state: AgentState) -> List[str]:
+    """The run's tickers, less those whose session bar was only late: the next run retries them."""
+    late = set(state.get('late') or [])
+    return [t for t in state['tickers'] if t not in late]
+
 def update_database(state: AgentState) -> AgentState:
-    """Updates the SQLite database."""
+    """Updates the SQLite database (in shard mode, saves the shard's result for the merge)."""
     print("--- Updating Database ---")
     data_list = state['processed_data']
-    conn = sqlite3.connect('pattas_list.db')
-    cursor = conn.cursor()
-    
-    count = 0
-    for item in data_list:
-        cursor.execute("""
-            INSERT OR REPLACE INTO daily_signals 
-            (ticker_symbol, date, price, rsi, macd_signal, sentiment_score, status, held_pct_insiders, trailing_pe)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            item['ticker'], 
-            date.today(), 
-            item['price'], 
-            item['rsi'], 
-            item['macd_signal'], 
-            item['sentiment_score'],
-            item['status'], 
-            item['held_insiders'], 
-            item['trailing_pe']
-        ))
-        count += 1
-    
-    conn.commit()
+    conn = storage.connect()
+    shard = state.get("shard")
+    # Scheduled runs date rows by the session they hold, shards by their run
+    # date (fixed when they started), anything else by the current session
+    # (a weekend or holiday run holds the last trading day's bars)
+    if state.get("session"):
+        today = date.fromisoformat(state["session"])
+    elif shard:
+        today = date.fromisoformat(shard["run_date"])
+    else:
+        today = trading_calendar.current_session()
+
+    if shard:
+        news_rows = news_store.article_rows(conn, [item['ticker'] for item in data_list])
+        conn.close()
+        path = sharding.write_result(shard, [daily_signal_row(item, today) for item in data_list],
+                                     state.get('errors') or [], news_rows, attempted_tickers(state), state.get("session"))
+        print(f"Saved {len(data_list)} records for the merge to {path}.")
+        return {}
+
+    # One executemany, one transaction for the whole universe, snapshot included
+    count = signal_snapshot.upsert_many(conn, "daily_signals", storage.DAILY_SIGNAL_COLUMNS,
+                                        [daily_signal_row(item, today) for item in data_list])
+    if state.get("session"):
+        # Failed tickers too, so the next scheduled run does not retry them all day
+        scheduler.record_attempts(conn, state["session"], attempted_tickers(state), state.get('errors') or [])
     conn.close()
     print(f"Updated {count} records.")
     return {}
@@ -310,10 +314,10 @@ def update_database(state: AgentState) -> AgentState:
 # --- Graph Contruction ---
 workflow = StateGraph(AgentState)
 
-workflow.add_node("fetch_universe", fetch_universe)
-workflow.add_node("fetch_market", fetch_market_data_and_technicals)
-workflow.add_node("fetch_sentiment", fetch_sentiment_today)
-workflow.add_node("update_db", update_database)
+workflow.add_node("fetch_universe", instrumentation.node("fetch_universe", fetch_universe))
+workflow.add_node("fetch_market", instrumentation.node("fetch_market", fetch_market_data_and_technicals))
+workflow.add_node("fetch_sentiment", instrumentation.node("fetch_sentiment", fetch_sentiment_today))
+workflow.add_node("update_db", instrumentation.node("update_db", update_database))
 
 workflow.set_entry_point("fetch_universe")
 workflow.add_edge("fetch_universe", "fetch_market")
@@ -323,7 +327,274 @@ workflow.add_edge("update_db", END)
 
 app = workflow.compile()
 
+GRAPH_NAME = "market_update"
+_checkpointed_app = None
+
+def checkpointed_app():
+    """The graph compiled with the persistent checkpointer, built once per process."""
+    global _checkpointed_app
+    if _checkpointed_app is None:
+        _checkpointed_app = workflow.compile(checkpointer=open_checkpointer())
+    return _checkpointed_app
+
+def run_market_update(force_new: bool = False, thread_id: str = None, shard: Dict[str, Any] = None,
+                      session: str = None):
+    """
+    Runs the graph with a persistent checkpointer. Today's unfinished run is
+    resumed from its last completed node unless `force_new`; see checkpointing.py.
+    With `shard`, runs that shard only (each shard has its own runs). With
+    `session`, only tickers still missing that session; see scheduler.py.
+    Runs for different sessions (or an unscheduled one) never resume each other.
+    """
+    graph = GRAPH_NAME if not shard else f"{GRAPH_NAME}-{shard['by']}-{shard['index']}of{shard['count']}"
+    if session:
+        graph += f"@{session}"
+    thread_id, resumed = start_run(graph, force_new=force_new, thread_id=thread_id)
+    run_config = {"configurable": {"thread_id": thread_id}}
+    checkpointed = checkpointed_app()
+
+    instrumentation.run_started(thread_id, mode="graph", resumed=resumed, shard=shard, session=session)
+    ok = False
+    try:
+        snapshot = checkpointed.get_state(run_config)
+        if resumed and snapshot.values and snapshot.next:
+            print(f"Resuming run {thread_id} at {', '.join(snapshot.next)}...", flush=True)
+            checkpointed.invoke(None, run_config)
+        elif resumed and snapshot.values:
+            print(f"Run {thread_id} had already finished all nodes.", flush=True)
+        else:
+            print(f"Starting run {thread_id}...", flush=True)
+            checkpointed.invoke({"tickers": [], "processed_data": [], "errors": [], "late": [],
+                                 "shard": shard, "session": session},
+                                run_config)
+        ok = True
+    finally:
+        instrumentation.run_finished(ok=ok)
+    finish_run(thread_id)
+
+# --- Streaming Mode ---
+# The same work without stage barriers: each ticker flows technicals ->
+# fundamentals -> news -> scoring/persistence as soon as it is ready.
+# Stages are connected by bounded queues, so a slow stage applies
+# backpressure instead of buffering the universe. The single writer commits
+# micro-batches (config.STREAM_BATCH_SIZE rows or STREAM_FLUSH_SECONDS), so a
+# crash loses only in-flight tickers; a resumed run skips persisted ones.
+
+_END = object()  # end-of-stream marker passed down the queues
+
+def _start_stage(inbox: queue.Queue, outbox: queue.Queue, func, workers: int, errors: List[str]):
+    """Runs `func` over inbox items on `workers` threads, forwarding non-None results."""
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def work():
+        while True:
+            item = inbox.get()
+            if item is _END:
+                inbox.put(_END)  # let sibling workers see it too
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    outbox.put(_END)
+                return
+            try:
+                result = func(item)
+            except Exception as e:
+                ticker = item[0] if isinstance(item, tuple) else item['ticker']
+                errors.append(f"{ticker}: {e}")
+                print(f"  Error processing {ticker}: {e}", flush=True)
+                continue
+            if result is not None:
+                outbox.put(result)
+
+    threads = [threading.Thread(target=instrumentation.bind_context(work), daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    return threads
+
+def run_streaming(force_new: bool = False, thread_id: str = None):
+    """Streaming counterpart of run_market_update(); see the section comment."""
+    thread_id, resumed = start_run("market_stream", force_new=force_new, thread_id=thread_id)
+    instrumentation.run_started(thread_id, mode="stream", resumed=resumed)
+    progress = ProgressMarkers(thread_id, "persist")
+    persisted = progress.done()
+    tickers = [t for t in fetch_universe({})["tickers"] if t not in persisted]
+    if resumed:
+        print(f"Resuming stream {thread_id}: {len(persisted)} tickers already persisted.", flush=True)
+    print(f"--- Streaming {len(tickers)} tickers ---", flush=True)
+
+    errors: List[str] = []
+    signals_q = queue.Queue(maxsize=config.STREAM_QUEUE_SIZE)
+    records_q = queue.Queue(maxsize=config.STREAM_QUEUE_SIZE)
+    news_q = queue.Queue(maxsize=config.STREAM_QUEUE_SIZE)
+
+    # 1. Technicals: history and indicators per chunk, so only one chunk's panel is in memory
+    def produce():
+        try:
+            for i in range(0, len(tickers), config.HISTORY_CHUNK_SIZE):
+                chunk = tickers[i:i + config.HISTORY_CHUNK_SIZE]
+                panel, chunk_errors = load_history_panel(chunk)
+                errors.extend(chunk_errors)
+                ready = [t for t in chunk if not ticker_frame(panel, t).empty]
+                if not ready:
+                    continue
+                signals = incremental_signals(panel, ready)
+                indicator_registry.update_indicator_values(panel, ready)
+                for t in ready:
+                    signals_q.put((t, signals.loc[t]))
+        except Exception as e:
+            errors.append(f"history: {e}")
+            print(f"  History stage failed: {e}", flush=True)
+        finally:
+            signals_q.put(_END)
+
+    # 2. Fundamentals, 3. News (a failed feed still persists the row, without sentiment)
+    def market(item):
+        ticker, signal = item
+        with instrumentation.ticker_scope("market", ticker):
+            return process_ticker_market(ticker, signal)
+
+    def news(record):
+        try:
+            with instrumentation.ticker_scope("news", record['ticker']):
+                return record, fetch_ticker_news(record['ticker'])
+        except Exception as e:
+            print(f"  Sentiment error for {record['ticker']}: {e}", flush=True)
+            return record, None
+
+    threading.Thread(target=instrumentation.bind_context(produce), daemon=True).start()
+    _start_stage(signals_q, records_q, market, config.MAX_WORKERS, errors)
+    _start_stage(records_q, news_q, news, config.MAX_WORKERS, errors)
+
+    # 4. Scoring and persistence in micro-batches on this thread (single writer)
+    conn = storage.connect()
+    news_store.ensure_news_table(conn)
+    today = trading_calendar.current_session()
+    written = 0
+
+    def flush(batch):
+        nonlocal written
+        start = time.perf_counter()
+        feeds = {record['ticker']: feed for record, feed in batch if feed is not None}
+        news_store.store_news(conn, feeds)
+        try:
+            score_articles(conn, feeds)
+        except Exception as e:
+            print(f"  Sentiment scoring error: {e}", flush=True)
+        for record, feed in batch:
+            ticker = record['ticker']
+            record['sentiment_score'] = None
+            if feed is not None:
+                try:
+                    record['sentiment_score'] = sentiment_score_for(conn, ticker)
+                except Exception as e:
+                    print(f"  Sentiment error for {ticker}: {e}", flush=True)
+        written += signal_snapshot.upsert_many(conn, "daily_signals", storage.DAILY_SIGNAL_COLUMNS,
+                                               [daily_signal_row(record, today) for record, _ in batch])
+        progress.record_many({record['ticker']: True for record, _ in batch})
+        instrumentation.record_latency("stage", "persist_batch", time.perf_counter() - start)
+        instrumentation.emit("batch_committed", rows=len(batch), total=written)
+        print(f"Committed {len(batch)} rows ({written} this run).", flush=True)
+
+    batch, started = [], None
+    while True:
+        try:
+            timeout = None if not batch else max(0.0, started + config.STREAM_FLUSH_SECONDS - time.monotonic())
+            item = news_q.get(timeout=timeout)
+        except queue.Empty:
+            item = None
+        if item is not None and item is not _END:
+            if not batch:
+                started = time.monotonic()
+            batch.append(item)
+        if batch and (item is None or item is _END or len(batch) >= config.STREAM_BATCH_SIZE):
+            flush(batch)
+            batch = []
+        if item is _END:
+            break
+
+    news_store.prune_news(conn)
+    conn.close()
+    progress.close()
+    for error in errors:
+        print(f"  {error}", flush=True)
+    instrumentation.run_finished(ok=True, records=written, errors=len(errors))
+    finish_run(thread_id)
+    print(f"Streamed {written} records.", flush=True)
+
 if __name__ == "__main__":
-    print("Starting Market Update Graph...")
-    app.invoke({"tickers": [], "processed_data": [], "errors": []})
+    parser = argparse.ArgumentParser(description="Market update graph")
+    parser.add_argument("--new", action="store_true",
+                        help="start a fresh run instead of resuming today's unfinished one (scheduled runs: "
+                             "also retry tickers that already failed for the session)")
+    parser.add_argument("--thread-id", help="resume (or start) this specific run")
+    parser.add_argument("--stream", action="store_true", help="stream tickers through all stages with micro-batched commits")
+    parser.add_argument("--events", metavar="PATH", help="write JSON-lines progress events to PATH ('-' for stderr) and print a timing summary")
+    sharded = parser.add_mutually_exclusive_group()
+    sharded.add_argument("--shard", metavar="I/N", help="run shard I of N (0-based) and save its result for --merge")
+    sharded.add_argument("--shards", type=int, metavar="N", help="run N shards as local processes, then merge them")
+    sharded.add_argument("--merge", type=int, metavar="N", help="write today's results of shards 0..N-1 in one commit")
+    parser.add_argument("--shard-by", choices=sharding.SHARD_MODES, default=config.SHARD_BY,
+                        help="split by ticker hash or by whole sectors (default %(default)s)")
+    parser.add_argument("--run-date", metavar="YYYY-MM-DD",
+                        help="shard results directory to write (--shard) or merge (--merge); default: the session, "
+                             "else today for a shard and the newest run for a merge")
+    scheduled = parser.add_mutually_exclusive_group()
+    scheduled.add_argument("--if-new-session", action="store_true",
+                           help="skip the run unless a ticker is missing the latest settled session, then process only those")
+    scheduled.add_argument("--session", metavar="YYYY-MM-DD", help="process only tickers missing this session")
+    args = parser.parse_args()
+    if args.stream and (args.shard or args.shards or args.merge):
+        parser.error("sharded runs use the graph; drop --stream")
+    if args.stream and (args.if_new_session or args.session):
+        parser.error("scheduled runs use the graph; drop --stream")
+    if args.events:
+        instrumentation.configure(args.events)
+
+    session = args.session
+    for flag, value in (("--session", session), ("--run-date", args.run_date)):
+        if value:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                parser.error(f"{flag} must be a date like 2025-01-31, got {value!r}")
+    if args.if_new_session and not args.merge:
+        plan = scheduler.plan(retry=args.new)
+        print(scheduler.describe(plan))
+        if not plan["stale"]:
+            print("Nothing new since the last run; skipping the scan.")
+            raise SystemExit(0)
+        session = plan["session"]
+    elif session and args.new and not (args.shard or args.merge):
+        conn = storage.connect()
+        print(f"Cleared {scheduler.clear_attempts(conn, session)} recorded attempts for {session}.")
+        conn.close()
+
+    if args.shards or args.merge:
+        print(f"Starting Market Update ({args.shards or args.merge} shards, by {args.shard_by})...")
+        try:
+            if args.shards:
+                sharding.run_local(args.shards, args.shard_by, force_new=args.new, session=session)
+            else:
+                sharding.merge_results(args.merge, args.shard_by, args.run_date or session)
+        except RuntimeError as e:
+            raise SystemExit(f"Sharded run not merged: {e}")
+    elif args.shard:
+        try:
+            index, count = sharding.parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Starting Market Update Graph (shard {index}/{count})...")
+        run_market_update(force_new=args.new, thread_id=args.thread_id,
+                          shard={"index": index, "count": count, "by": args.shard_by,
+                                 "run_date": args.run_date or session or trading_calendar.current_session().isoformat()},
+                          session=session)
+    elif args.stream:
+        print("Starting Market Update (streaming)...")
+        run_streaming(force_new=args.new, thread_id=args.thread_id)
+    else:
+        print("Starting Market Update Graph...")
+        run_market_update(force_new=args.new, thread_id=args.thread_id, session=session)
+    request_governor.report()
     print("Workflow Completed.")
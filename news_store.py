@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import urllib.parse
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import config
+import storage
+from sentiment_store import _content, article_key, article_link, article_published
+
+# --- News Store ---
+# Every article shown in the dashboard's news modal, kept per ticker in
+# `news_articles` under the same article keys as article_sentiment. Feeds
+# are upserted as each ticker's arrives, so a crash loses at most the ticker
+# in flight; readers fetch one ticker's latest items off the (ticker,
+# published_at) index. Articles older than config.NEWS_RETENTION_DAYS are
+# pruned. The Google News search entry shown when a ticker has no articles
+# is generated by the readers and never stored.
+
+TOP_N = 5  # items per ticker in the modal
+
+# The sidecar the scans wrote before news_articles existed, next to the
+# scripts like config's other default paths (never the working directory)
+LEGACY_NEWS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "news_links.json")
+
+def ensure_news_table(conn: sqlite3.Connection):
+    """Creates the news table (pointing at the legacy import when a live database starts without one)."""
+    created = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'news_articles'").fetchone() is None
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS news_articles (
+            ticker_symbol TEXT NOT NULL,
+            article_key TEXT NOT NULL,      -- see sentiment_store.article_key
+            title TEXT NOT NULL,
+            link TEXT NOT NULL,
+            publisher TEXT,
+            summary TEXT,
+            published_at REAL NOT NULL,     -- epoch seconds (first seen, when the feed has no date)
+            fetched_at REAL NOT NULL,       -- last time a feed returned it
+            PRIMARY KEY (ticker_symbol, article_key)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_articles_pub ON news_articles(ticker_symbol, published_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_articles_age ON news_articles(published_at)")
+    conn.commit()
+    # Importing is an explicit step: synthetic/replay (benchmark) databases
+    # must not pick up the repo's real articles
+    if created and config.DATA_SOURCE in ("live", "record") and os.path.exists(LEGACY_NEWS_PATH):
+        print(f"{LEGACY_NEWS_PATH} found; run `python news_store.py --import-legacy` to import its articles.", flush=True)
+
+def article_row(ticker: str, news_item: Dict[str, Any], now: float) -> Optional[tuple]:
+    """A raw feed entry as a news_articles row, or None when it has no link."""
+    link = article_link(news_item)
+    if not link:
+        return None
+    c = _content(news_item)
+    publisher = (c.get('provider') or {}).get('displayName') or (news_item.get('provider') or {}).get('displayName')
+    return (ticker, article_key(news_item), c.get('title') or news_item.get('title') or 'No Title', link,
+            publisher or 'Unknown', c.get('summary') or c.get('description'),
+            article_published(news_item) or now, now)
+
+def _upsert(conn: sqlite3.Connection, rows: List[tuple]):
+    # A re-fetched article keeps its publish time and refreshes the rest
+    conn.executemany("""
+        INSERT INTO news_articles
+        (ticker_symbol, article_key, title, link, publisher, summary, published_at, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(ticker_symbol, article_key) DO UPDATE SET
+            title = excluded.title, link = excluded.link, publisher = excluded.publisher,
+            summary = excluded.summary, fetched_at = excluded.fetched_at
+    """, rows)
+
+def store_news(conn: sqlite3.Connection, news_by_ticker: Dict[str, List[Dict[str, Any]]]) -> int:
+    """Upserts the tickers' raw feed entries in one commit; returns the number of articles written."""
+    ensure_news_table(conn)
+    now = time.time()
+    rows = [row for ticker, news in news_by_ticker.items() for row in
+            (article_row(ticker, news_item, now) for news_item in news or []) if row]
+    if rows:
+        with storage.timed_write("news_articles"), conn:
+            _upsert(conn, rows)
+    return len(rows)
+
+def article_rows(conn: sqlite3.Connection, tickers: Iterable[str], limit: int = TOP_N) -> List[tuple]:
+    """The tickers' `limit` latest stored rows, as store_rows() takes them (shard results carry these)."""
+    rows = []
+    for ticker in tickers:
+        rows.extend(conn.execute("""
+            SELECT ticker_symbol, article_key, title, link, publisher, summary, published_at, fetched_at
+            FROM news_articles WHERE ticker_symbol = ? ORDER BY published_at DESC LIMIT ?
+        """, (ticker, limit)).fetchall())
+    return rows
+
+def store_rows(conn: sqlite3.Connection, rows: Iterable[Sequence]) -> int:
+    """Upserts rows exported by article_rows() in one commit."""
+    ensure_news_table(conn)
+    rows = [tuple(row) for row in rows]
+    if rows:
+        with storage.timed_write("news_articles"), conn:
+            _upsert(conn, rows)
+    return len(rows)
+
+def prune_news(conn: sqlite3.Connection, retention_days: float = None) -> int:
+    """Deletes articles published before the retention window; returns the number removed."""
+    retention_days = config.NEWS_RETENTION_DAYS if retention_days is None else retention_days
+    if not retention_days:
+        return 0
+    ensure_news_table(conn)
+    with storage.timed_write("news_articles"), conn:
+        cursor = conn.execute("DELETE FROM news_articles WHERE published_at < ?",
+                              (time.time() - retention_days * 86400,))
+    return cursor.rowcount
+
+# --- Reads ---
+
+def fallback_news_items(ticker: str) -> List[Dict[str, Any]]:
+    """Builds the Google News search entry used when no direct feed exists."""
+    safe_ticker = ticker.replace('.BO', '').replace('.NS', '')
+    quoted_ticker = urllib.parse.quote(f"{safe_ticker} share news")
+    fallback_link = f"https://www.google.com/search?q={quoted_ticker}&tbm=nws"
+    return [{
+        "title": f"Search Intel: {safe_ticker}",
+        "link": fallback_link,
+        "publisher": "Google News Search",
+        "time": int(time.time()),
+        "summary": f"No direct news feed detected for {safe_ticker}. This fallback link will execute a secure search for the latest market intelligence on Google News."
+    }]
+
+def top_news(conn: sqlite3.Connection, ticker: str, limit: int = TOP_N,
+             fallback: bool = True) -> List[Dict[str, Any]]:
+    """
+    The ticker's `limit` latest articles in the modal's format (the search
+    entry when there are none). Expects ensure_news_table() to have run.
+    """
+    rows = conn.execute("""
+        SELECT title, link, publisher, published_at, summary FROM news_articles
+        WHERE ticker_symbol = ? ORDER BY published_at DESC LIMIT ?
+    """, (ticker, limit * 2)).fetchall()
+    items, links = [], set()
+    for title, link, publisher, published_at, summary in rows:
+        # Imported sidecar entries are keyed by link, so a re-fetch can repeat one
+        if link in links:
+            continue
+        links.add(link)
+        items.append({"title": title, "link": link, "publisher": publisher, "time": int(published_at),
+                      "summary": summary or "No summary available for this intelligence report."})
+    return items[:limit] or (fallback_news_items(ticker) if fallback else [])
+
+def latest_news(conn: sqlite3.Connection, tickers: Iterable[str], limit: int = TOP_N,
+                fallback: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+    """top_news() for several tickers, one index lookup each."""
+    return {ticker: top_news(conn, ticker, limit, fallback) for ticker in tickers}
+
+# --- Migration ---
+
+def import_legacy(conn: sqlite3.Connection, path: str = None) -> int:
+    """
+    Loads the articles of the old JSON sidecar (skipping generated search
+    entries) into news_articles. A one-time migration; rerunning it is harmless.
+    """
+    path = path or LEGACY_NEWS_PATH
+    if not os.path.exists(path):
+        print(f"No legacy news file at {path}; nothing to import.", flush=True)
+        return 0
+    try:
+        with open(path) as f:
+            news_map = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Legacy news file {path} not imported: {e}", flush=True)
+        return 0
+    now = time.time()
+    rows = []
+    for ticker, items in news_map.items():
+        # Early sidecars stored a bare URL per ticker
+        items = items if isinstance(items, list) else [{"title": "Latest News", "link": items, "publisher": "External"}]
+        for item in items:
+            link = item.get("link")
+            if not link or item.get("publisher") == "Google News Search":
+                continue
+            published = item.get("time")
+            if not isinstance(published, (int, float)):
+                published = article_published({"pubDate": published}) if published else None
+            rows.append((ticker, "sha1:" + hashlib.sha1(link.encode("utf-8")).hexdigest(), item.get("title") or "No Title",
+                         link, item.get("publisher"), item.get("summary"), published or now, now))
+    if rows:
+        with conn:
+            _upsert(conn, rows)
+    return len(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stored news articles")
+    parser.add_argument("tickers", nargs="*", help="print these tickers' latest articles")
+    parser.add_argument("--limit", type=int, default=TOP_N, help="articles per ticker (default %(default)s)")
+    parser.add_argument("--prune", action="store_true", help="apply the retention policy now")
+    parser.add_argument("--import-legacy", nargs="?", const=LEGACY_NEWS_PATH, metavar="PATH",
+                        help="import the articles of the old news_links.json (default: the one next to the scripts)")
+    args = parser.parse_args()
+
+    conn = storage.connect()
+    ensure_news_table(conn)
+    if args.import_legacy:
+        imported = import_legacy(conn, args.import_legacy)
+        if imported:
+            print(f"Imported {imported} articles from {args.import_legacy}.")
+    if args.prune:
+        print(f"Pruned {prune_news(conn)} articles older than {config.NEWS_RETENTION_DAYS:g} days.")
+    for ticker, items in latest_news(conn, args.tickers, args.limit).items():
+        print(ticker)
+        for item in items:
+            print(f"  {time.strftime('%Y-%m-%d %H:%M', time.localtime(item['time']))}  {item['title']}  <{item['link']}>")
+    count, tickers = conn.execute("SELECT COUNT(*), COUNT(DISTINCT ticker_symbol) FROM news_articles").fetchone()
+    print(f"{count} articles for {tickers} tickers.")
+    conn.close()
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+import zlib
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+import providers
+import request_governor
+import storage
+from request_governor import ThrottledError
+
+# --- Offline Market Data ---
+# Stand-ins for the live providers in providers.py, picked by config.DATA_SOURCE:
+#   record     the live providers, and every successful response is also
+#              saved under FIXTURES_DIR/<provider>/<op>/<ticker>.(csv|json)
+#   replay     serves those fixtures; anything never recorded is a failure
+#   synthetic  deterministic generated data for any ticker (see --seed-universe)
+# Replay and synthetic requests still go through request_governor under the
+# live host names, with OFFLINE_LATENCY_MS of injected latency and the
+# configured error/throttle rates, so rate limiting, retries and the circuit
+# breaker behave as they would against the real upstreams.
+
+HOSTS = {"yfinance": "yahoo", "nse": "nse"}
+
+def fixture_path(provider: str, op: str, ticker: str, ext: str = ".json") -> str:
+    return os.path.join(config.FIXTURES_DIR, provider, op, urllib.parse.quote(ticker, safe="") + ext)
+
+def _write_atomic(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def _read_history(path: str) -> pd.DataFrame:
+    return pd.read_csv(path, index_col="Date", parse_dates=True)
+
+class RecordingProvider:
+    """Wraps a live provider and saves each successful response as a fixture."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.name = inner.name
+        self.fundamental_fields = inner.fundamental_fields
+        self.lock = threading.Lock()
+
+    def history(self, tickers: List[str], period: str = None, start: str = None) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        panel, failed = self.inner.history(tickers, period=period, start=start)
+        if not panel.empty:
+            for ticker in panel.columns.get_level_values(0).unique():
+                frame = panel[ticker].dropna(how="all")
+                if not frame.empty:
+                    self._merge_history(ticker, frame)
+        return panel, failed
+
+    def _merge_history(self, ticker: str, frame: pd.DataFrame):
+        # Incremental loads only fetch recent bars; keep the older ones
+        path = fixture_path(self.name, "history", ticker, ".csv")
+        with self.lock:
+            if os.path.exists(path):
+                frame = pd.concat([_read_history(path), frame])
+                frame = frame[~frame.index.duplicated(keep="last")].sort_index()
+            _write_atomic(path, frame.reindex(columns=providers.HISTORY_FIELDS).to_csv(index_label="Date"))
+
+    def _record(self, op: str, ticker: str, value):
+        _write_atomic(fixture_path(self.name, op, ticker), json.dumps(value, default=str))
+        return value
+
+    def fundamentals(self, ticker: str) -> Dict[str, Any]:
+        return self._record("fundamentals", ticker, self.inner.fundamentals(ticker))
+
+    def news(self, ticker: str) -> List[Dict[str, Any]]:
+        return self._record("news", ticker, self.inner.news(ticker))
+
+    def last_close(self, ticker: str) -> Optional[float]:
+        return self._record("last_close", ticker, self.inner.last_close(ticker))
+
+class SimulatedProvider:
+    """
+    Base for providers that answer locally. Each request is governed like a
+    live one and gets the injected latency, errors and throttles; a history
+    chunk is one request charged per symbol, like a multi-symbol download.
+    """
+
+    fundamental_fields = None
+
+    def __init__(self, name: str):
+        self.name = name
+        self.host = HOSTS.get(name, name)
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def _serve(self, op: str, key: str, func, *args, cost: int = 1):
+        return request_governor.call(self.host, self._respond, op, key, func, *args, op=op, cost=cost)
+
+    def _respond(self, kind: str, key: str, func, *args):
+        # Seeded per request (not per thread), so a given run injects the same faults
+        with self.lock:
+            n = self.calls[(kind, key)] = self.calls.get((kind, key), 0) + 1
+        rng = random.Random(f"{config.OFFLINE_SEED}:{self.name}:{kind}:{key}:{n}")
+        if config.OFFLINE_LATENCY_MS > 0:
+            time.sleep(config.OFFLINE_LATENCY_MS / 1000 * rng.uniform(0.5, 1.5))
+        roll = rng.random()
+        if roll < config.OFFLINE_THROTTLE_RATE:
+            raise ThrottledError(f"injected throttle ({self.name} {kind} {key})")
+        if roll < config.OFFLINE_THROTTLE_RATE + config.OFFLINE_ERROR_RATE:
+            raise ConnectionError(f"injected upstream error ({self.name} {kind} {key})")
+        return func(*args)
+
+    def history(self, tickers: List[str], period: str = None, start: str = None) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        start = pd.Timestamp(start or providers.period_start(period))
+        return self._serve("history", tickers[0], self._history_panel, tickers, start, cost=len(tickers))
+
+    def _history_panel(self, tickers: List[str], start: pd.Timestamp) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        frames, failed = {}, {}
+        for ticker in tickers:
+            try:
+                frame = self.history_frame(ticker)
+                frame = frame[frame.index >= start]
+                if frame.empty:
+                    raise ValueError("No Data")
+                frames[ticker] = frame
+            except Exception as e:
+                failed[ticker] = str(e)
+        panel = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+        return panel, failed
+
+    def fundamentals(self, ticker: str) -> Dict[str, Any]:
+        return self._serve("fundamentals", ticker, self.fundamentals_data, ticker)
+
+    def news(self, ticker: str) -> List[Dict[str, Any]]:
+        return self._serve("news", ticker, self.news_data, ticker) or []
+
+    def last_close(self, ticker: str) -> Optional[float]:
+        return self._serve("last_close", ticker, self.last_close_data, ticker)
+
+class ReplayProvider(SimulatedProvider):
+    """Serves what RecordingProvider saved; nothing recorded means a failed request."""
+
+    def __init__(self, name: str, fundamental_fields=None):
+        super().__init__(name)
+        self.fundamental_fields = fundamental_fields
+
+    def history_frame(self, ticker: str) -> pd.DataFrame:
+        path = fixture_path(self.name, "history", ticker, ".csv")
+        if not os.path.exists(path):
+            raise LookupError(f"no recorded history for {ticker}")
+        return _read_history(path)
+
+    def _load(self, op: str, ticker: str):
+        path = fixture_path(self.name, op, ticker)
+        if not os.path.exists(path):
+            raise LookupError(f"no recorded {op} for {ticker}")
+        with open(path) as f:
+            return json.load(f)
+
+    def fundamentals_data(self, ticker: str) -> Dict[str, Any]:
+        return self._load("fundamentals", ticker)
+
+    def news_data(self, ticker: str) -> List[Dict[str, Any]]:
+        path = fixture_path(self.name, "news", ticker)
+        return self._load("news", ticker) if os.path.exists(path) else []
+
+    def last_close_data(self, ticker: str) -> Optional[float]:
+        return self._load("last_close", ticker)
+
+# --- Synthetic Data ---
+# Every value is derived from the ticker symbol (and the day, for news), so
+# the same universe gives the same data on every run and on every machine.
+
+SYNTHETIC_START = "2022-01-03"
+SYNTHETIC_SECTORS = [
+    "Banking", "Pharma", "Finance", "FMCG", "Automobile", "IT", "Chemicals",
+    "Iron & Steel", "Power", "Oil Production", "Jewellery", "Engineering & Construction",
+]
+SYNTHETIC_HEADLINES = [
+    ("{name} reports strong quarterly growth", "Revenue beat estimates on excellent demand and better margins."),
+    ("Analysts upgrade {name} after a good quarter", "Brokerages see a positive outlook and raise their targets."),
+    ("{name} shares fall on weak demand", "Poor volumes and higher costs hurt the latest quarter."),
+    ("{name} faces a difficult quarter", "Management flagged bad weather and slow orders as risks."),
+    ("{name} schedules its board meeting", "The board will consider the quarterly results."),
+]
+
+def _ticker_rng(ticker: str, stream: int) -> np.random.Generator:
+    return np.random.default_rng([zlib.crc32(ticker.encode("utf-8")), stream])
+
+@lru_cache(maxsize=8)
+def _business_days(end: str) -> pd.DatetimeIndex:
+    return pd.bdate_range(SYNTHETIC_START, end, name="Date")  # slow to build; shared by every ticker
+
+@lru_cache(maxsize=4096)
+def synthetic_history(ticker: str, end: str) -> pd.DataFrame:
+    """
+    Random-walk OHLCV on business days from SYNTHETIC_START to `end`. Each
+    series has its own generator, so a day's bar never changes as `end` moves.
+    """
+    days = _business_days(end)
+    n = len(days)
+    base = 20 * np.exp(_ticker_rng(ticker, 0).uniform(0, 5))
+    close = base * np.exp(np.cumsum(_ticker_rng(ticker, 1).normal(0.0003, 0.018, n)))
+    open_ = np.concatenate([[base], close[:-1]]) * (1 + _ticker_rng(ticker, 2).normal(0, 0.004, n))
+    spread = np.abs(_ticker_rng(ticker, 3).normal(0, 0.01, n))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + spread),
+        "Low": np.minimum(open_, close) * (1 - spread),
+        "Close": close,
+        "Volume": np.round(_ticker_rng(ticker, 4).lognormal(12, 0.6, n)),
+    }, index=days)
+
+class SyntheticProvider(SimulatedProvider):
+    """Generated history, fundamentals and news for any ticker; no fixtures needed."""
+
+    def history_frame(self, ticker: str) -> pd.DataFrame:
+        return synthetic_history(ticker, date.today().isoformat())
+
+    def last_close_data(self, ticker: str) -> Optional[float]:
+        return round(float(self.history_frame(ticker)["Close"].iloc[-1]), 2)
+
+    def fundamentals_data(self, ticker: str) -> Dict[str, Any]:
+        rng = _ticker_rng(ticker, 5)
+        return {
+            "trailingPE": round(float(rng.uniform(8, 60)), 2),
+            "heldPercentInsiders": round(float(rng.uniform(0, 0.75)), 4),
+            "heldPercentInstitutions": round(float(rng.uniform(0.05, 0.6)), 4),
+            "marketCap": round(float(rng.uniform(1e9, 5e12)), -6),
+            "currentPrice": self.last_close_data(ticker),
+        }
+
+    def news_data(self, ticker: str) -> List[Dict[str, Any]]:
+        today = date.today().isoformat()
+        rng = random.Random(f"{ticker}:{today}")
+        name = providers.nse_symbol(ticker)
+        news = []
+        for i in range(rng.randint(0, 4)):
+            title, summary = rng.choice(SYNTHETIC_HEADLINES)
+            news.append({
+                "id": f"synthetic-{ticker}-{today}-{i}",
+                "content": {
+                    "title": title.format(name=name),
+                    "summary": summary,
+                    "pubDate": (pd.Timestamp(today) + pd.Timedelta(hours=4 + i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "canonicalUrl": {"url": f"https://example.com/synthetic/{urllib.parse.quote(ticker)}/{today}/{i}"},
+                    "provider": {"displayName": "Synthetic Wire"},
+                },
+            })
+        return news
+
+def synthetic_tickers(count: int) -> List[str]:
+    return [f"SYN{i:05d}.BO" for i in range(1, count + 1)]
+
+def recorded_tickers(provider: str = "yfinance") -> List[str]:
+    """Tickers with recorded history under FIXTURES_DIR, for replaying a recorded universe."""
+    directory = os.path.join(config.FIXTURES_DIR, provider, "history")
+    if not os.path.isdir(directory):
+        return []
+    return sorted(urllib.parse.unquote(f[:-4]) for f in os.listdir(directory) if f.endswith(".csv"))
+
+def seed_universe(path: str, tickers: List[str]) -> int:
+    """Creates the dashboard tables at `path` and fills pattas_list with `tickers`."""
+    conn = storage.connect(path)
+    storage.ensure_core_tables(conn)
+    rows = [(ticker, providers.nse_symbol(ticker), SYNTHETIC_SECTORS[i % len(SYNTHETIC_SECTORS)])
+            for i, ticker in enumerate(tickers, start=1)]
+    written = storage.upsert_many(conn, "pattas_list", ("ticker_symbol", "company_name", "sector"), rows)
+    conn.close()
+    return written
+
+def build(source: str, live: Dict[str, Any]) -> Dict[str, Any]:
+    """The provider registry standing in for `live` under DATA_SOURCE=`source`."""
+    if source == "record":
+        registry = {name: RecordingProvider(p) for name, p in live.items()}
+    elif source == "replay":
+        registry = {name: ReplayProvider(name, p.fundamental_fields) for name, p in live.items()}
+    elif source == "synthetic":
+        registry = {name: SyntheticProvider(name) for name in live}
+    else:
+        raise ValueError(f"Unknown data source: {source} (expected live, record, replay or synthetic)")
+    where = "" if source == "synthetic" else f" (fixtures: {config.FIXTURES_DIR})"
+    print(f"Market data source: {source}{where}", flush=True)
+    return registry
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline market data utilities")
+    parser.add_argument("--seed-universe", type=int, metavar="N", required=True,
+                        help="create a database with N synthetic tickers in pattas_list")
+    parser.add_argument("--db", required=True, help="database to create (never the live pattas_list.db)")
+    args = parser.parse_args()
+    print(f"Seeded {seed_universe(args.db, synthetic_tickers(args.seed_universe))} synthetic tickers into {args.db}.")
@@ -1,79 +1,36 @@
-import sqlite3
-import yfinance as yf
-import pandas as pd
-import numpy as np
-from datetime import date
-from textblob import TextBlob
+import news_store
+import request_governor
+import signal_snapshot
+import storage
+import trading_calendar
+from fundamentals_cache import get_fundamentals
+from history_loader import load_history_panel
+from indicator_state import incremental_signals
+from providers import fetch_news
+from sentiment_store import score_articles, ticker_sentiment
 
-def calculate_rsi(data, window=14):
-    delta = data['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-    
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-def calculate_macd(data, slow=26, fast=12, signal=9):
-    exp1 = data['Close'].ewm(span=fast, adjust=False).mean()
-    exp2 = data['Close'].ewm(span=slow, adjust=False).mean()
-    macd = exp1 - exp2
-    signal_line = macd.ewm(span=signal, adjust=False).mean()
-    return macd, signal_line
-
-def interpret_signal(rsi, macd, signal_line):
-    # Determine MACD status
-    if macd > signal_line:
-        macd_status = "Bullish Crossover"
-    elif macd < signal_line:
-        macd_status = "Bearish Crossover"
-    else:
-        macd_status = "Neutral"
-
-    # Determine Overall Status
-    # Simple strategy: Buy if Bullish Crossover AND RSI < 70
-    # Sell if Bearish Crossover OR RSI > 70
-    if macd_status == "Bullish Crossover" and rsi < 70:
-        status = "BUY"
-    elif macd_status == "Bearish Crossover" or rsi > 70:
-        status = "SELL"
-    else:
-        status = "HOLD"
-        
-    return macd_status, status
+def fetch_ticker_news(ticker_symbol):
+    try:
+        return fetch_news(ticker_symbol)
+    except Exception as e:
+        print(f"⚠️ News unavailable for {ticker_symbol}: {e}")
+        return []
 
-def get_sentiment_score(ticker_symbol):
+def get_sentiment_score(ticker_symbol, news, conn):
+    # Articles were scored for the whole universe up front; read the aggregate
+    if not news:
+        return None
     try:
-        ticker = yf.Ticker(ticker_symbol)
-        news = ticker.news
-        
-        # Fallback: Try NSE ticker if BSE has no news
-        if not news and ticker_symbol.endswith('.BO'):
-            ns_symbol = ticker_symbol.replace('.BO', '.NS')
-            news = yf.Ticker(ns_symbol).news
-            
-        if not news:
-            return None
-        
-        polarities = []
-        for item in news:
-            title = item.get('title', '')
-            if not title and 'content' in item:
-                title = item['content'].get('title', '')
-                
-            if title:
-                blob = TextBlob(title)
-                polarities.append(blob.sentiment.polarity)
-        
-        if polarities:
-            avg_polarity = sum(polarities) / len(polarities)
+        avg_polarity = ticker_sentiment(conn, ticker_symbol)
+        if avg_polarity is not None:
             return round(avg_polarity, 4)
         return None
-    except Exception:
+    except Exception as e:
+        print(f"⚠️ Sentiment unavailable for {ticker_symbol}: {e}")
         return None
 
 def populate_daily_signals():
-    conn = sqlite3.connect('pattas_list.db')
+    conn = storage.connect()
     cursor = conn.cursor()
 
     # Get all verified tickers from the master table
@@ -82,48 +39,55 @@ def populate_daily_signals():
     
     print(f"Calculating signals and sentiment for {len(tickers)} companies...")
 
-    for ticker in tickers:
-        try:
-            stock = yf.Ticker(ticker)
-            # Fetch 6mo history to ensure enough data for MACD/RSI
-            hist = stock.history(period="6mo")
-            
-            if hist.empty or len(hist) < 30:
-                print(f"⚠️ Insufficient data for {ticker}. Skipping.")
-                continue
+    # Fetch 6mo history for the whole universe to ensure enough data for MACD/RSI
+    panel, errors = load_history_panel(tickers, period="6mo", conn=conn)
+    for error in errors:
+        print(f"⚠️ {error}. Skipping.")
 
-            # Calculate Indicators
-            hist['RSI'] = calculate_rsi(hist)
-            hist['MACD'], hist['Signal_Line'] = calculate_macd(hist)
-            
+    # Calculate Indicators for every ticker in one vectorized pass, folding only
+    # new bars into the persisted indicator state where possible
+    ready = list(panel.columns.get_level_values(0).unique()) if not panel.empty else []
+    signals = incremental_signals(panel, ready, conn)
+
+    # Keep each feed in the news store as soon as it arrives
+    news_by_ticker = {}
+    for ticker in ready:
+        news_by_ticker[ticker] = fetch_ticker_news(ticker)
+        news_store.store_news(conn, {ticker: news_by_ticker[ticker]})
+    news_store.prune_news(conn)
+
+    # Score every unseen article for the universe in one batch
+    try:
+        score_articles(conn, news_by_ticker)
+    except Exception as e:
+        print(f"⚠️ Sentiment scoring failed: {e}")
+
+    rows = []
+    # Rows are dated by the session the bars belong to, not the calendar day
+    session = trading_calendar.current_session()
+    for ticker in ready:
+        try:
             # Get latest valid data
-            latest = hist.iloc[-1]
-            rsi = latest['RSI']
-            macd_val = latest['MACD']
-            sig_val = latest['Signal_Line']
-            price = latest['Close']
-            
-            if np.isnan(rsi) or np.isnan(macd_val):
+            latest = signals.loc[ticker]
+            rsi = latest['rsi']
+            price = latest['close']
+            macd_signal, status = str(latest['macd_status']), str(latest['status'])
+
+            if not latest['valid']:
                  print(f"⚠️ Calculation error for {ticker}. Skipping.")
                  continue
 
-            macd_signal, status = interpret_signal(rsi, macd_val, sig_val)
-            
             # Get Fundamental Info
-            info = stock.info
+            info = get_fundamentals(ticker, ['trailingPE', 'heldPercentInsiders'])
             trailing_pe = info.get('trailingPE', 0)
             held_insiders = info.get('heldPercentInsiders', 0) * 100
             
             # Calculate Sentiment
-            sentiment = get_sentiment_score(ticker)
+            sentiment = get_sentiment_score(ticker, news_by_ticker[ticker], conn)
 
-            # Insert into DB
-            cursor.execute("""
-                INSERT OR REPLACE INTO daily_signals 
-                (ticker_symbol, date, price, rsi, macd_signal, sentiment_score, status, held_pct_insiders, trailing_pe)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (ticker, date.today(), round(price, 2), round(rsi, 2), macd_signal, 
-                  sentiment, status, round(held_insiders, 2), round(trailing_pe, 2)))
+            # Queue for the single bulk write below
+            rows.append((ticker, session, round(price, 2), round(rsi, 2), macd_signal, 
+                         sentiment, status, round(held_insiders, 2), round(trailing_pe, 2)))
             
             sent_str = f"{sentiment}" if sentiment is not None else "N/A"
             print(f"✅ {ticker}: RSI={rsi:.2f} | Sent={sent_str} | {status}")
@@ -131,8 +95,11 @@ def populate_daily_signals():
         except Exception as e:
             print(f"❌ Error processing {ticker}: {e}")
 
-    conn.commit()
+    # The dashboard snapshot is refreshed in the same transaction
+    written = signal_snapshot.upsert_many(conn, "daily_signals", storage.DAILY_SIGNAL_COLUMNS, rows)
     conn.close()
+    print(f"Wrote {written} rows to daily_signals.")
+    request_governor.report()
     print("\n✨ Daily Signals Populated Successfully.")
 
 if __name__ == "__main__":
@@ -1,9 +1,13 @@
-import sqlite3
-import yfinance as yf
 from datetime import date
 
+import positions
+import request_governor
+import storage
+from fundamentals_cache import get_fundamentals
+from providers import fetch_last_close
+
 def populate_purchase_history():
-    conn = sqlite3.connect('pattas_list.db')
+    conn = storage.connect()
     cursor = conn.cursor()
 
     # Get all verified tickers from the master table
@@ -12,41 +16,43 @@ def populate_purchase_history():
     
     print(f"Adding BUY transactions for {len(companies)} companies...")
 
+    # Check which stocks we already bought, for the whole list at once
+    owned = storage.existing_values(conn, "purchase_history", "ticker_symbol",
+                                    [ticker for ticker, _ in companies])
+
+    # Price from the latest scan where there is one; upstream only for the rest
+    latest = positions.latest_prices(conn, [ticker for ticker, _ in companies if ticker not in owned])
+
+    rows = []
     for ticker, name in companies:
+        if ticker in owned:
+            print(f"🔹 {ticker} already in portfolio. Skipping.")
+            continue
         try:
-            stock = yf.Ticker(ticker)
-            # Try to get the fast 'currentPrice', fallback to history if needed
-            price = stock.info.get('currentPrice')
+            # Latest daily signal, else the fast 'currentPrice' (cached), else history
+            price = latest.get(ticker)
+            if price is None:
+                price = get_fundamentals(ticker, ['currentPrice']).get('currentPrice')
             
             if price is None:
                 # Fallback: get last closing price
-                hist = stock.history(period="1d")
-                if not hist.empty:
-                    price = hist['Close'].iloc[-1]
-                else:
+                price = fetch_last_close(ticker)
+                if price is None:
                     print(f"⚠️ Could not fetch price for {ticker}. Skipping.")
                     continue
 
-            # Check if we already bought this stock to avoid duplicates
-            cursor.execute("SELECT 1 FROM purchase_history WHERE ticker_symbol = ?", (ticker,))
-            if cursor.fetchone():
-                print(f"🔹 {ticker} already in portfolio. Skipping.")
-                continue
-
-            # Insert Transaction
-            cursor.execute("""
-                INSERT INTO purchase_history 
-                (ticker_symbol, transaction_type, transaction_date, no_of_stocks, price_per_stock)
-                VALUES (?, ?, ?, ?, ?)
-            """, (ticker, 'BUY', date.today(), 10, round(price, 2)))
+            # Queue Transaction
+            rows.append((ticker, 'BUY', date.today(), 10, round(price, 2)))
             
             print(f"✅ Bought 10 {ticker} @ {price:.2f}")
             
         except Exception as e:
             print(f"❌ Failed to process {ticker}: {e}")
 
-    conn.commit()
+    # Log the transactions and fold them into the positions in one commit
+    positions.record_transactions(conn, rows)
     conn.close()
+    request_governor.report()
     print("\n✨ Purchase History Populated Successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,246 @@
+import argparse
+import sqlite3
+import time
+import pandas as pd
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import storage
+
+# --- Positions Engine ---
+# purchase_history is an append-only transaction log. `positions` holds its
+# running result per ticker (quantity, average cost, realized P&L) and
+# `positions_watermark` the last transaction folded in, so an update reads
+# only the transactions appended since, and reads never replay the log.
+# Average-cost accounting: a BUY blends its price into the average cost, a
+# SELL realizes (price - average cost) per share and keeps the average.
+
+TRANSACTION_COLUMNS = ("ticker_symbol", "transaction_type", "transaction_date", "no_of_stocks", "price_per_stock")
+
+def ensure_positions_tables(conn: sqlite3.Connection):
+    """Creates the materialized positions and their watermark if needed."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS positions (
+            ticker_symbol TEXT PRIMARY KEY,
+            quantity INTEGER NOT NULL,
+            avg_cost REAL NOT NULL,         -- per share still held
+            realized_pnl REAL NOT NULL,
+            last_transaction_id INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS positions_watermark (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_transaction_id INTEGER NOT NULL  -- purchase_history rows up to here are folded in
+        )
+    """)
+    conn.commit()
+
+def apply_transaction(position: Tuple[int, float, float], transaction_type: str,
+                      quantity: int, price: float) -> Tuple[int, float, float]:
+    """Folds one transaction into a (quantity, avg_cost, realized_pnl) position."""
+    held, avg_cost, realized = position
+    if transaction_type == "BUY":
+        total = held + quantity
+        avg_cost = (held * avg_cost + quantity * price) / total if total else 0.0
+        return total, avg_cost, realized
+    realized += quantity * (price - avg_cost)
+    held -= quantity
+    return held, avg_cost if held else 0.0, realized
+
+def _apply_pending(conn: sqlite3.Connection) -> int:
+    """Folds transactions past the watermark into `positions`; runs inside the caller's transaction."""
+    row = conn.execute("SELECT last_transaction_id FROM positions_watermark WHERE id = 1").fetchone()
+    watermark = row[0] if row else 0
+    pending = conn.execute("""
+        SELECT transaction_id, ticker_symbol, transaction_type, no_of_stocks, price_per_stock
+        FROM purchase_history WHERE transaction_id > ? ORDER BY transaction_id
+    """, (watermark,)).fetchall()
+    if not pending:
+        return 0
+
+    tickers = list(dict.fromkeys(t for _, t, *_ in pending))
+    current: Dict[str, Tuple[int, float, float]] = {}
+    for i in range(0, len(tickers), storage.SQLITE_MAX_VARIABLES):
+        batch = tickers[i:i + storage.SQLITE_MAX_VARIABLES]
+        placeholders = ",".join("?" * len(batch))
+        for ticker, quantity, avg_cost, realized in conn.execute(f"""
+            SELECT ticker_symbol, quantity, avg_cost, realized_pnl FROM positions
+            WHERE ticker_symbol IN ({placeholders})
+        """, batch):
+            current[ticker] = (quantity, avg_cost, realized)
+
+    last_id = {}
+    for transaction_id, ticker, transaction_type, quantity, price in pending:
+        position = current.get(ticker, (0, 0.0, 0.0))
+        if transaction_type == "SELL" and quantity > position[0]:
+            print(f"⚠️ Transaction {transaction_id}: SELL of {quantity} {ticker} exceeds the {position[0]} held.")
+        current[ticker] = apply_transaction(position, transaction_type, quantity, price)
+        last_id[ticker] = transaction_id
+
+    now = time.time()
+    with storage.timed_write("positions"):
+        conn.executemany("""
+            INSERT OR REPLACE INTO positions
+            (ticker_symbol, quantity, avg_cost, realized_pnl, last_transaction_id, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(t, *current[t], last_id[t], now) for t in tickers])
+        conn.execute("INSERT OR REPLACE INTO positions_watermark (id, last_transaction_id) VALUES (1, ?)",
+                     (pending[-1][0],))
+    return len(pending)
+
+def _in_write_transaction(conn: sqlite3.Connection, work) -> int:
+    # IMMEDIATE takes the write lock before reading the watermark, so two
+    # updaters can never fold the same transactions twice
+    ensure_positions_tables(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = work()
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+
+def update_positions(conn: sqlite3.Connection) -> int:
+    """Brings `positions` up to date with purchase_history; returns the number of transactions applied."""
+    return _in_write_transaction(conn, lambda: _apply_pending(conn))
+
+def record_transactions(conn: sqlite3.Connection, rows: Iterable[Sequence]) -> int:
+    """
+    Appends transactions (TRANSACTION_COLUMNS order) to purchase_history and
+    folds them into `positions` in the same transaction. Returns the row count.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    def work():
+        with storage.timed_write("purchase_history"):
+            conn.executemany(f"""
+                INSERT INTO purchase_history ({', '.join(TRANSACTION_COLUMNS)}) VALUES (?, ?, ?, ?, ?)
+            """, rows)
+        _apply_pending(conn)
+        return len(rows)
+
+    return _in_write_transaction(conn, work)
+
+def rebuild_positions(conn: sqlite3.Connection) -> int:
+    """Recomputes every position from the full log (after a correction to old transactions)."""
+    def work():
+        conn.execute("DELETE FROM positions")
+        conn.execute("DELETE FROM positions_watermark")
+        return _apply_pending(conn)
+
+    return _in_write_transaction(conn, work)
+
+# --- Valuation ---
+
+def latest_prices(conn: sqlite3.Connection, tickers: List[str]) -> Dict[str, float]:
+    """Latest daily_signals price per ticker, via the (ticker_symbol, date) primary key."""
+    prices = {}
+    for i in range(0, len(tickers), storage.SQLITE_MAX_VARIABLES):
+        batch = tickers[i:i + storage.SQLITE_MAX_VARIABLES]
+        placeholders = ",".join("?" * len(batch))
+        prices.update(conn.execute(f"""
+            SELECT d.ticker_symbol, d.price FROM daily_signals d
+            WHERE d.ticker_symbol IN ({placeholders}) AND d.price IS NOT NULL
+              AND d.date = (SELECT MAX(date) FROM daily_signals WHERE ticker_symbol = d.ticker_symbol)
+        """, batch).fetchall())
+    return prices
+
+def valuation(conn: sqlite3.Connection) -> pd.DataFrame:
+    """
+    Open (or realized) positions valued at each ticker's latest
+    daily_signals.price, in one query over `positions`.
+    """
+    update_positions(conn)
+    df = pd.read_sql_query("""
+        SELECT p.ticker_symbol, l.sector, p.quantity, p.avg_cost,
+               p.quantity * p.avg_cost AS cost_basis,
+               d.price, d.date AS price_date,
+               p.quantity * d.price AS market_value,
+               p.quantity * (d.price - p.avg_cost) AS unrealized_pnl,
+               p.realized_pnl
+        FROM positions p
+        LEFT JOIN pattas_list l ON l.ticker_symbol = p.ticker_symbol
+        LEFT JOIN daily_signals d ON d.ticker_symbol = p.ticker_symbol
+             AND d.date = (SELECT MAX(date) FROM daily_signals WHERE ticker_symbol = p.ticker_symbol)
+        WHERE p.quantity != 0 OR p.realized_pnl != 0
+        ORDER BY l.sector, p.ticker_symbol
+    """, conn)
+    df["unrealized_pct"] = df["unrealized_pnl"] / df["cost_basis"].where(df["cost_basis"] != 0) * 100
+    return df.set_index("ticker_symbol")
+
+def portfolio_history(conn: sqlite3.Connection) -> pd.DataFrame:
+    """
+    Daily portfolio value since the first transaction: holdings as of each
+    day times that day's close (price_history, else daily_signals, else the
+    trade price; carried forward over gaps). Columns: market_value,
+    net_invested (buys - sells) and pnl (realized + unrealized).
+    """
+    flows = pd.read_sql_query("""
+        SELECT ticker_symbol, transaction_date AS date,
+               SUM(CASE WHEN transaction_type = 'BUY' THEN no_of_stocks ELSE -no_of_stocks END) AS quantity,
+               SUM(CASE WHEN transaction_type = 'BUY' THEN 1 ELSE -1 END * no_of_stocks * price_per_stock) AS cash
+        FROM purchase_history GROUP BY ticker_symbol, transaction_date
+    """, conn, parse_dates=["date"])
+    if flows.empty:
+        return pd.DataFrame(columns=["market_value", "net_invested", "pnl"])
+
+    tickers = list(flows["ticker_symbol"].unique())
+    first = flows["date"].min().strftime("%Y-%m-%d")
+    placeholders = ",".join("?" * len(tickers))
+    frames = []
+    for table, column, date in (("price_history", "close", "date"), ("daily_signals", "price", "date"),
+                                ("purchase_history", "price_per_stock", "transaction_date")):
+        try:
+            frames.append(pd.read_sql_query(f"""
+                SELECT ticker_symbol, {date} AS date, {column} AS close FROM {table}
+                WHERE {date} >= ? AND ticker_symbol IN ({placeholders}) AND {column} IS NOT NULL
+            """, conn, params=[first, *tickers], parse_dates=["date"]))
+        except (sqlite3.OperationalError, pd.errors.DatabaseError):
+            pass  # price_history only exists once a scan has run
+    closes = pd.DataFrame()
+    for frame in frames:  # in priority order
+        closes = closes.combine_first(frame.pivot_table(index="date", columns="ticker_symbol", values="close"))
+
+    days = closes.index.union(pd.DatetimeIndex(flows["date"].unique())).sort_values()
+    holdings = flows.pivot_table(index="date", columns="ticker_symbol", values="quantity", aggfunc="sum") \
+        .reindex(days).fillna(0).cumsum()
+    closes = closes.reindex(index=days, columns=holdings.columns).ffill()
+    invested = flows.groupby("date")["cash"].sum().reindex(days).fillna(0).cumsum()
+
+    history = pd.DataFrame({"market_value": (holdings * closes).sum(axis=1), "net_invested": invested})
+    history["pnl"] = history["market_value"] - history["net_invested"]
+    history.index.name = "date"
+    return history
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Portfolio positions and P&L from purchase_history")
+    parser.add_argument("--history", action="store_true", help="print the daily portfolio value series")
+    parser.add_argument("--rebuild", action="store_true", help="recompute positions from the full transaction log")
+    args = parser.parse_args()
+
+    conn = storage.connect()
+    if args.rebuild:
+        print(f"Rebuilt positions from {rebuild_positions(conn)} transactions.")
+    else:
+        applied = update_positions(conn)
+        if applied:
+            print(f"Applied {applied} new transactions.")
+
+    with pd.option_context("display.width", 160, "display.max_columns", 20, "display.float_format", "{:,.2f}".format):
+        if args.history:
+            print(portfolio_history(conn).to_string())
+        else:
+            positions = valuation(conn)
+            print(positions.to_string())
+            unpriced = int((positions["price"].isna() & (positions["quantity"] != 0)).sum())
+            print(f"\nPositions: {int((positions['quantity'] != 0).sum())}  "
+                  f"Cost: {positions['cost_basis'].sum():,.2f}  "
+                  f"Value: {positions['market_value'].sum():,.2f}  "
+                  f"Unrealized: {positions['unrealized_pnl'].sum():,.2f}  "
+                  f"Realized: {positions['realized_pnl'].sum():,.2f}"
+                  + (f"  (no daily signal yet for {unpriced})" if unpriced else ""))
+    conn.close()
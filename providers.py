@@ -0,0 +1,288 @@
+import pandas as pd
+import yfinance as yf
+from nsepython import equity_history, nse_quote
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+import instrumentation
+import request_governor
+from request_governor import ThrottledError, is_throttle
+
+# --- Market Data Providers ---
+# Every provider returns history in the same schema: a frame indexed by date
+# with (ticker, field) columns over HISTORY_FIELDS, and fundamentals as a
+# dict keyed by yfinance `.info` field names. Callers go through
+# fetch_history()/fetch_fundamentals(), which use the configured provider and
+# only fall back to the other one on an actual failure. Every upstream request
+# goes through request_governor (rate limit, retry/backoff, circuit breaker).
+#
+# A provider has a `name`, `fundamental_fields` (None = everything) and
+# history(tickers, period, start), fundamentals(ticker), news(ticker) and
+# last_close(ticker). config.DATA_SOURCE swaps the live ones for recording,
+# replay or synthetic providers (see offline_providers.py).
+
+HISTORY_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Price basis of each provider's history: yfinance bars are split/dividend
+# adjusted (auto_adjust), NSE bars are raw. Series on different bases don't
+# line up, so a cached series is only ever extended on its own basis.
+HISTORY_BASIS = {"yfinance": "adjusted", "nse": "unadjusted"}
+
+# nsepython equity_history() column -> history field
+NSE_HISTORY_COLUMNS = {
+    "CH_OPENING_PRICE": "Open",
+    "CH_TRADE_HIGH_PRICE": "High",
+    "CH_TRADE_LOW_PRICE": "Low",
+    "CH_CLOSING_PRICE": "Close",
+    "CH_TOT_TRADED_QTY": "Volume",
+}
+
+def period_start(period: str, today: Optional[date] = None) -> str:
+    """Converts a yfinance-style period ("200d", "6mo", "2y") into an ISO start date."""
+    today = pd.Timestamp(today or date.today())
+    if period.endswith("mo"):
+        start = today - pd.DateOffset(months=int(period[:-2]))
+    elif period.endswith("y"):
+        start = today - pd.DateOffset(years=int(period[:-1]))
+    elif period.endswith("d"):
+        start = today - pd.DateOffset(days=int(period[:-1]))
+    else:
+        raise ValueError(f"Unsupported history period: {period}")
+    return start.strftime("%Y-%m-%d")
+
+def nse_symbol(ticker: str) -> str:
+    """Normalizes a Yahoo ticker (RELIANCE.BO / RELIANCE.NS) to its NSE symbol."""
+    return ticker.split('.')[0] if '.' in ticker else ticker
+
+class YFinanceProvider:
+    """Yahoo Finance via yfinance; history is downloaded for many symbols per call."""
+    name = "yfinance"
+    fundamental_fields = None  # the full `.info` payload
+
+    def history(self, tickers: List[str], period: str = None, start: str = None) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        """Returns (panel, {ticker: error}) for one chunk of tickers."""
+        # yf.download requests each symbol separately: charge the rate limit per symbol
+        return request_governor.call("yahoo", self._download, tickers, period, start, op="history", cost=len(tickers))
+
+    def _download(self, tickers: List[str], period: str, start: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        df = yf.download(
+            tickers,
+            period=None if start else period,
+            start=start,
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=True,   # same adjustment as Ticker.history()
+            actions=False,
+            threads=True,
+            progress=False,
+        )
+        if df is None or df.empty:
+            df = pd.DataFrame()
+        elif not isinstance(df.columns, pd.MultiIndex):
+            # Always hand back (ticker, field) columns, even for a single symbol
+            df.columns = pd.MultiIndex.from_product([[tickers[0]], df.columns])
+
+        errors = getattr(getattr(yf, "shared", None), "_ERRORS", None) or {}
+        failed = {t: str(errors.get(t, "No Data")) for t in tickers if not _has_bars(df, t)}
+        # yf.download reports per-symbol errors instead of raising; surface a
+        # throttle so the governor backs off and retries the chunk
+        throttled = [t for t, reason in failed.items() if is_throttle(RuntimeError(reason))]
+        if throttled:
+            raise ThrottledError(f"rate limited on {len(throttled)} of {len(tickers)} symbols")
+        return df, failed
+
+    def fundamentals(self, ticker: str) -> Dict[str, Any]:
+        return request_governor.call("yahoo", lambda: yf.Ticker(ticker).info, op="info")
+
+    def news(self, ticker: str) -> List[Dict[str, Any]]:
+        return request_governor.call("yahoo", lambda: yf.Ticker(ticker).news, op="news") or []
+
+    def last_close(self, ticker: str) -> Optional[float]:
+        hist = request_governor.call("yahoo", lambda: yf.Ticker(ticker).history(period="1d"), op="last_close")
+        return None if hist.empty else float(hist['Close'].iloc[-1])
+
+class NSEProvider:
+    """
+    NSE India via nsepython. History is one symbol per request (chunked by
+    nsepython into 40-day windows) and is NOT split/dividend adjusted.
+    The quote carries PE and last price but no shareholding fields.
+    """
+    name = "nse"
+    fundamental_fields = {"trailingPE", "currentPrice"}
+
+    def history_frame(self, ticker: str, start: str) -> pd.DataFrame:
+        """Fetches one ticker and maps the CH_* columns onto HISTORY_FIELDS."""
+        start_date = datetime.strptime(start, "%Y-%m-%d").strftime("%d-%m-%Y")
+        end_date = date.today().strftime("%d-%m-%Y")
+        raw = request_governor.call("nse", equity_history, nse_symbol(ticker), "EQ", start_date, end_date, op="history")
+        raw = pd.DataFrame(raw)
+        if raw.empty or "CH_TIMESTAMP" not in raw.columns:
+            raise ValueError("NSE Data empty")
+
+        df = pd.DataFrame({
+            field: pd.to_numeric(raw[column], errors="coerce")
+            for column, field in NSE_HISTORY_COLUMNS.items() if column in raw.columns
+        })
+        df.index = pd.to_datetime(raw["CH_TIMESTAMP"]).rename("Date")
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+        return df.reindex(columns=HISTORY_FIELDS)
+
+    def history(self, tickers: List[str], period: str = None, start: str = None) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        start = start or period_start(period)
+
+        def fetch(ticker):
+            try:
+                return ticker, self.history_frame(ticker, start), None
+            except Exception as e:
+                return ticker, None, str(e)
+
+        frames, failed = {}, {}
+        with ThreadPoolExecutor(max_workers=min(config.MAX_WORKERS, max(1, len(tickers))),
+                                initializer=instrumentation.inherit_context()) as pool:
+            for ticker, frame, error in pool.map(fetch, tickers):
+                if error is None:
+                    frames[ticker] = frame
+                else:
+                    failed[ticker] = error
+        panel = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+        return panel, failed
+
+    def fundamentals(self, ticker: str) -> Dict[str, Any]:
+        q = request_governor.call("nse", nse_quote, nse_symbol(ticker), op="quote")
+        if not q:
+            raise ValueError("NSE quote empty")
+        # nsepython has returned both the legacy quote-equity shape and the
+        # newer GetQuoteApi shape (equityResponse[0].secInfo/orderBook)
+        if q.get("equityResponse"):
+            eq = q["equityResponse"][0]
+            sec, order, meta = eq.get("secInfo") or {}, eq.get("orderBook") or {}, eq.get("metaData") or {}
+            pe, price = sec.get("pdSymbolPe"), order.get("lastPrice", meta.get("closePrice"))
+        else:
+            pe = (q.get("metadata") or {}).get("pdSymbolPe")
+            price = (q.get("priceInfo") or {}).get("lastPrice")
+
+        info = {}
+        if pe not in (None, "", "-"):
+            info["trailingPE"] = float(pe)
+        if price not in (None, "", "-"):
+            info["currentPrice"] = float(price)
+        return info
+
+    def news(self, ticker: str) -> List[Dict[str, Any]]:
+        return []  # NSE has no news feed
+
+    def last_close(self, ticker: str) -> Optional[float]:
+        return self.fundamentals(ticker).get("currentPrice")
+
+def build_providers(source: str = None) -> Dict[str, Any]:
+    """The provider registry for `source` (default config.DATA_SOURCE), keyed by provider name."""
+    source = source or config.DATA_SOURCE
+    live = {p.name: p for p in (YFinanceProvider(), NSEProvider())}
+    if source == "live":
+        return live
+    import offline_providers  # only needed off the live path
+    return offline_providers.build(source, live)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def registry() -> Dict[str, Any]:
+    """The configured providers, built on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = build_providers()
+    return _registry
+
+def _has_bars(df: pd.DataFrame, ticker: str) -> bool:
+    return (not df.empty and ticker in df.columns.get_level_values(0)
+            and df[(ticker, "Close")].notna().any())
+
+def _pair(primary_name: str):
+    providers = registry()
+    primary = providers[primary_name]
+    fallback = next(p for name, p in providers.items() if name != primary_name)
+    return primary, fallback
+
+def fetch_history(tickers: List[str], period: str = None, start: str = None,
+                  basis: str = None) -> Tuple[pd.DataFrame, Dict[str, str], Dict[str, str]]:
+    """
+    History for a chunk of tickers from config.HISTORY_PROVIDER; tickers it
+    fails on are retried once with the other provider. With `basis`, only
+    providers of that HISTORY_BASIS are asked (e.g. to extend a cached series).
+    Returns (panel, {ticker: error}, {ticker: basis}): the errors are for
+    tickers no provider could serve, the basis is that of the one that did.
+    """
+    candidates = [p for p in _pair(config.HISTORY_PROVIDER) if basis is None or HISTORY_BASIS[p.name] == basis]
+    if not candidates:
+        return pd.DataFrame(), {t: f"no {basis} history provider" for t in tickers}, {}
+    primary = candidates[0]
+    try:
+        panel, failed = primary.history(tickers, period=period, start=start)
+    except Exception as e:
+        panel, failed = pd.DataFrame(), {t: str(e) for t in tickers}
+    sources = {t: HISTORY_BASIS[primary.name] for t in tickers if t not in failed}
+
+    if failed and len(candidates) > 1:
+        fallback = candidates[1]
+        print(f"  {primary.name} history failed for {len(failed)} tickers, falling back to {fallback.name}...", flush=True)
+        try:
+            extra, still_failed = fallback.history(list(failed), period=period, start=start)
+        except Exception as e:
+            extra, still_failed = pd.DataFrame(), {t: str(e) for t in failed}
+        recovered = [t for t in failed if t not in still_failed and _has_bars(extra, t)]
+        if recovered:
+            if not panel.empty:
+                panel = panel.drop(columns=recovered, level=0, errors="ignore")
+            panel = pd.concat([panel, extra[recovered]], axis=1)
+            sources.update((t, HISTORY_BASIS[fallback.name]) for t in recovered)
+        instrumentation.emit("history_fallback", provider=fallback.name, tickers=len(failed), recovered=len(recovered))
+        failed = {t: f"{failed[t]}; {fallback.name}: {still_failed.get(t, 'No Data')}"
+                  for t in failed if not _has_bars(panel, t)}
+    instrumentation.emit("history_chunk", provider=primary.name, tickers=len(tickers), failed=len(failed),
+                         start=start, period=None if start else period)
+    return panel, failed, sources
+
+def fetch_fundamentals(ticker: str, fields: List[str]) -> Dict[str, Any]:
+    """
+    `.info`-style fundamentals from config.QUOTE_PROVIDER. The other provider
+    is only asked when the primary raises, or when a requested field is one
+    the primary never provides (e.g. shareholding on NSE).
+    """
+    primary, fallback = _pair(config.QUOTE_PROVIDER)
+    try:
+        info = dict(primary.fundamentals(ticker))
+        instrumentation.note("fundamentals_provider", primary.name)
+    except Exception as e:
+        print(f"  {primary.name} fundamentals failed for {ticker}, falling back to {fallback.name}: {e}", flush=True)
+        instrumentation.note("fundamentals_provider", fallback.name)
+        return dict(fallback.fundamentals(ticker))
+
+    supported = primary.fundamental_fields
+    if supported is not None and any(f not in supported for f in fields):
+        try:
+            for key, value in fallback.fundamentals(ticker).items():
+                info.setdefault(key, value)
+            instrumentation.note("fundamentals_provider", f"{primary.name}+{fallback.name}")
+        except Exception as e:
+            print(f"  {fallback.name} fundamentals failed for {ticker}: {e}", flush=True)
+    return info
+
+def fetch_news(ticker: str) -> List[Dict[str, Any]]:
+    """
+    yfinance news feed for `ticker`; a .BO symbol with no news falls back to
+    its .NS listing. NSE has no news feed, so there is no provider fallback.
+    """
+    yahoo = registry()["yfinance"]
+    instrumentation.note("news_provider", yahoo.name)
+    news = yahoo.news(ticker)
+    if not news and ticker.endswith('.BO'):
+        news = yahoo.news(ticker.replace('.BO', '.NS'))
+    return news
+
+def fetch_last_close(ticker: str) -> Optional[float]:
+    """Latest daily close from yfinance, or None when there is no bar."""
+    return registry()["yfinance"].last_close(ticker)
@@ -0,0 +1,189 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import config
+import instrumentation
+
+# --- Request Governor ---
+# Every upstream call (yfinance, nsepython) goes through call(host, func).
+# Each host gets:
+# - an adaptive token bucket: the rate halves on a throttle response and
+#   creeps back up to the configured rate while calls succeed;
+# - retries with jittered exponential backoff for transient errors only;
+# - a circuit breaker that fails fast after repeated failures, so a dead
+#   upstream costs one error per ticker instead of a full retry cycle.
+# Counters per host are printed by report() at the end of a run.
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream while a host's circuit breaker is open."""
+
+class ThrottledError(RuntimeError):
+    """Upstream answered with a rate-limit response (raised by callers that detect it themselves)."""
+
+THROTTLE_MARKERS = ("rate limit", "ratelimit", "too many requests", "429")
+TRANSIENT_MARKERS = ("timed out", "timeout", "connection", "temporarily", "502", "503", "504")
+
+def is_throttle(error: BaseException) -> bool:
+    text = f"{type(error).__name__} {error}".lower()
+    return isinstance(error, ThrottledError) or any(m in text for m in THROTTLE_MARKERS)
+
+def is_transient(error: BaseException) -> bool:
+    """Errors worth retrying: throttles, network failures and gateway errors."""
+    if is_throttle(error) or isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(m in text for m in TRANSIENT_MARKERS)
+
+class TokenBucket:
+    """Thread-safe token bucket whose refill rate adapts to throttling (AIMD)."""
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.min_rate = rate * config.GOVERNOR_MIN_RATE_FACTOR
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Takes `tokens` tokens, sleeping until they are available. Returns seconds waited."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the tokens now; a negative balance is the queue ahead of us
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def throttled(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def succeeded(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; lets one trial call through after `reset_after` seconds."""
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_after:
+                self.opened_at = time.monotonic()  # half-open: one trial per reset period
+                return True
+            return False
+
+    def record(self, ok: bool):
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.failures >= self.threshold:
+                    self.opened_at = time.monotonic()
+
+class Host:
+    def __init__(self, name: str, rate: float, burst: int):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(config.GOVERNOR_BREAKER_THRESHOLD, config.GOVERNOR_BREAKER_RESET_SECONDS)
+        self.counts = {"calls": 0, "retries": 0, "throttles": 0, "failures": 0, "short_circuits": 0}
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def count(self, key: str, waited: float = 0.0):
+        with self.lock:
+            self.counts[key] += 1
+            self.waited += waited
+
+_hosts: Dict[str, Host] = {}
+_hosts_lock = threading.Lock()
+
+def host(name: str) -> Host:
+    with _hosts_lock:
+        if name not in _hosts:
+            rate, burst = config.UPSTREAM_LIMITS.get(name, config.UPSTREAM_LIMITS["default"])
+            _hosts[name] = Host(name, rate, burst)
+        return _hosts[name]
+
+def call(host_name: str, func: Callable[..., Any], *args, op: str = None, cost: int = 1, **kwargs) -> Any:
+    """
+    Runs func(*args, **kwargs) against `host_name` under its rate limit,
+    retrying transient errors up to config.GOVERNOR_MAX_RETRIES times.
+    Non-transient errors (bad symbol, empty data) are raised at once.
+    `op` names the request kind ("history", "info", ...) in the timing summary;
+    `cost` is the number of upstream requests func makes (tokens per attempt).
+    """
+    h = host(host_name)
+    label = f"{host_name}:{op}" if op else host_name
+    attempt, last_error = 0, None
+    while True:
+        if not h.breaker.allow():
+            if attempt:  # the breaker opened while this call was retrying
+                h.count("failures")
+                raise last_error
+            h.count("short_circuits")
+            raise CircuitOpenError(f"{host_name} circuit open after repeated failures")
+
+        h.count("calls", h.bucket.acquire(cost))
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            instrumentation.record_latency("upstream", label, time.perf_counter() - start)
+            last_error = e
+            if not is_transient(e):
+                h.breaker.record(True)  # upstream answered; the request itself was bad
+                raise
+            if is_throttle(e):
+                h.count("throttles")
+                instrumentation.count("throttles")
+                h.bucket.throttled()
+            h.breaker.record(False)
+            if attempt >= config.GOVERNOR_MAX_RETRIES:
+                h.count("failures")
+                raise
+            attempt += 1
+            h.count("retries")
+            instrumentation.count("retries")
+            # Jitter keeps concurrent workers from retrying in lockstep
+            delay = min(config.GOVERNOR_BACKOFF_CAP, config.GOVERNOR_BACKOFF_BASE * 2 ** attempt)
+            time.sleep(random.uniform(delay / 2, delay))
+            continue
+
+        instrumentation.record_latency("upstream", label, time.perf_counter() - start)
+        h.breaker.record(True)
+        h.bucket.succeeded()
+        return result
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    """Counters per host since start-up."""
+    with _hosts_lock:
+        hosts = list(_hosts.values())
+    return {h.name: {**h.counts, "waited_s": round(h.waited, 2), "rate": round(h.bucket.rate, 2)}
+            for h in hosts}
+
+def report():
+    """Prints one line of counters per host that was called."""
+    for name, s in stats().items():
+        print(f"  [{name}] calls={s['calls']} retries={s['retries']} throttles={s['throttles']} "
+              f"failures={s['failures']} short_circuits={s['short_circuits']} "
+              f"waited={s['waited_s']}s rate={s['rate']}/s", flush=True)
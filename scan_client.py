@@ -0,0 +1,79 @@
+import argparse
+import json
+import re
+import sys
+import urllib.error
+import urllib.request
+
+import config
+
+# --- Scan Client ---
+# Asks the warm scan server (scan_server.py) for a scan and streams its
+# progress to stdout, so the dashboard's spawn path can switch from
+#   uv run python -u market_update_graph.py
+# to
+#   uv run python -u scan_client.py --fallback
+# and only pay the interpreter start-up for this small script. With
+# --fallback, the scan runs in-process when no server is listening.
+
+COMPLETED = re.compile(r"\[Scan completed with code (\d+)\]")
+
+class ServerUnavailable(RuntimeError):
+    pass
+
+def request_scan(stream: bool = False, new: bool = False, url: str = None, out=None) -> int:
+    """Streams one scan's output to `out`; returns the scan's exit code."""
+    out = out or sys.stdout
+    body = json.dumps({"stream": stream, "new": new}).encode("utf-8")
+    req = urllib.request.Request(f"{url or config.SCAN_SERVER_URL}/scan", data=body, method="POST",
+                                 headers={"Content-Type": "application/json"})
+    try:
+        response = urllib.request.urlopen(req)
+    except urllib.error.HTTPError as e:
+        out.write(f"Scan request rejected ({e.code}): {e.read().decode('utf-8', 'replace')}\n")
+        return 1
+    except urllib.error.URLError as e:
+        raise ServerUnavailable(str(e.reason)) from e
+
+    code, tail = 1, ""
+    with response:
+        while True:
+            chunk = response.read1(8192).decode("utf-8", "replace")
+            if not chunk:
+                break
+            out.write(chunk)
+            out.flush()
+            tail = (tail + chunk)[-200:]
+            match = COMPLETED.search(tail)
+            if match:
+                code = int(match.group(1))
+    return code
+
+def run_locally(stream: bool = False, new: bool = False) -> int:
+    """The cold path: run the scan in this process."""
+    import market_update_graph
+    import request_governor
+
+    if stream:
+        market_update_graph.run_streaming(force_new=new)
+    else:
+        market_update_graph.run_market_update(force_new=new)
+    request_governor.report()
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Request a scan from the warm scan server")
+    parser.add_argument("--stream", action="store_true", help="use the streaming pipeline")
+    parser.add_argument("--new", action="store_true", help="start a fresh run instead of resuming")
+    parser.add_argument("--url", help=f"server URL (default {config.SCAN_SERVER_URL})")
+    parser.add_argument("--fallback", action="store_true", help="run in-process if the server is not reachable")
+    args = parser.parse_args()
+
+    try:
+        sys.exit(request_scan(args.stream, args.new, args.url))
+    except ServerUnavailable as e:
+        if not args.fallback:
+            print(f"Scan server unavailable: {e}", file=sys.stderr)
+            sys.exit(2)
+        print(f"Scan server unavailable ({e}), running the scan in-process...", flush=True)
+        sys.exit(run_locally(args.stream, args.new))
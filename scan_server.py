@@ -0,0 +1,236 @@
+import argparse
+import json
+import sys
+import threading
+import time
+import traceback
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional, Tuple
+
+import config
+import request_governor
+
+# Heavy imports (pandas, yfinance, langgraph, textblob) and the graph
+# compilation happen once, when the server starts.
+import market_update_graph
+from sentiment_scoring import get_scorer
+
+# --- Warm Scan Server ---
+# Long-lived process that keeps the imported libraries, the compiled graph,
+# the upstream HTTP sessions and the in-process caches warm between scans.
+#
+#   POST /scan    body (optional JSON): {"stream": bool, "new": bool, "coalesce": bool}
+#                 Streams the scan's progress as plain text. A scan requested
+#                 while one is running attaches to it (its output is replayed
+#                 from the start) unless "coalesce" is false, which gets 409.
+#                 So does "new" while a scan without it is running (it may
+#                 have resumed a run): a fresh run cannot start until it ends.
+#   GET  /status  JSON: the running scan, if any, and the last finished one.
+#   GET  /health  "ok"
+#
+# Binds to localhost only; scan_client.py is the matching client.
+#
+# A scan's output is captured per scan, not by swapping sys.stdout around it:
+# the server's stdout (ScanOutput) routes each write by the writing thread's
+# context, which the scan thread sets to its job and the run's worker threads
+# inherit (instrumentation.inherit_context). Other threads (fundamentals
+# refreshers, request handlers) keep writing to the real stdout.
+
+_scan_job: ContextVar[Optional["ScanJob"]] = ContextVar("scan_job", default=None)
+
+class ScanOutput:
+    """The server's sys.stdout: writes from a scan's threads go to its job, the rest to `real`."""
+
+    def __init__(self, real):
+        self.real = real
+
+    def write(self, text: str) -> int:
+        return (_scan_job.get() or self.real).write(text)
+
+    def flush(self):
+        (_scan_job.get() or self.real).flush()
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+class ScanJob:
+    """One scan's progress output, readable by any number of followers."""
+
+    def __init__(self, stream: bool, new: bool):
+        self.stream = stream
+        self.new = new
+        self.started_at = time.time()
+        self.finished_at = None
+        self.code = None
+        self.chunks = []
+        self.cond = threading.Condition()
+
+    # File-like, so ScanOutput can route the scan's print() output here
+    def write(self, text: str) -> int:
+        with self.cond:
+            self.chunks.append(text)
+            self.cond.notify_all()
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def finish(self, code: int):
+        with self.cond:
+            self.code = code
+            self.finished_at = time.time()
+            self.chunks.append(f"\n[Scan completed with code {code}]\n")
+            self.cond.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        """Yields all output so far, then new output until the scan finishes."""
+        i = 0
+        while True:
+            with self.cond:
+                while i == len(self.chunks) and self.code is None:
+                    self.cond.wait()
+                pending, i = self.chunks[i:], len(self.chunks)
+                finished = self.code is not None
+            if pending:
+                yield "".join(pending)
+            if finished and i == len(self.chunks):
+                return
+
+    def summary(self) -> dict:
+        return {
+            "mode": "stream" if self.stream else "graph",
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "code": self.code,
+        }
+
+class ScanCoordinator:
+    """Runs at most one scan at a time; overlapping requests join the running one."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current: Optional[ScanJob] = None
+        self.last: Optional[ScanJob] = None
+
+    def submit(self, stream: bool = False, new: bool = False, coalesce: bool = True) -> Tuple[Optional[ScanJob], bool]:
+        """Returns (job, joined_existing); job is None when rejected."""
+        with self.lock:
+            if self.current is not None:
+                # Joining a resumed run would silently drop `new`
+                joinable = coalesce and (self.current.new or not new)
+                return (self.current, True) if joinable else (None, False)
+            job = self.current = ScanJob(stream, new)
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return job, False
+
+    def _run(self, job: ScanJob):
+        # This thread's context (inherited by the run's workers) routes output to the job
+        _scan_job.set(job)
+        code = 0
+        try:
+            if job.stream:
+                market_update_graph.run_streaming(force_new=job.new)
+            else:
+                market_update_graph.run_market_update(force_new=job.new)
+            request_governor.report()
+        except Exception:
+            traceback.print_exc(file=job)
+            code = 1
+        finally:
+            job.finish(code)
+            with self.lock:
+                self.current, self.last = None, job
+            print(f"Scan finished with code {code} in {job.finished_at - job.started_at:.1f}s", file=sys.stderr)
+
+coordinator = ScanCoordinator()
+
+class ScanHandler(BaseHTTPRequestHandler):
+    server_version = "PattasScan/1.0"
+
+    def _json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(b"ok")
+        elif self.path == "/status":
+            current, last = coordinator.current, coordinator.last
+            self._json(200, {
+                "running": current.summary() if current else None,
+                "last": last.summary() if last else None,
+            })
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/scan":
+            self._json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            options = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        except ValueError:
+            self._json(400, {"error": "invalid JSON body"})
+            return
+
+        new = bool(options.get("new"))
+        job, joined = coordinator.submit(
+            stream=bool(options.get("stream")),
+            new=new,
+            coalesce=options.get("coalesce", True),
+        )
+        if job is None:
+            error = "a scan is already running"
+            if new and options.get("coalesce", True):
+                error += " without \"new\" and may resume an unfinished run; retry once it finishes"
+            self._json(409, {"error": error})
+            return
+
+        # No Content-Length: the body is streamed until the scan ends
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("X-Scan-Coalesced", "1" if joined else "0")
+        self.end_headers()
+        try:
+            if joined:
+                self.wfile.write(b"Joining the scan already in progress...\n")
+            for text in job.follow():
+                self.wfile.write(text.encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client went away; the scan itself keeps running
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[scan-server] {self.address_string()} {format % args}\n")
+
+def serve(host: str = None, port: int = None):
+    host = host or config.SCAN_SERVER_HOST
+    port = port or config.SCAN_SERVER_PORT
+    get_scorer()  # load the sentiment lexicon before the first scan
+    if not isinstance(sys.stdout, ScanOutput):
+        sys.stdout = ScanOutput(sys.stdout)
+    server = ThreadingHTTPServer((host, port), ScanHandler)
+    server.daemon_threads = True
+    print(f"Scan server listening on http://{host}:{port}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm market-update scan server")
+    parser.add_argument("--host", help=f"bind address (default {config.SCAN_SERVER_HOST})")
+    parser.add_argument("--port", type=int, help=f"port (default {config.SCAN_SERVER_PORT})")
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -0,0 +1,267 @@
+import argparse
+import random
+import sqlite3
+import time
+import traceback
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+import config
+import request_governor
+import sharding
+import storage
+import trading_calendar
+from history_loader import ensure_price_history_table, ticker_frame
+
+# --- Scheduled Runs ---
+# A scan only produces new information once a session has closed and its bar
+# has settled upstream. The scheduler finds the latest settled session (see
+# trading_calendar.py) and the tickers still missing it: those whose history
+# was not fetched after it settled (or does not reach it), or that have no
+# daily_signals row dated on it, unless a run already tried them for this
+# session after it settled (session_attempts): a ticker that failed to fetch
+# or compute is retried on the next session or with --new, not on every run.
+# A ticker whose session bar is merely not out yet is not logged, so the next
+# run picks it up again. If none are,
+# the run is skipped: on weekends,
+# on holidays and intraday that is the usual case, unless the previous session
+# was never (fully) processed. Otherwise the graph runs over just those
+# tickers and dates their rows by the session instead of the calendar day,
+# computing them from the bars up to the session only (clip_to_session):
+# during market hours the newest cached bar is today's, still moving.
+#   scheduler.py             shows the plan
+#   scheduler.py --run       one scheduled run (a no-op if nothing is stale)
+#   scheduler.py --daemon    a scheduled run on every config.SCHEDULE tick
+
+def ensure_session_attempts_table(conn: sqlite3.Connection):
+    """Creates the per-ticker, per-session attempt log if it does not exist yet."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS session_attempts (
+            ticker_symbol TEXT NOT NULL,
+            session DATE NOT NULL,
+            attempted_at REAL NOT NULL,
+            error TEXT,
+            PRIMARY KEY (ticker_symbol, session)
+        )
+    """)
+
+def record_attempts(conn: sqlite3.Connection, session: str, tickers: List[str], errors: List[str]) -> int:
+    """
+    Logs that a run processed `tickers` for `session`, with the reason from
+    their "TICKER: reason" `errors` (NULL if they succeeded). Returns the count.
+    """
+    ensure_session_attempts_table(conn)
+    reasons = {}
+    for error in errors:
+        ticker, _, reason = error.partition(": ")
+        reasons.setdefault(ticker, reason)
+    attempted_at = time.time()
+    return storage.upsert_many(conn, "session_attempts", ("ticker_symbol", "session", "attempted_at", "error"),
+                               [(ticker, session, attempted_at, reasons.get(ticker)) for ticker in tickers])
+
+def clear_attempts(conn: sqlite3.Connection, session: str) -> int:
+    """Forgets `session`'s attempts, so the next run retries every ticker still missing it."""
+    ensure_session_attempts_table(conn)
+    cleared = conn.execute("DELETE FROM session_attempts WHERE session = ?", (session,)).rowcount
+    conn.commit()
+    return cleared
+
+def stale_tickers(conn: sqlite3.Connection, tickers: List[str], session: str) -> List[str]:
+    """The `tickers` (in order) that still need processing for `session` (ISO date)."""
+    ensure_price_history_table(conn)
+    ensure_session_attempts_table(conn)
+    settled = trading_calendar.settled_at(date.fromisoformat(session)).timestamp()
+    fresh = set()
+    # Each batch is bound twice, once per arm of the UNION
+    step = storage.SQLITE_MAX_VARIABLES // 2
+    for i in range(0, len(tickers), step):
+        batch = tickers[i:i + step]
+        placeholders = ",".join("?" * len(batch))
+        fresh.update(row[0] for row in conn.execute(f"""
+            SELECT m.ticker_symbol FROM price_history_meta m
+            WHERE m.ticker_symbol IN ({placeholders})
+              AND m.last_date >= ? AND m.fetched_at >= ?
+              AND EXISTS (SELECT 1 FROM daily_signals d WHERE d.ticker_symbol = m.ticker_symbol AND d.date = ?)
+            UNION
+            SELECT a.ticker_symbol FROM session_attempts a
+            WHERE a.ticker_symbol IN ({placeholders}) AND a.session = ? AND a.attempted_at >= ?
+        """, [*batch, session, settled, session, *batch, session, settled]))
+    return [ticker for ticker in tickers if ticker not in fresh]
+
+def clip_to_session(panel: pd.DataFrame, tickers: List[str], session: str) -> Tuple[pd.DataFrame, List[str], List[str]]:
+    """
+    The history panel cut at `session` (ISO date), so signals and prices are
+    the session's own. Returns (panel, tickers with a bar on the session,
+    "TICKER: reason" errors for the others, e.g. a late or halted feed).
+    """
+    if not panel.empty:
+        panel = panel.loc[:session]
+    ready, errors = [], []
+    for ticker in tickers:
+        frame = ticker_frame(panel, ticker)
+        if frame.empty or frame.index[-1].strftime("%Y-%m-%d") != session:
+            last = frame.index[-1].strftime("%Y-%m-%d") if not frame.empty else "none"
+            errors.append(f"{ticker}: no {session} bar yet (last bar {last})")
+        else:
+            ready.append(ticker)
+    return panel, ready, errors
+
+def plan(conn: sqlite3.Connection = None, now: datetime = None, retry: bool = False) -> Dict[str, Any]:
+    """
+    What a scheduled run at `now` would do: {"session", "phase", "closed",
+    "universe", "stale"}. With `retry`, the session's attempts are cleared first.
+    """
+    now = now or trading_calendar.market_now()
+    own_conn = conn is None
+    if own_conn:
+        conn = storage.connect()
+    universe = [row[0] for row in conn.execute("SELECT ticker_symbol FROM pattas_list")]
+    session = trading_calendar.latest_settled_session(now).isoformat()
+    if retry:
+        print(f"Cleared {clear_attempts(conn, session)} recorded attempts for {session}.", flush=True)
+    stale = stale_tickers(conn, universe, session)
+    if own_conn:
+        conn.close()
+    return {
+        "session": session,
+        "phase": trading_calendar.market_phase(now),
+        "closed": trading_calendar.closure_reason(now.date()),
+        "universe": len(universe),
+        "stale": stale,
+    }
+
+def describe(p: Dict[str, Any]) -> str:
+    phase = p["phase"] + (f" ({p['closed']})" if p["closed"] else "")
+    return (f"Market {phase}; latest settled session {p['session']}: "
+            f"{len(p['stale'])} of {p['universe']} tickers need it.")
+
+def run_scheduled(force_new: bool = False, shards: int = None, by: str = None) -> bool:
+    """One scheduled run: skipped if no ticker needs the latest session. Returns whether it ran."""
+    # The graph's imports are heavy; the plan alone does not need them
+    import market_update_graph
+
+    p = plan(retry=force_new)
+    print(describe(p), flush=True)
+    if not p["stale"]:
+        print("Nothing new since the last run; skipping the scan.", flush=True)
+        return False
+    if shards:
+        sharding.run_local(shards, by, force_new=force_new, session=p["session"])
+    else:
+        market_update_graph.run_market_update(force_new=force_new, session=p["session"])
+    request_governor.report()
+    return True
+
+# --- Cron Schedule ---
+# Standard five fields (minute hour day-of-month month day-of-week, Sunday = 0
+# or 7) with *, lists, ranges and steps, evaluated in exchange time. As in
+# cron, if both day fields are restricted a day matching either one fires.
+
+CRON_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7))
+
+def parse_cron(expr: str) -> Tuple[Tuple[set, bool], ...]:
+    """'m h dom mon dow' -> one (allowed values, restricted) pair per field."""
+    parts = expr.split()
+    if len(parts) != len(CRON_FIELDS):
+        raise ValueError(f"cron schedule needs {len(CRON_FIELDS)} fields, got {expr!r}")
+    fields = []
+    for part, (name, low, high) in zip(parts, CRON_FIELDS):
+        values = set()
+        for item in part.split(","):
+            spec, _, step = item.partition("/")
+            try:
+                if spec == "*":
+                    start, end = low, high
+                elif "-" in spec:
+                    start, end = (int(v) for v in spec.split("-"))
+                else:
+                    start = end = int(spec)
+                    if step:
+                        end = high
+                step = int(step) if step else 1
+            except ValueError:
+                raise ValueError(f"bad {name} field {part!r} in cron schedule {expr!r}")
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f"{name} field {part!r} out of range {low}-{high} in {expr!r}")
+            values.update(range(start, end + 1, step))
+        if name == "weekday" and 7 in values:
+            values = (values - {7}) | {0}
+        fields.append((values, part != "*"))
+    return tuple(fields)
+
+def _day_matches(fields, moment: datetime) -> bool:
+    _, _, (days, days_set), (months, _), (weekdays, weekdays_set) = fields
+    if moment.month not in months:
+        return False
+    by_day = moment.day in days
+    by_weekday = (moment.weekday() + 1) % 7 in weekdays
+    if days_set and weekdays_set:
+        return by_day or by_weekday
+    return by_day and by_weekday
+
+def next_fire(fields, after: datetime) -> datetime:
+    """The first minute strictly after `after` that the schedule matches."""
+    (minutes, _), (hours, _) = fields[0], fields[1]
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = moment + timedelta(days=366 * 5)
+    while moment < limit:
+        if not _day_matches(fields, moment):
+            moment = (moment + timedelta(days=1)).replace(hour=0, minute=0)
+        elif moment.hour not in hours:
+            moment = (moment + timedelta(hours=1)).replace(minute=0)
+        elif moment.minute not in minutes:
+            moment += timedelta(minutes=1)
+        else:
+            return moment
+    raise ValueError("cron schedule never fires")
+
+def run_daemon(schedule: str = None, jitter: float = None, force_new: bool = False,
+               shards: int = None, by: str = None):
+    """Runs run_scheduled() on every tick of `schedule`, each delayed by up to `jitter` seconds."""
+    schedule = schedule or config.SCHEDULE
+    jitter = config.SCHEDULE_JITTER_SECONDS if jitter is None else jitter
+    fields = parse_cron(schedule)
+    print(f"Scheduler started: '{schedule}' (exchange time), up to {jitter:.0f}s jitter.", flush=True)
+    while True:
+        fire = next_fire(fields, trading_calendar.market_now()) + timedelta(seconds=random.uniform(0, jitter))
+        print(f"Next scheduled run at {fire:%Y-%m-%d %H:%M:%S}.", flush=True)
+        # Short sleeps, so a suspended host or a clock change does not oversleep a tick
+        while (remaining := (fire - trading_calendar.market_now()).total_seconds()) > 0:
+            time.sleep(min(remaining, 60))
+        try:
+            run_scheduled(force_new=force_new, shards=shards, by=by)
+        except Exception:
+            traceback.print_exc()
+            print("Scheduled run failed; the next one resumes it.", flush=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trading-calendar-aware scheduling of market updates")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--run", action="store_true", help="run the scan now if any ticker needs the latest session")
+    mode.add_argument("--daemon", action="store_true", help="run scheduled scans on the cron schedule until stopped")
+    parser.add_argument("--schedule", default=config.SCHEDULE, help="cron schedule in exchange time (default '%(default)s')")
+    parser.add_argument("--jitter", type=float, default=config.SCHEDULE_JITTER_SECONDS,
+                        help="max random delay per scheduled run, in seconds (default %(default)s)")
+    parser.add_argument("--shards", type=int, metavar="N", help="run each scan as N local shard workers")
+    parser.add_argument("--shard-by", choices=sharding.SHARD_MODES, default=config.SHARD_BY,
+                        help="split by ticker hash or by whole sectors (default %(default)s)")
+    parser.add_argument("--new", action="store_true",
+                        help="start fresh runs instead of resuming today's unfinished one, retrying the session's failed tickers")
+    args = parser.parse_args()
+    try:
+        fields = parse_cron(args.schedule)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.daemon:
+        try:
+            run_daemon(args.schedule, args.jitter, force_new=args.new, shards=args.shards, by=args.shard_by)
+        except KeyboardInterrupt:
+            print("Scheduler stopped.")
+    elif args.run:
+        run_scheduled(force_new=args.new, shards=args.shards, by=args.shard_by)
+    else:
+        print(describe(plan()))
+        print(f"Next scheduled run: {next_fire(fields, trading_calendar.market_now()):%Y-%m-%d %H:%M} (+ up to {args.jitter:.0f}s).")
@@ -0,0 +1,163 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List
+
+import config
+
+# --- Sentiment Scoring ---
+# Scores a batch of article texts as polarity in -1.0 .. 1.0. The "textblob"
+# backend calls TextBlob per text; the "lexicon" backend runs the same
+# pattern-lexicon algorithm from precompiled tables, without building a
+# TextBlob per text. Large batches are split into chunks across processes,
+# because scoring is CPU bound.
+
+SCORE_CHUNK_SIZE = 64
+
+class LexiconScorer:
+    """
+    TextBlob's PatternAnalyzer polarity (textblob.en.sentiment) with the
+    lexicon flattened into plain dicts and the tokenizer reduced to the steps
+    that affect which words are looked up. Modifiers ("very good"),
+    negations ("not good"), "!" boosts and emoticons are handled like pattern does.
+    """
+
+    def __init__(self):
+        from textblob import _text
+        from textblob.en import sentiment as lexicon
+
+        len(lexicon)  # lazydict: loads the XML lexicon on first use
+        self.polarity_of = {}
+        self.intensity_of = {}
+        self.modifiers = set()
+        for word, senses in dict.items(lexicon):
+            p, _, i = senses[None]
+            self.polarity_of[word] = p
+            self.intensity_of[word] = i
+            if "RB" in senses:
+                self.modifiers.add(word)
+        self.negations = set(lexicon.negations)
+        self.emoticons = {e.lower(): p for (_, p), faces in _text.EMOTICONS.items() for e in faces}
+
+        self.punctuation = _text.PUNCTUATION
+        self.leading = tuple(_text.PUNCTUATION.replace(".", ""))
+        self.trailing = self.leading + (".",)
+        self.abbreviations = _text.ABBREVIATIONS
+        self.abbreviation_patterns = (_text.RE_ABBR1, _text.RE_ABBR2, _text.RE_ABBR3)
+        self.contractions = re.compile("|".join(re.escape(c) for c in _text.replacements))
+        self.quotes = re.compile("([“”‘’'\"])")
+        self.sarcasm = _text.RE_SARCASM
+        self.emoticon_runs = _text.RE_EMOTICONS
+
+    def _is_abbreviation(self, token: str) -> bool:
+        return token in self.abbreviations or any(p.match(token) for p in self.abbreviation_patterns)
+
+    def tokens(self, text: str) -> List[str]:
+        """Lower-cased tokens as textblob.en.parser.find_tokens() produces them."""
+        text = self.contractions.sub(lambda m: " " + m.group(0), text)
+        text = self.quotes.sub(r" \1 ", text)
+        tokens = []
+        for t in text.split():
+            if t.isalnum():  # plain word, nothing to split off
+                tokens.append(t)
+                continue
+            tail = []
+            while t.startswith(self.leading):
+                tokens.append(t[0])
+                t = t[1:]
+            while t.endswith(self.trailing):
+                if t.endswith(self.leading):
+                    tail.append(t[-1])
+                    t = t[:-1]
+                if t.endswith("..."):
+                    tail.append("...")
+                    t = t[:-3].rstrip(".")
+                if t.endswith("."):
+                    if self._is_abbreviation(t):
+                        break
+                    tail.append(".")
+                    t = t[:-1]
+            if t:
+                tokens.append(t)
+            tokens.extend(reversed(tail))
+
+        joined = " ".join(tokens)
+        if "!" in joined:
+            joined = self.sarcasm.sub("(!)", joined)
+        joined = self.emoticon_runs.sub(lambda m: m.group(1).replace(" ", "") + m.group(2), joined)
+        return joined.lower().split()
+
+    def polarity(self, text: str) -> float:
+        # Each assessment is [polarity, intensity, negated]
+        a = []
+        m = None  # preceding modifier
+        n = None  # preceding negation
+        for w in self.tokens(text):
+            p = self.polarity_of.get(w)
+            if p is not None:
+                if m is None:
+                    a.append([p, self.intensity_of[w], False])
+                else:
+                    a[-1][0] = max(-1.0, min(p * a[-1][1], 1.0))
+                    a[-1][1] = self.intensity_of[w]
+                if n is not None:
+                    a[-1][1] = 1.0 / a[-1][1]
+                    a[-1][2] = True
+                m = w if w in self.modifiers else None
+                n = w if w in self.negations else None
+            else:
+                if w in self.negations:
+                    n = w
+                elif n and len(w.strip("'")) > 1:
+                    n = None
+                if n is not None and m is not None and m.endswith("ly"):
+                    a[-1][2] = True
+                    n = None
+                elif m and len(w) > 2:
+                    m = None
+                if w == "!" and a:
+                    a[-1][0] = max(-1.0, min(a[-1][0] * 1.25, 1.0))
+                if w == "(!)":
+                    a.append([0.0, 1.0, False])
+                if not w.isalpha() and len(w) <= 5 and w not in self.punctuation and w in self.emoticons:
+                    a.append([self.emoticons[w], 1.0, False])
+        if not a:
+            return 0.0
+        return sum(p * -0.5 if negated else p for p, _, negated in a) / len(a)
+
+def _textblob_polarity(text: str) -> float:
+    from textblob import TextBlob
+    return TextBlob(text).sentiment.polarity
+
+_scorers: Dict[str, Callable[[str], float]] = {}
+
+def get_scorer(backend: str = None) -> Callable[[str], float]:
+    """Returns the text -> polarity function for `backend` ("textblob" or "lexicon")."""
+    backend = backend or config.SENTIMENT_BACKEND
+    if backend not in _scorers:
+        if backend == "textblob":
+            _scorers[backend] = _textblob_polarity
+        elif backend == "lexicon":
+            _scorers[backend] = LexiconScorer().polarity
+        else:
+            raise ValueError(f"Unknown sentiment backend: {backend}")
+    return _scorers[backend]
+
+def _score_chunk(backend: str, texts: List[str]) -> List[float]:
+    score = get_scorer(backend)
+    return [score(text) for text in texts]
+
+def score_texts(texts: List[str], backend: str = None, workers: int = None,
+                chunk_size: int = SCORE_CHUNK_SIZE) -> List[float]:
+    """
+    Polarity for every text, in input order. Batches larger than one chunk
+    are fanned out over a process pool of config.SENTIMENT_WORKERS.
+    """
+    backend = backend or config.SENTIMENT_BACKEND
+    workers = workers or config.SENTIMENT_WORKERS
+    if workers <= 1 or len(texts) <= chunk_size:
+        return _score_chunk(backend, texts)
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        scored = pool.map(_score_chunk, [backend] * len(chunks), chunks)
+        return [polarity for chunk in scored for polarity in chunk]
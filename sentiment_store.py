@@ -0,0 +1,170 @@
+import hashlib
+import sqlite3
+import time
+import pandas as pd
+from typing import Any, Dict, List, Optional
+
+import config
+import instrumentation
+import storage
+from sentiment_scoring import score_texts
+
+# --- Article Sentiment Store ---
+# Every scored article is kept with its polarity, so a headline that shows up
+# in the feed again tomorrow is never re-scored, and a ticker's sentiment can
+# draw on more than the current feed page.
+
+def ensure_article_sentiment_table(conn: sqlite3.Connection):
+    """Creates the scored-article table if needed."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS article_sentiment (
+            ticker_symbol TEXT NOT NULL,
+            article_key TEXT NOT NULL,  -- stable article id, or a hash of its URL/title
+            polarity REAL NOT NULL,     -- pattern polarity, -1.0 .. 1.0
+            published_at REAL,          -- epoch seconds
+            scored_at REAL NOT NULL,
+            PRIMARY KEY (ticker_symbol, article_key)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_article_sentiment_key ON article_sentiment(article_key)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_article_sentiment_pub ON article_sentiment(ticker_symbol, published_at)")
+
+def _content(news_item: Dict[str, Any]) -> Dict[str, Any]:
+    # yfinance news can have info at top level or nested in 'content'
+    return news_item.get('content') or news_item
+
+def article_link(news_item: Dict[str, Any]) -> Optional[str]:
+    """Best link for a yfinance news entry, or None."""
+    c = _content(news_item)
+    if c.get('link'):
+        return c['link']
+    if c.get('clickThroughUrl'):
+        return c['clickThroughUrl'].get('url')
+    if c.get('canonicalUrl'):
+        return c['canonicalUrl'].get('url')
+    return news_item.get('link')
+
+def article_key(news_item: Dict[str, Any]) -> str:
+    """Stable key: the feed's own id when present, else a hash of the link or title."""
+    c = _content(news_item)
+    ident = news_item.get('id') or news_item.get('uuid') or c.get('id') or c.get('uuid')
+    if ident:
+        return str(ident)
+    basis = article_link(news_item) or c.get('title') or news_item.get('title') or ""
+    return "sha1:" + hashlib.sha1(basis.encode("utf-8")).hexdigest()
+
+def article_text(news_item: Dict[str, Any]) -> str:
+    """Headline plus summary, the text that gets scored."""
+    c = _content(news_item)
+    title = c.get('title') or news_item.get('title')
+    summary = c.get('summary') or c.get('description') or news_item.get('summary')
+    text = ""
+    if title: text += title + ". "
+    if summary: text += summary
+    return text.strip()
+
+def article_published(news_item: Dict[str, Any]) -> Optional[float]:
+    """Publish time as epoch seconds (feeds use ISO strings or epoch ints)."""
+    c = _content(news_item)
+    value = c.get('pubDate') or c.get('providerPublishTime') or news_item.get('providerPublishTime')
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return pd.Timestamp(value).timestamp()
+    except (ValueError, TypeError):
+        return None
+
+def score_articles(conn: sqlite3.Connection, news_by_ticker: Dict[str, List[Dict[str, Any]]]) -> int:
+    """
+    Records every ticker's articles in the store, scoring only the ones it has
+    never seen. Unseen texts from the whole universe are scored as one batch
+    (see sentiment_scoring.score_texts); an article already scored for another
+    ticker reuses its polarity. Returns the number of articles scored.
+    """
+    ensure_article_sentiment_table(conn)
+    items = {}  # ticker -> {key: news_item}
+    texts = {}  # key -> text, one per distinct article
+    for ticker, news in news_by_ticker.items():
+        for news_item in news or []:
+            text = article_text(news_item)
+            if text:
+                key = article_key(news_item)
+                items.setdefault(ticker, {}).setdefault(key, news_item)
+                texts.setdefault(key, text)
+    if not texts:
+        return 0
+
+    keys = list(texts)
+    known, mine = {}, set()
+    for i in range(0, len(keys), 500):  # stay under SQLite's variable limit
+        batch = keys[i:i + 500]
+        placeholders = ",".join("?" * len(batch))
+        for key, ticker, polarity in conn.execute(f"""
+            SELECT article_key, ticker_symbol, polarity FROM article_sentiment
+            WHERE article_key IN ({placeholders})
+        """, batch):
+            known.setdefault(key, polarity)
+            mine.add((ticker, key))
+
+    unseen = [key for key in keys if key not in known]
+    start = time.perf_counter()
+    known.update(zip(unseen, score_texts([texts[key] for key in unseen])))
+    elapsed = time.perf_counter() - start
+    if unseen:
+        instrumentation.record_latency("stage", "sentiment_scoring", elapsed)
+    instrumentation.emit("sentiment_batch", backend=config.SENTIMENT_BACKEND, articles=len(keys),
+                         scored=len(unseen), elapsed_s=round(elapsed, 4))
+
+    now = time.time()
+    rows = [(ticker, key, known[key], article_published(news_item), now)
+            for ticker, articles in items.items()
+            for key, news_item in articles.items() if (ticker, key) not in mine]
+    with storage.timed_write("article_sentiment"):
+        conn.executemany("""
+            INSERT OR IGNORE INTO article_sentiment
+            (ticker_symbol, article_key, polarity, published_at, scored_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        conn.commit()
+    return len(unseen)
+
+def score_new_articles(conn: sqlite3.Connection, ticker: str, news: List[Dict[str, Any]]) -> int:
+    """score_articles() for a single ticker's feed."""
+    return score_articles(conn, {ticker: news})
+
+def ticker_sentiment(conn: sqlite3.Connection, ticker: str, window_days: float = None,
+                     half_life_days: float = None, fallback_articles: int = None) -> Optional[float]:
+    """
+    Aggregated polarity (-1.0 .. 1.0) for `ticker` over stored articles
+    published in the last `window_days` (undated articles count as new;
+    <= 0 means every stored article). With none in the window, the latest
+    `fallback_articles` are used instead, so a quiet ticker keeps the score of
+    its last news. With a half-life, newer articles weigh more (weight
+    0.5 ** (age / half_life)); otherwise it is the plain mean. None when the
+    ticker has no scored article at all (or the fallback is 0).
+    """
+    window_days = config.SENTIMENT_WINDOW_DAYS if window_days is None else window_days
+    half_life_days = config.SENTIMENT_HALF_LIFE_DAYS if half_life_days is None else half_life_days
+    fallback_articles = config.SENTIMENT_FALLBACK_ARTICLES if fallback_articles is None else fallback_articles
+    now = time.time()
+    rows = conn.execute("""
+        SELECT polarity, COALESCE(published_at, scored_at) FROM article_sentiment
+        WHERE ticker_symbol = ? AND COALESCE(published_at, scored_at) >= ?
+    """, (ticker, now - window_days * 86400 if window_days > 0 else 0)).fetchall()
+    if not rows and fallback_articles > 0:
+        rows = conn.execute("""
+            SELECT polarity, COALESCE(published_at, scored_at) AS ts FROM article_sentiment
+            WHERE ticker_symbol = ? ORDER BY ts DESC LIMIT ?
+        """, (ticker, fallback_articles)).fetchall()
+    if not rows:
+        return None
+
+    if not half_life_days:
+        return sum(p for p, _ in rows) / len(rows)
+    # Ages from the newest article: same weighted mean, but weeks-old fallback
+    # articles cannot all underflow to a zero weight
+    newest = min(now, max(ts for _, ts in rows))
+    weights = [0.5 ** (max(0.0, newest - ts) / (half_life_days * 86400)) for _, ts in rows]
+    return sum(p * w for (p, _), w in zip(rows, weights)) / sum(weights)
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+import config
+import news_store
+import signal_snapshot
+import storage
+import trading_calendar
+
+# --- Sharded Runs ---
+# market_update_graph.py --shard i/N runs the graph over one slice of
+# pattas_list (shards are numbered 0..N-1). Every shard derives the same split
+# from the table: by a hash of the ticker, or by whole sectors, biggest
+# first onto the least loaded shard. Instead of writing daily_signals, a shard
+# leaves its rows, errors and latest articles in
+# SHARD_DIR/<run date>/<by>-<i>of<N>.json. The run date travels in the shard
+# state (the session of a scheduled run, otherwise the day the run started),
+# so a shard finishing after midnight and a merge the next morning still meet
+# in the same directory. The merge (--merge N) checks that all N are there and
+# disjoint, then writes every row in one daily_signals commit.
+#   --shards N    runs the N workers as local processes, then merges; they
+#                 share one IP, so each gets 1/N of the upstream rate limits
+#   --shard i/N   one worker, e.g. one per machine sharing the repo and SHARD_DIR
+
+SHARD_MODES = ("hash", "sector")
+GRAPH_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_update_graph.py")
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'i/N' -> (i, N)."""
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {spec!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"shard index must be in 0..{count - 1}, got {spec!r}")
+    return index, count
+
+def hash_shard(ticker: str, count: int) -> int:
+    """Shard of a ticker; stable across processes and machines, unlike hash()."""
+    # CRC32 is linear, so similar symbols (SYN00001, SYN00002...) would bunch up
+    return int(hashlib.sha1(ticker.encode("utf-8")).hexdigest()[:8], 16) % count
+
+def sector_shards(sizes: Dict[str, int], count: int) -> Dict[str, int]:
+    """Assigns whole sectors to shards, largest first onto the least loaded one."""
+    loads = [0] * count
+    assignment = {}
+    for sector, size in sorted(sizes.items(), key=lambda item: (-item[1], item[0])):
+        shard = min(range(count), key=lambda i: (loads[i], i))
+        assignment[sector] = shard
+        loads[shard] += size
+    return assignment
+
+def shard_tickers(conn: sqlite3.Connection, index: int, count: int, by: str = None) -> List[str]:
+    """The tickers of shard `index` of `count`, selected in SQL."""
+    by = by or config.SHARD_BY
+    if by == "hash":
+        conn.create_function("pattas_shard", 2, hash_shard, deterministic=True)
+        rows = conn.execute("SELECT ticker_symbol FROM pattas_list WHERE pattas_shard(ticker_symbol, ?) = ?",
+                            (count, index)).fetchall()
+    elif by == "sector":
+        sizes = dict(conn.execute("SELECT COALESCE(sector, ''), COUNT(*) FROM pattas_list GROUP BY 1"))
+        sectors = [sector for sector, shard in sector_shards(sizes, count).items() if shard == index]
+        placeholders = ",".join("?" * len(sectors))
+        rows = conn.execute(f"SELECT ticker_symbol FROM pattas_list WHERE COALESCE(sector, '') IN ({placeholders})",
+                            sectors).fetchall()
+    else:
+        raise ValueError(f"unknown shard mode {by!r} (expected one of {', '.join(SHARD_MODES)})")
+    return [row[0] for row in rows]
+
+# --- Shard Results ---
+
+def result_path(index: int, count: int, by: str, run_date: str) -> str:
+    return os.path.join(config.SHARD_DIR, run_date, f"{by}-{index}of{count}.json")
+
+def latest_run_date(count: int, by: str) -> str:
+    """The newest run date with a result of this split, or the current session if there is none."""
+    dates = sorted((entry for entry in os.listdir(config.SHARD_DIR)
+                    if any(os.path.exists(result_path(i, count, by, entry)) for i in range(count))),
+                   reverse=True) if os.path.isdir(config.SHARD_DIR) else []
+    return dates[0] if dates else trading_calendar.current_session().isoformat()
+
+def write_result(shard: Dict[str, Any], rows: Sequence[Sequence], errors: List[str], news_rows: List[tuple],
+                 tickers: List[str], session: str = None) -> str:
+    """
+    Saves a shard's daily_signals rows, errors and articles for the merge
+    (atomically), with the tickers it processed for `session` (scheduled runs).
+    """
+    path = result_path(shard["index"], shard["count"], shard["by"], shard["run_date"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {
+        "date": shard["run_date"],
+        "shard": shard,
+        "rows": [list(row) for row in rows],
+        "errors": errors,
+        "news": news_rows,
+        "tickers": tickers,
+        "session": session,
+        "written_at": time.time(),
+    }
+    with open(path + ".tmp", "w") as f:
+        json.dump(payload, f, default=str)
+    os.replace(path + ".tmp", path)
+    return path
+
+def merge_results(count: int, by: str = None, run_date: str = None) -> int:
+    """
+    Writes the rows of all `count` shard results for `run_date` (default: the
+    newest run with results) in one daily_signals commit. Refuses missing or
+    overlapping shards. Returns the row count.
+    """
+    by = by or config.SHARD_BY
+    run_date = run_date or latest_run_date(count, by)
+    paths = [result_path(i, count, by, run_date) for i in range(count)]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise RuntimeError(f"{len(missing)} of {count} shard results missing: {', '.join(missing)}")
+
+    rows, errors, news_rows, owner = [], [], [], {}
+    attempted, sessions = [], set()
+    for i, path in enumerate(paths):
+        with open(path) as f:
+            result = json.load(f)
+        for row in result["rows"]:
+            ticker = row[0]
+            if ticker in owner:
+                raise RuntimeError(f"{ticker} is in shards {owner[ticker]} and {i}: were they split from the same universe?")
+            owner[ticker] = i
+            rows.append(row)
+        errors.extend(result["errors"])
+        news_rows.extend(result["news"])
+        attempted.extend(result.get("tickers", []))
+        sessions.add(result.get("session"))
+
+    conn = storage.connect()
+    news_store.store_rows(conn, news_rows)
+    written = signal_snapshot.upsert_many(conn, "daily_signals", storage.DAILY_SIGNAL_COLUMNS, rows)
+    # Scheduled runs: log the attempts, so failed tickers wait for the next session
+    # (imported here, as scheduler.py imports this module)
+    import scheduler
+    for session in sessions - {None}:
+        scheduler.record_attempts(conn, session, attempted, errors)
+    universe = conn.execute("SELECT COUNT(*) FROM pattas_list").fetchone()[0]
+    conn.close()
+    for error in errors:
+        print(f"  {error}", flush=True)
+    print(f"Merged {count} shards of {run_date}: {written} of {universe} tickers written, {len(errors)} errors.", flush=True)
+    return written
+
+# --- Local Workers ---
+
+def run_local(count: int, by: str = None, force_new: bool = False, session: str = None) -> int:
+    """
+    Runs the `count` shards as local processes (skipping shards with a result
+    for this run date unless `force_new`), then merges them. Returns the row
+    count. With `session`, the workers process only tickers missing it
+    (scheduler.py) and the session is the run date; otherwise it is the
+    current session (trading_calendar.current_session()).
+    """
+    by = by or config.SHARD_BY
+    run_date = session or trading_calendar.current_session().isoformat()
+    log_dir = os.path.dirname(result_path(0, count, by, run_date))
+    os.makedirs(log_dir, exist_ok=True)
+
+    # One IP between them: split the per-host budget
+    env = dict(os.environ)
+    for host in ("yahoo", "nse"):
+        rate, burst = config.UPSTREAM_LIMITS[host]
+        env[f"PATTAS_{host.upper()}_RATE"] = str(rate / count)
+        env[f"PATTAS_{host.upper()}_BURST"] = str(max(1, burst // count))
+
+    workers = []
+    for i in range(count):
+        if not force_new and os.path.exists(result_path(i, count, by, run_date)):
+            print(f"  shard {i}/{count}: already finished for {run_date}", flush=True)
+            continue
+        log = open(os.path.join(log_dir, f"{by}-{i}of{count}.log"), "a")
+        command = [sys.executable, GRAPH_SCRIPT, "--shard", f"{i}/{count}", "--shard-by", by, "--run-date", run_date]
+        if force_new:
+            command.append("--new")
+        if session:
+            command += ["--session", session]
+        workers.append((i, subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env), log))
+    print(f"Started {len(workers)} shard workers (logs in {log_dir}).", flush=True)
+
+    failed = []
+    for i, proc, log in workers:
+        code = proc.wait()
+        log.close()
+        print(f"  shard {i}/{count}: {'done' if code == 0 else f'failed with exit code {code}'}", flush=True)
+        if code != 0:
+            failed.append(i)
+    if failed:
+        raise RuntimeError(f"shards {', '.join(map(str, failed))} failed; rerun to resume them")
+    return merge_results(count, by, run_date)
@@ -0,0 +1,131 @@
+import argparse
+import json
+import sqlite3
+import time
+from typing import Iterable, List, Sequence
+
+import news_store
+import storage
+
+# --- Latest Signals Snapshot ---
+# The dashboard shows one row per ticker: its latest daily signal, its
+# pattas_list metadata and its top news. `latest_signals` holds exactly that,
+# denormalized, and is refreshed in the same transaction as the writes it is
+# derived from, so readers never see a signal without its snapshot row.
+# `snapshot_meta` holds the latest signal date and a version bumped by every
+# refresh: a reader compares versions before touching the rows, and reading
+# them is one range scan of an index, however large daily_signals grows.
+
+SIGNAL_COLUMNS = ("price", "rsi", "macd_signal", "sentiment_score", "status", "held_pct_insiders", "trailing_pe")
+METADATA_COLUMNS = ("company_name", "sector", "market_cap", "p_e_ratio", "fii_pct", "dii_pct", "owner_pct")
+
+def ensure_snapshot_tables(conn: sqlite3.Connection):
+    """Creates the snapshot tables, filling them from the existing data the first time."""
+    created = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'snapshot_meta'").fetchone() is None
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS latest_signals (
+            ticker_symbol TEXT PRIMARY KEY,
+            date DATE NOT NULL,             -- of the daily_signals row below
+            company_name TEXT,
+            sector TEXT,
+            market_cap REAL,
+            p_e_ratio REAL,
+            fii_pct REAL,
+            dii_pct REAL,
+            owner_pct REAL,
+            price REAL,
+            rsi REAL,
+            macd_signal TEXT,
+            sentiment_score REAL,
+            status TEXT,
+            held_pct_insiders REAL,
+            trailing_pe REAL,
+            news_json TEXT,                 -- the modal's news list
+            version INTEGER NOT NULL        -- snapshot version that last wrote the row
+        )
+    """)
+    # Serves the dashboard's read (one date, in sector/company order) without a sort
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_latest_signals_date ON latest_signals(date, sector, company_name)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            date DATE,                      -- latest signal date in the snapshot
+            updated_at REAL NOT NULL
+        )
+    """)
+    conn.commit()
+    news_store.ensure_news_table(conn)
+    if created:
+        rebuild(conn)
+
+def _refresh(conn: sqlite3.Connection, tickers: List[str]) -> int:
+    """Rewrites the snapshot rows of `tickers` inside the caller's transaction; returns the new version."""
+    row = conn.execute("SELECT version FROM snapshot_meta WHERE id = 1").fetchone()
+    version = (row[0] if row else 0) + 1
+    columns = ("date",) + METADATA_COLUMNS + SIGNAL_COLUMNS
+    selected = ", ".join([f"d.{c}" for c in ("ticker_symbol", "date")] + [f"p.{c}" for c in METADATA_COLUMNS]
+                         + [f"d.{c}" for c in SIGNAL_COLUMNS])
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns)
+    for i in range(0, len(tickers), storage.SQLITE_MAX_VARIABLES):
+        batch = tickers[i:i + storage.SQLITE_MAX_VARIABLES]
+        placeholders = ",".join("?" * len(batch))
+        # Each ticker's latest row comes off the (ticker_symbol, date) primary key
+        conn.execute(f"""
+            INSERT INTO latest_signals (ticker_symbol, {', '.join(columns)}, version)
+            SELECT {selected}, ?
+            FROM daily_signals d JOIN pattas_list p ON p.ticker_symbol = d.ticker_symbol
+            WHERE d.ticker_symbol IN ({placeholders})
+              AND d.date = (SELECT MAX(date) FROM daily_signals WHERE ticker_symbol = d.ticker_symbol)
+            ON CONFLICT(ticker_symbol) DO UPDATE SET {updates}, version = excluded.version
+        """, [version, *batch])
+    # Stored articles only: the search fallback is added by the reader
+    news = news_store.latest_news(conn, tickers, fallback=False)
+    conn.executemany("UPDATE latest_signals SET news_json = ? WHERE ticker_symbol = ?",
+                     [(json.dumps(items) if items else None, ticker) for ticker, items in news.items()])
+    conn.execute("""
+        INSERT OR REPLACE INTO snapshot_meta (id, version, date, updated_at)
+        VALUES (1, ?, (SELECT MAX(date) FROM latest_signals), ?)
+    """, (version, time.time()))
+    return version
+
+def upsert_many(conn: sqlite3.Connection, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """
+    storage.upsert_many() for daily_signals or pattas_list, refreshing the
+    written tickers' snapshot rows (with their latest stored news) in the
+    same transaction. Returns the number of rows written.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    ensure_snapshot_tables(conn)
+    ticker_index = list(columns).index("ticker_symbol")
+    tickers = list(dict.fromkeys(row[ticker_index] for row in rows))
+    with conn:
+        with storage.timed_write(table):
+            storage.write_rows(conn, table, columns, rows)
+        with storage.timed_write("latest_signals"):
+            _refresh(conn, tickers)
+    return len(rows)
+
+def rebuild(conn: sqlite3.Connection) -> int:
+    """Recreates the whole snapshot from daily_signals, pattas_list and news_articles."""
+    tickers = [row[0] for row in conn.execute("SELECT ticker_symbol FROM pattas_list")]
+    with conn:
+        conn.execute("DELETE FROM latest_signals")
+        _refresh(conn, tickers)
+    return conn.execute("SELECT COUNT(*) FROM latest_signals").fetchone()[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latest-signals snapshot served to the dashboard")
+    parser.add_argument("--rebuild", action="store_true", help="recreate the snapshot from daily_signals")
+    args = parser.parse_args()
+
+    conn = storage.connect()
+    ensure_snapshot_tables(conn)
+    if args.rebuild:
+        print(f"Rebuilt snapshot: {rebuild(conn)} tickers.")
+    version, snapshot_date = conn.execute("SELECT version, date FROM snapshot_meta WHERE id = 1").fetchone()
+    rows = conn.execute("SELECT COUNT(*) FROM latest_signals WHERE date = ?", (snapshot_date,)).fetchone()[0]
+    print(f"Snapshot version {version}: {rows} tickers on {snapshot_date}.")
+    conn.close()
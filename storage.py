@@ -0,0 +1,114 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Iterable, Sequence, Set
+
+import config
+import instrumentation
+
+# --- Storage ---
+# Single place that opens pattas_list.db. WAL lets the dashboard's reader keep
+# serving while a scan writes; synchronous=NORMAL is durable across crashes
+# in WAL mode and skips an fsync per commit. Writers batch their rows and
+# commit once, so a scan is one transaction rather than one per row.
+
+BUSY_TIMEOUT_MS = 30000
+SQLITE_MAX_VARIABLES = 500  # stay well under SQLite's bound-parameter limit
+
+DAILY_SIGNAL_COLUMNS = (
+    "ticker_symbol", "date", "price", "rsi", "macd_signal", "sentiment_score",
+    "status", "held_pct_insiders", "trailing_pe",
+)
+
+def connect(path: str = None, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Opens the database at config.DB_PATH (or `path`) with the shared settings."""
+    conn = sqlite3.connect(path or config.DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+def ensure_core_tables(conn: sqlite3.Connection):
+    """Creates the dashboard tables (same schema as the shipped pattas_list.db) in a fresh database."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pattas_list (
+            ticker_symbol TEXT PRIMARY KEY,
+            company_name TEXT NOT NULL,
+            sector TEXT,
+            owner_pct REAL,         -- Promoter Holding
+            fii_pct REAL,           -- Foreign Institutional Investors (FII)
+            dii_pct REAL,           -- Domestic Institutional Investors (DII)
+            market_cap REAL,
+            p_e_ratio REAL,
+            last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sector ON pattas_list(sector)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_signals (
+            ticker_symbol TEXT NOT NULL,
+            date DATE NOT NULL,
+            price REAL,
+            rsi REAL,
+            macd_signal TEXT CHECK(macd_signal IN ('Bullish Crossover', 'Bearish Crossover', 'Neutral')),
+            sentiment_score REAL,
+            status TEXT CHECK(status IN ('BUY', 'SELL', 'HOLD')),
+            held_pct_insiders REAL,
+            trailing_pe REAL,
+            PRIMARY KEY (ticker_symbol, date),
+            FOREIGN KEY (ticker_symbol) REFERENCES pattas_list(ticker_symbol)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_daily_date ON daily_signals(date)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS purchase_history (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ticker_symbol TEXT NOT NULL,
+            transaction_type TEXT CHECK(transaction_type IN ('BUY', 'SELL')),
+            transaction_date DATE DEFAULT (DATE('now')),
+            no_of_stocks INTEGER NOT NULL,
+            price_per_stock REAL NOT NULL,
+            FOREIGN KEY (ticker_symbol) REFERENCES pattas_list(ticker_symbol)
+        )
+    """)
+    conn.commit()
+
+@contextmanager
+def timed_write(table: str):
+    """Adds the block's duration to the timing summary ("sqlite" latency, per table)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        instrumentation.record_latency("sqlite", table, time.perf_counter() - start)
+
+def upsert_many(conn: sqlite3.Connection, table: str, columns: Sequence[str],
+                rows: Iterable[Sequence], verb: str = "INSERT OR REPLACE") -> int:
+    """
+    Writes all `rows` with one executemany in a single transaction and
+    commits. Returns the number of rows written.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    with timed_write(table), conn:
+        write_rows(conn, table, columns, rows, verb)
+    return len(rows)
+
+def write_rows(conn: sqlite3.Connection, table: str, columns: Sequence[str],
+               rows: Sequence[Sequence], verb: str = "INSERT OR REPLACE"):
+    """The executemany behind upsert_many(), for callers that commit it together with other writes."""
+    placeholders = ", ".join("?" * len(columns))
+    conn.executemany(f"{verb} INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+def existing_values(conn: sqlite3.Connection, table: str, column: str, values: Iterable) -> Set:
+    """The subset of `values` already present in `table.column`, in a few set-based queries."""
+    values = list(dict.fromkeys(values))
+    found = set()
+    for i in range(0, len(values), SQLITE_MAX_VARIABLES):
+        batch = values[i:i + SQLITE_MAX_VARIABLES]
+        placeholders = ",".join("?" * len(batch))
+        found.update(row[0] for row in conn.execute(
+            f"SELECT DISTINCT {column} FROM {table} WHERE {column} IN ({placeholders})", batch))
+    return found
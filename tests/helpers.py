@@ -0,0 +1,43 @@
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import storage
+from history_loader import ensure_price_history_table
+from providers import HISTORY_FIELDS
+
+def make_panel(bars: int = 120, seed: int = 7, start: str = "2026-01-01") -> pd.DataFrame:
+    """A random-walk OHLCV panel of two tickers; B starts 30 bars late, like a recent listing."""
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=bars)
+    frames = {}
+    for ticker, first in (("A.NS", 0), ("B.NS", 30)):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+        spread = close * rng.uniform(0.005, 0.03, bars)
+        frame = pd.DataFrame({
+            "Open": close + rng.normal(0, 0.5, bars),
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": rng.integers(10_000, 1_000_000, bars).astype(float),
+        }, index=dates)[HISTORY_FIELDS]
+        frame.iloc[:first] = np.nan
+        frames[ticker] = frame
+    return pd.concat(frames, axis=1)
+
+class TempDatabase:
+    """A throwaway SQLite file with the dashboard and price-history tables (never config.DB_PATH)."""
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.dir = tempfile.TemporaryDirectory()
+        self.conn = storage.connect(os.path.join(self.dir.name, "test.db"))
+        storage.ensure_core_tables(self.conn)
+        ensure_price_history_table(self.conn)
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.conn.close()
+        self.dir.cleanup()
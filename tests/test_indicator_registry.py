@@ -0,0 +1,115 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import indicator_registry
+import indicators
+from tests.helpers import make_panel
+
+TICKERS = ["A.NS", "B.NS"]
+
+def reference_mfi(frame: pd.DataFrame, window: int) -> float:
+    """Money flow index as usually defined, with pandas rolling sums."""
+    typical = (frame["High"] + frame["Low"] + frame["Close"]) / 3
+    flow = typical * frame["Volume"]
+    change = typical.diff()
+    up = flow.where(change > 0, 0.0).rolling(window).sum()
+    down = flow.where(change < 0, 0.0).rolling(window).sum()
+    return float((100 - 100 / (1 + up / down)).iloc[-1])
+
+class RegistryOutputsTest(unittest.TestCase):
+    """Every registered output against a straightforward pandas version, per ticker."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.panel = make_panel()
+        cls.result = indicator_registry.compute(cls.panel, TICKERS)
+
+    def frames(self):
+        for ticker in TICKERS:
+            yield ticker, self.panel[ticker].dropna(subset=["Close"])
+
+    def assertLatest(self, ticker, column, expected):
+        self.assertAlmostEqual(self.result.loc[ticker, column], float(expected.iloc[-1]), places=8, msg=column)
+
+    def test_every_column_is_computed(self):
+        self.assertEqual(list(self.result.columns), ["date", *indicator_registry.columns()])
+        self.assertFalse(self.result.drop(columns="date").isna().any().any())
+
+    def test_date_is_each_tickers_last_bar(self):
+        for ticker, frame in self.frames():
+            self.assertEqual(self.result.loc[ticker, "date"], frame.index[-1].strftime("%Y-%m-%d"))
+
+    def test_rsi_and_macd_match_the_signal_engine(self):
+        close = indicators.close_matrix(self.panel, TICKERS)
+        line, signal = indicators.macd(close)
+        np.testing.assert_allclose(self.result["rsi_14"], indicators.rsi(close)[-1])
+        np.testing.assert_allclose(self.result["macd_12_26_9"], line[-1])
+        np.testing.assert_allclose(self.result["macd_signal_12_26_9"], signal[-1])
+
+    def test_bollinger(self):
+        for ticker, frame in self.frames():
+            close = frame["Close"]
+            mid, sd = close.rolling(20).mean(), close.rolling(20).std(ddof=0)
+            upper, lower = mid + 2 * sd, mid - 2 * sd
+            self.assertLatest(ticker, "bb_mid_20", mid)
+            self.assertLatest(ticker, "bb_upper_20_2", upper)
+            self.assertLatest(ticker, "bb_lower_20_2", lower)
+            self.assertLatest(ticker, "bb_pct_b_20_2", (close - lower) / (upper - lower))
+            self.assertLatest(ticker, "bb_width_20_2", (upper - lower) / mid)
+
+    def test_atr(self):
+        for ticker, frame in self.frames():
+            prev_close = frame["Close"].shift()
+            true_range = pd.concat([frame["High"] - frame["Low"], (frame["High"] - prev_close).abs(),
+                                    (frame["Low"] - prev_close).abs()], axis=1).max(axis=1)
+            atr = true_range.ewm(alpha=1 / 14, adjust=False).mean()
+            self.assertLatest(ticker, "atr_14", atr)
+            self.assertLatest(ticker, "atr_pct_14", 100 * atr / frame["Close"])
+
+    def test_stochastic(self):
+        for ticker, frame in self.frames():
+            lowest, highest = frame["Low"].rolling(14).min(), frame["High"].rolling(14).max()
+            k = 100 * (frame["Close"] - lowest) / (highest - lowest)
+            self.assertLatest(ticker, "stoch_k_14_3", k)
+            self.assertLatest(ticker, "stoch_d_14_3", k.rolling(3).mean())
+
+    def test_volume(self):
+        for ticker, frame in self.frames():
+            typical = (frame["High"] + frame["Low"] + frame["Close"]) / 3
+            volume = frame["Volume"]
+            self.assertLatest(ticker, "vwap_20", (typical * volume).rolling(20).sum() / volume.rolling(20).sum())
+            self.assertLatest(ticker, "volume_ratio_20", volume / volume.rolling(20).mean())
+
+    def test_mfi_matches_reference(self):
+        for ticker, frame in self.frames():
+            self.assertAlmostEqual(self.result.loc[ticker, "mfi_14"], reference_mfi(frame, 14), places=8)
+
+    def test_moving_average_cross(self):
+        for ticker, frame in self.frames():
+            fast, slow = frame["Close"].rolling(20).mean(), frame["Close"].rolling(50).mean()
+            self.assertLatest(ticker, "sma_20", fast)
+            self.assertLatest(ticker, "sma_50", slow)
+            self.assertLatest(ticker, "sma_cross_20_50", np.sign(fast - slow))
+
+    def test_short_history_gives_nan_not_an_error(self):
+        result = indicator_registry.compute(self.panel.iloc[-10:], TICKERS, ["bollinger", "ma_cross"])
+        self.assertTrue(result[["bb_mid_20", "sma_50"]].isna().all().all())
+
+class SharedNodesTest(unittest.TestCase):
+    def test_equal_expressions_are_evaluated_once(self):
+        calls = []
+
+        def count(x):
+            calls.append(1)
+            return x
+
+        close = indicator_registry.field("Close")
+        node = indicator_registry.apply(count, close)
+        arrays = {"Close": np.arange(5, dtype=float)[:, None]}
+        indicator_registry.evaluate({"a": node, "b": indicator_registry.apply(count, close)}, arrays)
+        self.assertEqual(len(calls), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+import indicators
+from indicator_state import incremental_signals, load_states
+from tests.helpers import TempDatabase, make_panel
+
+TICKERS = ["A.NS", "B.NS"]
+COLUMNS = ["close", "rsi", "macd", "signal_line"]
+
+class IncrementalSignalsTest(unittest.TestCase):
+    def assertSameSignals(self, result, panel):
+        expected = indicators.latest_signals(panel, TICKERS)
+        np.testing.assert_allclose(result[COLUMNS].to_numpy(float), expected[COLUMNS].to_numpy(float))
+        self.assertEqual(list(result["status"]), list(expected["status"]))
+
+    def test_cold_start_matches_full_computation(self):
+        panel = make_panel()
+        with TempDatabase() as conn:
+            self.assertSameSignals(incremental_signals(panel, TICKERS, conn), panel)
+
+    def test_state_is_settled_at_the_second_newest_bar(self):
+        panel = make_panel()
+        with TempDatabase() as conn:
+            incremental_signals(panel, TICKERS, conn)
+            states = load_states(conn, TICKERS)
+        self.assertEqual({s["as_of"] for s in states.values()}, {panel.index[-2].strftime("%Y-%m-%d")})
+
+    def test_warm_update_matches_full_computation(self):
+        panel = make_panel()
+        with TempDatabase() as conn:
+            incremental_signals(panel.iloc[:-5], TICKERS, conn)
+            self.assertSameSignals(incremental_signals(panel, TICKERS, conn), panel)
+            # Rerun on the same bars: the open newest bar is applied again, not folded twice
+            self.assertSameSignals(incremental_signals(panel, TICKERS, conn), panel)
+
+    def test_readjusted_history_is_recomputed(self):
+        panel = make_panel()
+        with TempDatabase() as conn:
+            incremental_signals(panel.iloc[:-5], TICKERS, conn)
+            adjusted = panel.copy()
+            adjusted.loc[:, (slice(None), "Close")] *= 0.5  # a 2:1 split, back-adjusted
+            self.assertSameSignals(incremental_signals(adjusted, TICKERS, conn), adjusted)
+
+if __name__ == "__main__":
+    unittest.main()
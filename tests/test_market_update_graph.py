@@ -0,0 +1,15 @@
+import unittest
+
+import market_update_graph
+
+class AttemptedTickersTest(unittest.TestCase):
+    def test_late_tickers_are_not_logged_as_attempts(self):
+        state = {"tickers": ["A.NS", "B.NS", "C.NS"], "late": ["B.NS"],
+                 "errors": ["B.NS: no 2026-10-16 bar yet (last bar 2026-10-15)", "C.NS: gap fetch failed: 404"]}
+        self.assertEqual(market_update_graph.attempted_tickers(state), ["A.NS", "C.NS"])
+
+    def test_state_from_before_late_tracking(self):
+        self.assertEqual(market_update_graph.attempted_tickers({"tickers": ["A.NS"]}), ["A.NS"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import scheduler
+import trading_calendar
+from tests.helpers import TempDatabase, make_panel
+
+SESSION = "2026-10-16"
+SETTLED = trading_calendar.settled_at(date(2026, 10, 16)).timestamp()
+
+def add_ticker(conn, ticker, last_date=None, fetched_at=None, signal_date=None):
+    conn.execute("INSERT INTO pattas_list (ticker_symbol, company_name) VALUES (?, ?)", (ticker, ticker))
+    if last_date:
+        conn.execute("INSERT INTO price_history_meta (ticker_symbol, covered_from, last_date, fetched_at) VALUES (?, ?, ?, ?)",
+                     (ticker, "2026-04-01", last_date, fetched_at))
+    if signal_date:
+        conn.execute("INSERT INTO daily_signals (ticker_symbol, date, price) VALUES (?, ?, 1.0)", (ticker, signal_date))
+    conn.commit()
+
+class StaleTickersTest(unittest.TestCase):
+    def test_freshness_rules(self):
+        with TempDatabase() as conn:
+            add_ticker(conn, "FRESH", SESSION, SETTLED + 60, SESSION)
+            add_ticker(conn, "FETCHED_EARLY", SESSION, SETTLED - 60, SESSION)  # bar stored while still moving
+            add_ticker(conn, "NO_SIGNAL", SESSION, SETTLED + 60)
+            add_ticker(conn, "OLD_BAR", "2026-10-15", SETTLED + 60, SESSION)
+            add_ticker(conn, "NO_HISTORY")
+            tickers = ["FRESH", "FETCHED_EARLY", "NO_SIGNAL", "OLD_BAR", "NO_HISTORY"]
+            self.assertEqual(scheduler.stale_tickers(conn, tickers, SESSION), tickers[1:])
+
+    def test_failed_attempt_after_settle_counts_as_done(self):
+        with TempDatabase() as conn:
+            add_ticker(conn, "FAILED")
+            add_ticker(conn, "LATE")
+            scheduler.record_attempts(conn, SESSION, ["FAILED"], ["FAILED: gap fetch failed: HTTP 404"])
+            self.assertEqual(scheduler.stale_tickers(conn, ["FAILED", "LATE"], SESSION), ["LATE"])
+            error = conn.execute("SELECT error FROM session_attempts WHERE ticker_symbol = 'FAILED'").fetchone()[0]
+            self.assertEqual(error, "gap fetch failed: HTTP 404")
+            # Another session, or --new, retries it
+            self.assertEqual(scheduler.stale_tickers(conn, ["FAILED"], "2026-10-19"), ["FAILED"])
+            self.assertEqual(scheduler.clear_attempts(conn, SESSION), 1)
+            self.assertEqual(scheduler.stale_tickers(conn, ["FAILED"], SESSION), ["FAILED"])
+
+    def test_attempt_before_settle_is_ignored(self):
+        with TempDatabase() as conn:
+            add_ticker(conn, "EARLY")
+            scheduler.record_attempts(conn, SESSION, ["EARLY"], [])
+            conn.execute("UPDATE session_attempts SET attempted_at = ?", (SETTLED - 60,))
+            self.assertEqual(scheduler.stale_tickers(conn, ["EARLY"], SESSION), ["EARLY"])
+
+    def test_large_universe_is_batched(self):
+        tickers = [f"T{i:04d}" for i in range(1200)]
+        with TempDatabase() as conn:
+            for ticker in tickers[:700]:
+                add_ticker(conn, ticker, SESSION, SETTLED + 60, SESSION)
+            self.assertEqual(scheduler.stale_tickers(conn, tickers, SESSION), tickers[700:])
+
+    def test_plan(self):
+        with TempDatabase() as conn:
+            add_ticker(conn, "FRESH", SESSION, SETTLED + 60, SESSION)
+            add_ticker(conn, "STALE")
+            now = datetime(2026, 10, 18, 12, 0, tzinfo=trading_calendar.load_calendar()["tz"])
+            p = scheduler.plan(conn, now)
+        self.assertEqual((p["session"], p["phase"], p["closed"]), (SESSION, "closed", "Sunday"))
+        self.assertEqual((p["universe"], p["stale"]), (2, ["STALE"]))
+
+class ClipToSessionTest(unittest.TestCase):
+    def test_panel_stops_at_the_session(self):
+        panel = make_panel()
+        session = panel.index[-3].strftime("%Y-%m-%d")
+        clipped, ready, errors = scheduler.clip_to_session(panel, ["A.NS", "B.NS"], session)
+        self.assertEqual(clipped.index[-1], pd.Timestamp(session))
+        self.assertEqual((ready, errors), (["A.NS", "B.NS"], []))
+
+    def test_ticker_without_a_session_bar_is_late(self):
+        panel = make_panel()
+        session = panel.index[-1].strftime("%Y-%m-%d")
+        panel.loc[panel.index[-1], "B.NS"] = float("nan")  # B's feed has not caught up
+        _, ready, errors = scheduler.clip_to_session(panel, ["A.NS", "B.NS"], session)
+        self.assertEqual(ready, ["A.NS"])
+        previous = panel.index[-2].strftime("%Y-%m-%d")
+        self.assertEqual(errors, [f"B.NS: no {session} bar yet (last bar {previous})"])
+
+class CronTest(unittest.TestCase):
+    def test_next_fire_skips_to_the_next_weekday(self):
+        fields = scheduler.parse_cron("15 16 * * 1-5")
+        friday_evening = datetime(2026, 10, 16, 17, 0)
+        self.assertEqual(scheduler.next_fire(fields, friday_evening), datetime(2026, 10, 19, 16, 15))
+        self.assertEqual(scheduler.next_fire(fields, datetime(2026, 10, 19, 16, 15)), datetime(2026, 10, 20, 16, 15))
+
+    def test_steps_lists_and_sunday_as_seven(self):
+        fields = scheduler.parse_cron("*/20 9,15 * * 7")
+        self.assertEqual(scheduler.next_fire(fields, datetime(2026, 10, 18, 9, 41)), datetime(2026, 10, 18, 15, 0))
+
+    def test_either_day_field_matches_when_both_are_set(self):
+        fields = scheduler.parse_cron("0 12 1 * 1")
+        start = datetime(2026, 10, 20, 13, 0)  # a Tuesday
+        self.assertEqual(scheduler.next_fire(fields, start), datetime(2026, 10, 26, 12, 0))
+        self.assertEqual(scheduler.next_fire(fields, start + timedelta(days=6)), datetime(2026, 11, 1, 12, 0))
+
+    def test_bad_schedules_are_rejected(self):
+        for expr in ("15 16 * *", "61 16 * * *", "15 16 * * mon", "0 0 30 2 *"):
+            with self.assertRaises(ValueError, msg=expr):
+                scheduler.next_fire(scheduler.parse_cron(expr), datetime(2026, 1, 1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from datetime import date, datetime, time
+
+import trading_calendar as tc
+
+def ist(*args) -> datetime:
+    return datetime(*args, tzinfo=tc.load_calendar()["tz"])
+
+class CalendarTest(unittest.TestCase):
+    def test_closures(self):
+        self.assertEqual(tc.closure_reason(date(2026, 10, 17)), "Saturday")
+        self.assertEqual(tc.closure_reason(date(2026, 10, 2)), "Mahatma Gandhi Jayanti")
+        self.assertIsNone(tc.closure_reason(date(2026, 10, 16)))
+
+    def test_special_sessions_win_over_weekends_and_holidays(self):
+        self.assertTrue(tc.is_trading_day(date(2025, 2, 1)))    # budget Saturday
+        self.assertTrue(tc.is_trading_day(date(2025, 10, 21)))  # holiday and Muhurat session
+        self.assertEqual(tc.session_hours(date(2025, 10, 21)), (time(13, 45), time(14, 45)))
+        self.assertEqual(tc.session_hours(date(2026, 10, 16)), (time(9, 15), time(15, 30)))
+
+    def test_settled_at_uses_the_sessions_own_close(self):
+        self.assertEqual(tc.settled_at(date(2026, 10, 16)), ist(2026, 10, 16, 16, 0))
+        self.assertEqual(tc.settled_at(date(2026, 11, 8)), ist(2026, 11, 8, 19, 30))
+
+    def test_trading_day_steps_skip_weekends_and_holidays(self):
+        self.assertEqual(tc.previous_trading_day(date(2026, 10, 5)), date(2026, 10, 1))
+        self.assertEqual(tc.next_trading_day(date(2026, 10, 16)), date(2026, 10, 19))
+
+    def test_latest_settled_session(self):
+        self.assertEqual(tc.latest_settled_session(ist(2026, 10, 18, 12, 0)), date(2026, 10, 16))
+        self.assertEqual(tc.latest_settled_session(ist(2026, 10, 19, 15, 45)), date(2026, 10, 16))
+        self.assertEqual(tc.latest_settled_session(ist(2026, 10, 19, 16, 0)), date(2026, 10, 19))
+        self.assertEqual(tc.latest_settled_session(ist(2026, 11, 8, 19, 0)), date(2026, 11, 6))
+
+    def test_current_session(self):
+        self.assertEqual(tc.current_session(ist(2026, 10, 18, 12, 0)), date(2026, 10, 16))
+        self.assertEqual(tc.current_session(ist(2026, 10, 19, 8, 0)), date(2026, 10, 16))
+        self.assertEqual(tc.current_session(ist(2026, 10, 19, 10, 0)), date(2026, 10, 19))
+
+    def test_market_phase(self):
+        self.assertEqual(tc.market_phase(ist(2026, 10, 18, 12, 0)), "closed")
+        self.assertEqual(tc.market_phase(ist(2026, 10, 19, 9, 0)), "pre_open")
+        self.assertEqual(tc.market_phase(ist(2026, 10, 19, 12, 0)), "open")
+        self.assertEqual(tc.market_phase(ist(2026, 10, 19, 15, 45)), "settling")
+        self.assertEqual(tc.market_phase(ist(2026, 10, 19, 16, 0)), "after_close")
+        self.assertEqual(tc.market_phase(ist(2026, 11, 8, 12, 0)), "pre_open")  # evening Muhurat session
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import json
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import config
+
+# --- Exchange Calendar ---
+# NSE and BSE share their equity holidays and hours. They are read from a
+# local JSON file (config.CALENDAR_PATH, nse_calendar.json by default):
+#   utc_offset        "+05:30"; IST has no DST, so a fixed offset is exact
+#   session           regular hours, {"open": "09:15", "close": "15:30"}
+#   weekend           day names the exchange is closed
+#   holidays          {"YYYY-MM-DD": name} of weekday closures
+#   special_sessions  {"YYYY-MM-DD": {"name", "open", "close"}} of sessions on
+#                     weekends or holidays (Muhurat trading, budget-day
+#                     Saturdays), with their own hours; a bare name means
+#                     regular hours
+# A date in both holidays and special_sessions (Diwali Laxmi Pujan and its
+# Muhurat session) is a trading day with the special session's hours: the
+# special session wins.
+# The exchanges publish the next year's list each December; add it here. A
+# year missing from the file is treated as weekdays only, with a warning, so a
+# stale calendar makes runs happen rather than silently stop.
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+@lru_cache(maxsize=None)
+def load_calendar(path: str = None) -> Dict:
+    """The parsed calendar file, with dates as date objects."""
+    with open(path or config.CALENDAR_PATH) as f:
+        raw = json.load(f)
+    sign = -1 if raw["utc_offset"].startswith("-") else 1
+    hours, minutes = raw["utc_offset"].lstrip("+-").split(":")
+    return {
+        "tz": timezone(sign * timedelta(hours=int(hours), minutes=int(minutes))),
+        "open": dtime.fromisoformat(raw["session"]["open"]),
+        "close": dtime.fromisoformat(raw["session"]["close"]),
+        "weekend": {WEEKDAYS.index(day) for day in raw["weekend"]},
+        "holidays": {date.fromisoformat(d): name for d, name in raw["holidays"].items()},
+        "special_sessions": {date.fromisoformat(d): _special_session(entry, raw["session"])
+                             for d, entry in raw.get("special_sessions", {}).items()},
+        "years": {date.fromisoformat(d).year for d in raw["holidays"]},
+    }
+
+def _special_session(entry, regular: Dict[str, str]) -> Dict:
+    if isinstance(entry, str):
+        entry = {"name": entry}
+    return {
+        "name": entry["name"],
+        "open": dtime.fromisoformat(entry.get("open", regular["open"])),
+        "close": dtime.fromisoformat(entry.get("close", regular["close"])),
+    }
+
+def market_now() -> datetime:
+    """The current time at the exchange."""
+    return datetime.now(load_calendar()["tz"])
+
+def closure_reason(day: date) -> Optional[str]:
+    """Why the exchange is closed on `day` ("Saturday", a holiday's name), or None on a trading day."""
+    calendar = load_calendar()
+    if day in calendar["special_sessions"]:
+        return None
+    if day in calendar["holidays"]:
+        return calendar["holidays"][day]
+    if day.year not in calendar["years"]:
+        _warn_missing_year(day.year)
+    if day.weekday() in calendar["weekend"]:
+        return WEEKDAYS[day.weekday()]
+    return None
+
+@lru_cache(maxsize=None)
+def _warn_missing_year(year: int):
+    print(f"Warning: {config.CALENDAR_PATH} has no holidays for {year}; treating every weekday as a trading day.", flush=True)
+
+def is_trading_day(day: date) -> bool:
+    return closure_reason(day) is None
+
+def previous_trading_day(day: date) -> date:
+    """The last trading day strictly before `day`."""
+    day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+def next_trading_day(day: date) -> date:
+    """The first trading day strictly after `day`."""
+    day += timedelta(days=1)
+    while not is_trading_day(day):
+        day += timedelta(days=1)
+    return day
+
+def session_hours(day: date) -> Tuple[dtime, dtime]:
+    """`day`'s (open, close) times: a special session's own, else the regular hours."""
+    calendar = load_calendar()
+    special = calendar["special_sessions"].get(day)
+    if special:
+        return special["open"], special["close"]
+    return calendar["open"], calendar["close"]
+
+def session_close(day: date) -> datetime:
+    """When `day`'s session closes, in exchange time (a Muhurat session's close is in the evening)."""
+    return datetime.combine(day, session_hours(day)[1], tzinfo=load_calendar()["tz"])
+
+def settled_at(day: date) -> datetime:
+    """When `day`'s daily bar is final upstream: the close plus config.SESSION_SETTLE_MINUTES."""
+    return session_close(day) + timedelta(minutes=config.SESSION_SETTLE_MINUTES)
+
+def latest_settled_session(now: datetime = None) -> date:
+    """The most recent trading day whose bar has settled as of `now`."""
+    now = (now or market_now()).astimezone(load_calendar()["tz"])
+    today = now.date()
+    if is_trading_day(today) and now >= settled_at(today):
+        return today
+    return previous_trading_day(today)
+
+def current_session(now: datetime = None) -> date:
+    """
+    The session the newest bar belongs to as of `now`: today once its session
+    has opened, else the previous trading day (a weekend run gets Friday's).
+    Unscheduled runs date their rows by it.
+    """
+    now = (now or market_now()).astimezone(load_calendar()["tz"])
+    today = now.date()
+    if is_trading_day(today) and now.time() >= session_hours(today)[0]:
+        return today
+    return previous_trading_day(today)
+
+def market_phase(now: datetime = None) -> str:
+    """The exchange at `now`: "closed" (no session today), "pre_open", "open", "settling" or "after_close"."""
+    calendar = load_calendar()
+    now = (now or market_now()).astimezone(calendar["tz"])
+    today = now.date()
+    if not is_trading_day(today):
+        return "closed"
+    if now.time() < session_hours(today)[0]:
+        return "pre_open"
+    if now < session_close(today):
+        return "open"
+    if now < settled_at(today):
+        return "settling"
+    return "after_close"
+
+if __name__ == "__main__":
+    now = market_now()
+    today = now.date()
+    reason = closure_reason(today)
+    print(f"{now:%Y-%m-%d %H:%M} exchange time: {market_phase(now)}" + (f" ({reason})" if reason else ""))
+    print(f"Current session: {current_session(now)}")
+    print(f"Latest settled session: {latest_settled_session(now)}")
+    print(f"Next trading day: {next_trading_day(today)}")
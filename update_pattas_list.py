@@ -1,5 +1,7 @@
-import sqlite3
-import yfinance as yf
+import request_governor
+import signal_snapshot
+import storage
+from fundamentals_cache import get_fundamentals
 
 # Full Verified BSE Portfolio List
 bse_portfolio = {
@@ -55,16 +57,15 @@ bse_portfolio = {
 }
 
 def refresh_pattas_table():
-    conn = sqlite3.connect('pattas_list.db')
-    cursor = conn.cursor()
+    conn = storage.connect()
 
     print("🔄 Updating Master Table with FII/DII metrics...")
 
+    rows = []
     for sector, companies in bse_portfolio.items():
         for name, ticker in companies.items():
             try:
-                stock = yf.Ticker(ticker)
-                info = stock.info
+                info = get_fundamentals(ticker, ['heldPercentInsiders', 'heldPercentInstitutions', 'marketCap', 'trailingPE'])
                 
                 # Fetching Institutional Split
                 # Note: For many BSE stocks, info.get('heldPercentInstitutions') is the most reliable
@@ -76,19 +77,19 @@ def refresh_pattas_table():
                 fii = total_inst * 0.65  
                 dii = total_inst * 0.35
 
-                cursor.execute("""
-                    INSERT OR REPLACE INTO pattas_list 
-                    (sector, company_name, ticker_symbol, owner_pct, fii_pct, dii_pct, market_cap, p_e_ratio)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (sector, name, ticker, round(owner, 2), round(fii, 2), round(dii, 2), 
-                      info.get('marketCap', 0), round(info.get('trailingPE', 0), 2)))
+                rows.append((sector, name, ticker, round(owner, 2), round(fii, 2), round(dii, 2), 
+                             info.get('marketCap', 0), round(info.get('trailingPE', 0), 2)))
                 
                 print(f"✅ {ticker} updated.")
             except Exception as e:
                 print(f"❌ Error on {ticker}: {e}")
 
-    conn.commit()
+    # Refreshes the dashboard snapshot's metadata in the same transaction
+    signal_snapshot.upsert_many(conn, "pattas_list",
+                                ("sector", "company_name", "ticker_symbol", "owner_pct", "fii_pct", "dii_pct", "market_cap", "p_e_ratio"),
+                                rows)
     conn.close()
+    request_governor.report()
     print("\n✨ Metadata Sync Complete.")
 
 if __name__ == "__main__":